@@ -0,0 +1 @@
+__all__: list[str] = ["synthetic", "timing", "stub_backend", "micro", "market", "load", "stream_load", "run", "compare"]
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Compare two result files written by `benchmarks.run`:
+
+    python -m benchmarks.compare OLD.json NEW.json [--threshold 0.1]
+
+Exits with status 1 when a median latency, a load test percentile or a throughput
+got worse by more than the threshold.
+"""
+import argparse
+import json
+from pathlib import Path
+import sys
+
+
+def _rows(results: dict) -> dict[str, tuple[float, bool]]:
+    """Comparable numbers by name, with whether higher is better"""
+    rows = {f"micro {name} p50_ms": (stats["p50_ms"], False) for name, stats in results.get("micro", {}).items()}
+    for name, stats in results.get("market", {}).items():
+        rows[f"market {name} p50_ms"] = (stats["p50_ms"], False)
+        if "per_s" in stats:
+            rows[f"market {name} per_s"] = (stats["per_s"], True)
+    load = results.get("load")
+    if load:
+        for name, stats in {"total": load["total"], **load["scenarios"]}.items():
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                rows[f"load {name} {key}"] = (stats[key], False)
+            rows[f"load {name} throughput_rps"] = (stats["throughput_rps"], True)
+    stream = results.get("stream")
+    if stream:
+        for name in ("latency", "slow_staleness"):
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                rows[f"stream {name} {key}"] = (stream[name][key], False)
+        rows["stream frames_per_s"] = (stream["frames_per_s"], True)
+    return rows
+
+
+def print_results(results: dict) -> None:
+    for name, (value, _) in _rows(results).items():
+        print(f"{name:<60} {value:>12.3f}")
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list[str]:
+    """Print old and new side by side, returns the names of the regressions"""
+    old_rows, new_rows = _rows(old), _rows(new)
+    regressions = []
+    print(f"{'':<60} {old['commit']:>12} {new['commit']:>12} {'change':>8}")
+    for name, (new_value, higher_is_better) in new_rows.items():
+        if name not in old_rows:
+            continue
+        old_value = old_rows[name][0]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<60} {old_value:>12.3f} {new_value:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    regressions = compare(json.loads(args.old.read_text()), json.loads(args.new.read_text()), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Closed-loop load test of the full app: `create_app()` served by a threaded werkzeug
+server, with the FastAPI backend replaced by `benchmarks.stub_backend`. Each client
+thread sends its next request as soon as the previous one is answered.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+import threading
+import time
+
+from flask import Flask
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from .synthetic import X_INDICATOR, Y_INDICATOR
+from .timing import summarize
+
+
+def _dash_body(output: str, inputs: list[tuple[str, object]]) -> dict:
+    component_id, prop = output.split(".")
+    return {
+        "output": output,
+        "outputs": {"id": component_id, "property": prop},
+        "inputs": [{"id": i, "property": "value", "value": value} for i, value in inputs],
+        "changedPropIds": [f"{inputs[-1][0]}.value"],
+    }
+
+
+# name -> (method, path, keyword arguments for requests)
+SCENARIOS: dict[str, tuple[str, str, dict]] = {
+    "index": ("GET", "/", {}),
+    "crossfilter_page": ("GET", "/crossfilter-example/", {}),
+    "crossfilter_scatter": ("POST", "/crossfilter-example/_dash-update-component", {"json": _dash_body(
+        "crossfilter-indicator-scatter.figure",
+        [
+            ("crossfilter-xaxis-column", X_INDICATOR),
+            ("crossfilter-yaxis-column", Y_INDICATOR),
+            ("crossfilter-xaxis-type", "Linear"),
+            ("crossfilter-yaxis-type", "Linear"),
+            ("crossfilter-year--slider", 2007),
+        ],
+    )}),
+    "iris_graph": ("POST", "/iris-k-means/_dash-update-component", {"json": _dash_body(
+        "cluster-graph.figure",
+        [("x-variable", "sepal length (cm)"), ("y-variable", "sepal width (cm)"), ("cluster-count", 3)],
+    )}),
+    "sign_up": ("POST", "/sign_up", {"data": {
+        "email": "bench@example.com",
+        "username": "bench",
+        "password": "benchmark",
+        "repeat_password": "benchmark",
+    }}),
+}
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve(app: Flask) -> tuple[str, object]:
+    """Serve `app` from a daemon thread, returns its base URL and the server"""
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def _client(base_url: str, scenarios: list[str], deadline: float, offset: int) -> tuple[dict, dict]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    names = cycle(scenarios[offset % len(scenarios):] + scenarios[:offset % len(scenarios)])
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            name = next(names)
+            method, path, kwargs = SCENARIOS[name]
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, allow_redirects=False, **kwargs)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            latencies[name].append(time.perf_counter() - start)
+            if not ok:
+                errors[name] += 1
+    return latencies, errors
+
+
+def run_load(app: Flask, duration: float = 10, concurrency: int = 16, scenarios: list[str] | None = None) -> dict:
+    """
+    :returns: p50/p95/p99 latency and throughput, overall and per scenario
+    """
+    scenarios = scenarios or list(SCENARIOS)
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.extensions["dash_registry"].warm_up(background=False)
+    base_url, server = serve(app)
+    try:
+        # untimed pass, so the first fits and renders are not part of the numbers
+        _client(base_url, scenarios, time.perf_counter() + 1, 0)
+
+        start = time.perf_counter()
+        deadline = start + duration
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(lambda i: _client(base_url, scenarios, deadline, i), range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    for client_latencies, client_errors in outcomes:
+        for name, samples in client_latencies.items():
+            latencies[name].extend(samples)
+        for name, count in client_errors.items():
+            errors[name] += count
+
+    def report(samples: list[float], error_count: int) -> dict:
+        return {**summarize(samples), "errors": error_count, "throughput_rps": len(samples) / elapsed}
+
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "duration_s": elapsed,
+        "concurrency": concurrency,
+        "total": report(everything, sum(errors.values())),
+        "scenarios": {name: report(latencies[name], errors[name]) for name in scenarios},
+    }
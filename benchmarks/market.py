@@ -0,0 +1,269 @@
+"""
+Throughput of the in-process market data components on synthetic ticks. Entries
+carry the usual latency summary plus `per_s`, items handled per second at the median.
+
+    python -m benchmarks.market [--quick]
+"""
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import threading
+
+from .synthetic import make_ohlcv, make_order_flow, make_ticks
+from .timing import measure, summarize
+
+TICKS = 200_000
+QUICK_TICKS = 50_000
+BATCH = 1_000
+STREAM_SUBSCRIBERS = 5_000
+ORDERS = 200_000
+QUICK_ORDERS = 50_000
+PORTFOLIO_USERS = 100_000
+QUICK_PORTFOLIO_USERS = 20_000
+PORTFOLIO_SYMBOLS = 500
+POSITIONS_PER_USER = 20
+BACKTEST_SYMBOLS = 8
+BACKTEST_BARS = 50_000
+QUICK_BACKTEST_BARS = 10_000
+# 8 x 10 parameter pairs per symbol
+BACKTEST_FAST = range(5, 45, 5)
+BACKTEST_SLOW = range(50, 550, 50)
+
+
+def with_rate(stats: dict, items: int) -> dict:
+    stats["per_s"] = items / (stats["p50_ms"] / 1e3) if stats["p50_ms"] else 0.0
+    return stats
+
+
+def bench_tick_store(n_ticks: int, repeat: int) -> dict:
+    import numpy as np
+
+    from market.sources import ReplaySource
+    from market.ticks import TickStore
+
+    ticks = make_ticks(n_ticks, n_symbols=1)
+    times, prices, sizes = (ticks[column].to_numpy() for column in ("time", "price", "size"))
+    rows = list(zip(times.tolist(), prices.tolist(), sizes.tolist()))
+    size = f"ticks={n_ticks}"
+
+    def add_tick():
+        store = TickStore(capacity=n_ticks, candle_capacity=10_000)
+        for time, price, volume in rows:
+            store.add_tick("SYM0", time, price, volume)
+
+    def add_ticks():
+        store = TickStore(capacity=n_ticks, candle_capacity=10_000)
+        for start in range(0, n_ticks, BATCH):
+            store.add_ticks("SYM0", times[start:start + BATCH], prices[start:start + BATCH], sizes[start:start + BATCH])
+
+    store = TickStore(capacity=n_ticks, candle_capacity=10_000)
+    store.add_ticks("SYM0", times, prices, sizes)
+    # a tick between reads, so every read writes out the open candle
+    next_tick = iter(np.tile(prices, 100).tolist())
+
+    def read_candles():
+        store.add_tick("SYM0", float(times[-1]), next(next_tick), 1.0)
+        return store.candles("SYM0", "1s", 500)
+
+    results = {
+        f"tick_store.add_tick[{size}]": with_rate(measure(add_tick, max(repeat // 5, 3), warmup=1), n_ticks),
+        f"tick_store.add_ticks[batch={BATCH},{size}]": with_rate(measure(add_ticks, repeat), n_ticks),
+        "tick_store.candles[1s,n=500]": measure(read_candles, repeat * 10),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory, "ticks.csv")
+        make_ticks(n_ticks).to_csv(path, index=False)
+        source = ReplaySource(path)
+        source.load()  # build the columnar cache once, replays map it
+
+        def replay():
+            source.run(TickStore(capacity=n_ticks, candle_capacity=10_000), threading.Event())
+
+        results[f"replay_source[{size}]"] = with_rate(measure(replay, repeat), n_ticks)
+    return results
+
+
+def bench_stream_hub(subscribers: int, repeat: int) -> dict:
+    """
+    Fan-out cost of the stream hub: a publish round against `subscribers` idle
+    subscriptions, then every subscriber takes its pending frame. Each gets one
+    frame however many rounds were published (coalescing).
+    """
+    from market.streaming import StreamHub
+    from market.ticks import TickStore
+
+    ticks = make_ticks(10_000)
+    store = TickStore(capacity=10_000, candle_capacity=1_000)
+    for symbol, group in ticks.groupby("symbol"):
+        store.add_ticks(symbol, group["time"].to_numpy(), group["price"].to_numpy(), group["size"].to_numpy())
+    symbols = store.symbols()
+    # the publisher thread is not needed, rounds are published by hand
+    hub = StreamHub(store, interval=3600, max_subscribers=subscribers)
+    streams = [hub.subscribe([symbols[i % len(symbols)]]) for i in range(subscribers)]
+    for stream in streams:
+        next(stream)  # the retry frame
+
+    def publish():
+        hub.publish({symbol: hub.message(symbol) for symbol in symbols})
+
+    def drain():
+        for _ in range(5):
+            publish()
+        for stream in streams:
+            frame = next(stream)
+            if frame.count(b"event: quote") != 1:
+                raise AssertionError("a subscriber got a backlog instead of the latest frame")
+
+    size = f"subscribers={subscribers}"
+    results = {
+        f"stream_hub.publish[{size}]": measure(publish, repeat * 10),
+        f"stream_hub.drain[{size}]": with_rate(measure(drain, repeat), subscribers),
+    }
+    for stream in streams:
+        stream.close()
+    hub.stop()
+    return results
+
+
+def bench_matching(n_orders: int, repeat: int) -> dict:
+    """
+    Orders per second of the matching engine replaying a synthetic order flow, one
+    command at a time and as one batch, and the latency of single commands
+    """
+    import time
+
+    from market.matching import MatchingEngine, fills_digest, replay
+
+    commands = make_order_flow(n_orders)
+    size = f"orders={n_orders}"
+
+    _, fills = replay(commands)
+    _, fills_again = replay(commands)
+    if fills_digest(fills) != fills_digest(fills_again):
+        raise AssertionError("replaying the same commands gave different fills")
+
+    def apply_each():
+        engine = MatchingEngine()
+        for command in commands:
+            engine.apply(command)
+
+    def apply_batch():
+        MatchingEngine().submit_batch(commands)
+
+    engine = MatchingEngine()
+    latencies = []
+    for command in commands:
+        start = time.perf_counter()
+        engine.apply(command)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        f"matching.apply[{size}]": with_rate(measure(apply_each, max(repeat // 5, 3), warmup=1), n_orders),
+        f"matching.submit_batch[{size}]": with_rate(measure(apply_batch, max(repeat // 5, 3), warmup=1), n_orders),
+        "matching.command_latency": summarize(latencies),
+    }
+
+
+def bench_portfolio(n_users: int, repeat: int) -> dict:
+    """
+    Mark-to-market of `n_users` users holding `POSITIONS_PER_USER` of
+    `PORTFOLIO_SYMBOLS` symbols each: a refresh after 1 and after 50 symbols
+    changed, a single fill and a user snapshot
+    """
+    import numpy as np
+
+    from market.matching import BUY
+    from market.portfolio import PortfolioEngine, seed_demo_positions
+
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}" for i in range(PORTFOLIO_SYMBOLS)]
+    prices = dict(zip(symbols, rng.uniform(10, 500, PORTFOLIO_SYMBOLS).tolist()))
+    engine = PortfolioEngine()
+    seed_demo_positions(engine, n_users, prices, per_user=POSITIONS_PER_USER)
+    moves = iter(rng.normal(1, 0.001, 10_000_000).tolist())
+
+    def mark(n_symbols: int):
+        def run():
+            engine.mark({symbol: prices[symbol] * next(moves) for symbol in symbols[:n_symbols]})
+        return run
+
+    owners = [f"demo{i}" for i in rng.integers(0, n_users, 10_000).tolist()]
+    next_owner = iter(owners * 100)
+
+    def apply_fill():
+        engine.apply_fill(next(next_owner), symbols[0], BUY, 10, prices[symbols[0]])
+
+    def snapshot():
+        engine.snapshot(next(next_owner))
+
+    size = f"users={n_users},positions={n_users * POSITIONS_PER_USER}"
+    return {
+        f"portfolio.mark[symbols=1,{size}]": measure(mark(1), repeat * 10),
+        f"portfolio.mark[symbols=50,{size}]": measure(mark(50), repeat),
+        "portfolio.apply_fill": measure(apply_fill, repeat * 10),
+        f"portfolio.snapshot[symbols={PORTFOLIO_SYMBOLS}]": measure(snapshot, repeat * 10),
+    }
+
+
+def bench_backtest(n_bars: int, repeat: int) -> dict:
+    """
+    Backtests per second over `BACKTEST_SYMBOLS` symbols, in the calling thread and
+    with process pools of 1, 2, 4... workers up to the number of cores. A pool's
+    `speedup` is relative to one worker. The bars load from their columnar cache
+    like the app's, the workers are started before timing.
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    from market.backtest import MP_CONTEXT, Bars, parameter_grid, run_backtest
+
+    runs = len(parameter_grid(BACKTEST_FAST, BACKTEST_SLOW)) * BACKTEST_SYMBOLS
+    size = f"symbols={BACKTEST_SYMBOLS},bars={n_bars},runs={runs}"
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory, "bars.csv")
+        make_ohlcv(n_bars, BACKTEST_SYMBOLS).to_csv(path, index=False)
+        bars = Bars.from_csv(path)
+
+        results[f"backtest[processes=0,{size}]"] = with_rate(
+            measure(lambda: run_backtest(bars, BACKTEST_FAST, BACKTEST_SLOW, parallel=False), repeat), runs
+        )
+        workers, single = 1, None
+        while workers <= (os.cpu_count() or 1):
+            with ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT) as executor:
+                stats = with_rate(measure(
+                    lambda: run_backtest(bars, BACKTEST_FAST, BACKTEST_SLOW, executor=executor), repeat, warmup=1,
+                ), runs)
+            single = single or stats["per_s"]
+            stats["speedup"] = stats["per_s"] / single
+            results[f"backtest[processes={workers},{size}]"] = stats
+            workers *= 2
+    return results
+
+
+def run_market(quick: bool = False, repeat: int = 30) -> dict:
+    results = bench_tick_store(QUICK_TICKS if quick else TICKS, repeat)
+    results.update(bench_stream_hub(STREAM_SUBSCRIBERS, repeat))
+    results.update(bench_matching(QUICK_ORDERS if quick else ORDERS, repeat))
+    results.update(bench_portfolio(QUICK_PORTFOLIO_USERS if quick else PORTFOLIO_USERS, repeat))
+    results.update(bench_backtest(QUICK_BACKTEST_BARS if quick else BACKTEST_BARS, max(repeat // 3, 3)))
+    return results
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer ticks and repeats")
+    args = parser.parse_args(argv)
+
+    results = run_market(quick=args.quick, repeat=5 if args.quick else 15)
+    for name, stats in results.items():
+        rate = f"{stats['per_s']:>14,.0f}/s" if "per_s" in stats else ""
+        rate += f" x{stats['speedup']:.2f}" if "speedup" in stats else ""
+        print(f"{name:<50} p50 {stats['p50_ms']:>10.3f}ms p99 {stats['p99_ms']:>10.3f}ms {rate}", file=sys.stderr)
+    return results
+
+
+if __name__ == "__main__":
+    main()
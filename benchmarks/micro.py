@@ -0,0 +1,183 @@
+"""
+Microbenchmarks of the hot paths: the README index page, the Dash index shell and
+the Dash callbacks, on synthetic datasets of growing size. Project modules are
+imported inside the functions, after `benchmarks.run` has prepared the environment.
+"""
+from flask import Flask
+
+from .synthetic import X_INDICATOR, Y_INDICATOR, make_indicators, make_iris_like
+from .timing import measure
+
+# countries in the synthetic indicator table, times 10 indicators and 25 years
+INDICATOR_SIZES = (200, 2_000, 20_000)
+QUICK_INDICATOR_SIZES = (200, 2_000)
+# points in the encoded scatter plot
+ENCODE_SIZES = (1_000, 10_000, 100_000)
+# points handed to the downsamplers
+DOWNSAMPLE_SIZES = (10_000, 100_000, 1_000_000)
+QUICK_DOWNSAMPLE_SIZES = (10_000, 100_000)
+# rows in the synthetic iris table
+IRIS_SIZES = (150, 5_000, 50_000)
+QUICK_IRIS_SIZES = (150, 5_000)
+
+HOVER = {"points": [{"customdata": "Japan"}]}
+
+
+def bench_readme(app: Flask, repeat: int) -> dict:
+    from utils import render_readme
+
+    def reset():
+        render_readme._cached = None
+
+    with app.test_request_context("/"):
+        return {
+            "readme.render_cold": measure(render_readme.get_rendered_readme, repeat, setup=reset),
+            "readme.cached": measure(render_readme.get_rendered_readme, repeat * 10),
+            "readme.response": measure(render_readme.get_readme_response, repeat * 10),
+        }
+
+
+def bench_dash_index(app: Flask, repeat: int) -> dict:
+    from flask_dash import crossfilter_example
+    from flask_dash.flask_dash_integrator import FlaskDash
+
+    server = app.extensions["dash_registry"].create_server()
+    dash_app = FlaskDash(server=server, routes_pathname_prefix="/bench/")
+    dash_app.layout = crossfilter_example.page_layout
+
+    def reset():
+        dash_app._index_shells.clear()
+        dash_app._index_payloads.clear()
+
+    def reset_layout():
+        dash_app._layout_cache = None
+
+    with server.test_request_context("/bench/"):
+        return {
+            "dash_index.cold": measure(dash_app.index, repeat, setup=reset),
+            "dash_index.cached": measure(dash_app.index, repeat * 10),
+            "dash_layout.cold": measure(dash_app.serve_layout, repeat, setup=reset_layout),
+            "dash_layout.cached": measure(dash_app.serve_layout, repeat * 10),
+        }
+
+
+def bench_crossfilter(sizes: tuple[int, ...], repeat: int) -> dict:
+    from plotly.io.json import to_json_plotly
+
+    from flask_dash import crossfilter_example
+    from flask_dash.indicator_store import IndicatorStore
+
+    results = {}
+    original_store = crossfilter_example.store
+    try:
+        for n_countries in sizes:
+            df = make_indicators(n_countries)
+            crossfilter_example.store = IndicatorStore.from_frame(df)
+            size = f"rows={len(df)}"
+
+            def update_graph():
+                return crossfilter_example.update_graph(X_INDICATOR, Y_INDICATOR, "Linear", "Linear", 2007)
+
+            def update_x_timeseries():
+                return crossfilter_example.update_x_timeseries(HOVER, Y_INDICATOR, "Linear")
+
+            results[f"update_graph[{size}]"] = measure(update_graph, repeat)
+            results[f"update_graph+encode[{size}]"] = measure(lambda: to_json_plotly(update_graph()), repeat)
+            results[f"update_year_slices+encode[{size}]"] = measure(
+                lambda: to_json_plotly(crossfilter_example.update_year_slices(X_INDICATOR, Y_INDICATOR)), repeat
+            )
+            results[f"update_x_timeseries[{size}]"] = measure(update_x_timeseries, repeat)
+            results[f"update_x_timeseries+encode[{size}]"] = measure(
+                lambda: to_json_plotly(update_x_timeseries()), repeat
+            )
+    finally:
+        crossfilter_example.store = original_store
+    return results
+
+
+def bench_encode(sizes: tuple[int, ...], repeat: int) -> dict:
+    """
+    Encode time of a scatter callback response, as the crossfilter callback builds it
+    before downsampling, with each plotly JSON engine and with graph objects
+    """
+    import numpy as np
+    import plotly.graph_objs as go
+    from plotly.io.json import to_json_plotly
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for n_points in sizes:
+        names = [f"Country {i}" for i in range(n_points)]
+        trace = {
+            "x": rng.random(n_points) * 100,
+            "y": rng.random(n_points) * 100,
+            "text": names,
+            "customdata": names,
+            "mode": "markers",
+            "marker": {"size": 15, "opacity": 0.5, "line": {"width": 0.5, "color": "white"}},
+        }
+        layout = {"xaxis": {"title": {"text": X_INDICATOR}}, "yaxis": {"title": {"text": Y_INDICATOR}}, "height": 450}
+
+        def envelope(figure):
+            # the envelope Dash wraps callback outputs in
+            return {"multi": True, "response": {"crossfilter-indicator-scatter": {"figure": figure}}}
+
+        payload = envelope({"data": [{"type": "scatter", **trace}], "layout": layout})
+        size = f"points={n_points}"
+        results[f"encode.json[{size}]"] = measure(lambda: to_json_plotly(payload, engine="json"), repeat)
+        results[f"encode.orjson[{size}]"] = measure(lambda: to_json_plotly(payload, engine="orjson"), repeat)
+        results[f"encode.graph_objects[{size}]"] = measure(
+            lambda: to_json_plotly(envelope({"data": [go.Scatter(**trace)], "layout": go.Layout(layout)})), repeat
+        )
+    return results
+
+
+def bench_downsample(sizes: tuple[int, ...], repeat: int) -> dict:
+    import numpy as np
+
+    from flask_dash.crossfilter_example import MAX_POINTS
+    from flask_dash.downsample import grid_sample_indices, lttb_indices
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for n_points in sizes:
+        x = np.arange(n_points, dtype=np.float64)
+        walk = np.cumsum(rng.normal(size=n_points))
+        scatter_x, scatter_y = rng.normal(size=n_points), rng.normal(size=n_points)
+        results[f"lttb[points={n_points}]"] = measure(lambda: lttb_indices(x, walk, MAX_POINTS), repeat)
+        results[f"grid_sample[points={n_points}]"] = measure(
+            lambda: grid_sample_indices(scatter_x, scatter_y, MAX_POINTS), repeat
+        )
+    return results
+
+
+def bench_iris(sizes: tuple[int, ...], repeat: int) -> dict:
+    from flask_dash import iris_kmeans
+
+    x, y = "sepal length (cm)", "sepal width (cm)"
+    results = {"filter_options": measure(lambda: iris_kmeans.filter_options(x), repeat * 10)}
+    original_iris = iris_kmeans.iris
+    try:
+        for n_rows in sizes:
+            iris_kmeans.iris = make_iris_like(n_rows)
+            size = f"rows={n_rows}"
+            results[f"make_graph.fit[{size}]"] = measure(
+                lambda: iris_kmeans.make_graph(x, y, 3), max(repeat // 5, 3), warmup=1,
+                setup=iris_kmeans.kmeans_cache.clear,
+            )
+            results[f"make_graph.cached[{size}]"] = measure(lambda: iris_kmeans.make_graph(x, y, 3), repeat)
+    finally:
+        iris_kmeans.iris = original_iris
+        iris_kmeans.kmeans_cache.clear()
+    return results
+
+
+def run_micro(app: Flask, quick: bool = False, repeat: int = 30) -> dict:
+    results = {}
+    results.update(bench_readme(app, repeat))
+    results.update(bench_dash_index(app, repeat))
+    results.update(bench_crossfilter(QUICK_INDICATOR_SIZES if quick else INDICATOR_SIZES, repeat))
+    results.update(bench_encode(ENCODE_SIZES, repeat))
+    results.update(bench_downsample(QUICK_DOWNSAMPLE_SIZES if quick else DOWNSAMPLE_SIZES, repeat))
+    results.update(bench_iris(QUICK_IRIS_SIZES if quick else IRIS_SIZES, repeat))
+    return results
@@ -0,0 +1,105 @@
+"""
+Run the benchmarks and save the results, keyed by git commit:
+
+    python -m benchmarks.run [--quick] [--no-market] [--no-load] [--no-stream] [--duration 10] [--concurrency 16]
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Everything runs offline: datasets are synthetic and the FastAPI server is a local stub.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+
+from .stub_backend import start_stub_backend
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+
+
+def git_commit() -> tuple[str, bool]:
+    """Current commit and whether the tree has uncommitted changes"""
+    def git(*args) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def prepare_environment() -> None:
+    """Point the app at the stub backend, before any project module reads its settings"""
+    stub = start_stub_backend()
+    os.environ["FASTAPI_PORT"] = str(stub.server_address[1])
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("APP_NAME", "Benchmark")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("DASH_WARM_UP", "false")
+    os.environ.setdefault("PRECOMPUTE_README", "false")
+    # time the fit itself, not the hand-off to the process pool
+    os.environ.setdefault("KMEANS_PROCESSES", "0")
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller datasets and fewer repeats")
+    parser.add_argument("--no-micro", action="store_true", help="skip the microbenchmarks")
+    parser.add_argument("--no-market", action="store_true", help="skip the market data benchmarks")
+    parser.add_argument("--no-load", action="store_true", help="skip the load test")
+    parser.add_argument("--no-stream", action="store_true", help="skip the market data stream load test")
+    parser.add_argument("--subscribers", type=int, default=2000, help="stream load test subscribers")
+    parser.add_argument("--duration", type=float, default=10, help="load test duration in seconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="load test client threads")
+    parser.add_argument("--output", type=Path, help="result file, defaults to benchmarks/results/<commit>.json")
+    args = parser.parse_args(argv)
+
+    prepare_environment()
+    from main import create_app
+
+    from .load import run_load
+    from .market import run_market
+    from .micro import run_micro
+    from .stream_load import run_stream_load
+
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": args.quick,
+    }
+    app = create_app()
+    if not args.no_micro:
+        print("Running microbenchmarks", file=sys.stderr)
+        results["micro"] = run_micro(app, quick=args.quick, repeat=10 if args.quick else 30)
+    if not args.no_market:
+        print("Running market data benchmarks", file=sys.stderr)
+        results["market"] = run_market(quick=args.quick, repeat=5 if args.quick else 15)
+    if not args.no_load:
+        print(f"Running load test for {args.duration:g}s with {args.concurrency} clients", file=sys.stderr)
+        results["load"] = run_load(app, duration=args.duration, concurrency=args.concurrency)
+    if not args.no_stream:
+        print(f"Running stream load test for {args.duration:g}s with {args.subscribers} subscribers", file=sys.stderr)
+        results["stream"] = run_stream_load(app, subscribers=args.subscribers, duration=args.duration)
+
+    output = args.output or RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    from .compare import print_results
+    print_results(results)
+    print(f"\nSaved to {output}", file=sys.stderr)
+    return results
+
+
+if __name__ == "__main__":
+    main()
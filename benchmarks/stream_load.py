@@ -0,0 +1,113 @@
+"""
+Load test of the market data stream: thousands of SSE subscribers on `/market/stream`
+of `create_app()` served by a threaded werkzeug server, while a random-walk source
+feeds the tick store. The subscribers are raw sockets read from one selector thread,
+so the client side stays cheap. Most of them read as soon as data arrives and measure
+the delivery latency. A fraction only reads every few seconds, and measures how old
+the newest value it gets is.
+"""
+import re
+import selectors
+import socket
+import time
+
+from flask import Flask
+
+from .load import serve
+from .timing import summarize
+
+SENT = re.compile(rb'"sent":([0-9.]+)')
+
+
+def _connect(port: int, symbol: str) -> socket.socket:
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall(f"GET /market/stream?symbols={symbol} HTTP/1.0\r\n\r\n".encode())
+    sock.setblocking(False)
+    return sock
+
+
+def _read(sock: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        try:
+            chunk = sock.recv(65536)
+        except BlockingIOError:
+            break
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def run_stream_load(
+    app: Flask,
+    subscribers: int = 2000,
+    duration: float = 10,
+    n_symbols: int = 4,
+    slow_fraction: float = 0.1,
+    slow_interval: float = 2.0,
+) -> dict:
+    from market import stream_hub, tick_store
+    from market.sources import RandomWalkSource
+
+    symbols = [f"LOAD{i}" for i in range(n_symbols)]
+    source = RandomWalkSource(symbols, rate=1000, seed=0).start(tick_store)
+    _, server = serve(app)
+    time.sleep(0.5)
+
+    selector = selectors.DefaultSelector()
+    slow: dict[socket.socket, float] = {}
+    statuses: dict[socket.socket, bytes] = {}
+    n_slow = int(subscribers * slow_fraction)
+    connect_start = time.perf_counter()
+    for i in range(subscribers):
+        sock = _connect(server.server_port, symbols[i % n_symbols])
+        if i < n_slow:
+            slow[sock] = time.perf_counter() + slow_interval * (i + 1) / n_slow
+        else:
+            selector.register(sock, selectors.EVENT_READ)
+        statuses[sock] = b""
+    connect_time = time.perf_counter() - connect_start
+
+    latencies, staleness = [], []
+    frames = 0
+    # frames published while the clients were connecting sat in socket buffers, skip them
+    started = time.time()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        ready = [key.fileobj for key, _ in selector.select(timeout=0.05)]
+        now = time.perf_counter()
+        due = [sock for sock, at in slow.items() if at <= now]
+        for sock in due:
+            slow[sock] = now + slow_interval
+        for sock in ready + due:
+            data = _read(sock)
+            if not statuses[sock]:
+                statuses[sock] = data[:12]
+            sent = [float(value) for value in SENT.findall(data)]
+            sent = [value for value in sent if value >= started]
+            if not sent:
+                continue
+            frames += len(sent)
+            received = time.time()
+            if sock in slow:
+                staleness.append(received - sent[-1])
+            else:
+                latencies.extend(received - value for value in sent)
+
+    connected = sum(status.startswith(b"HTTP/1.1 200") or status.startswith(b"HTTP/1.0 200") for status in statuses.values())
+    peak_subscribers = stream_hub.subscribers
+    for sock in statuses:
+        sock.close()
+    selector.close()
+    source.stop()
+    server.shutdown()
+    return {
+        "subscribers": subscribers,
+        "connected": connected,
+        "peak_subscribers": peak_subscribers,
+        "connect_s": connect_time,
+        "frames_per_s": frames / duration,
+        "latency": summarize(latencies),
+        "slow_staleness": summarize(staleness),
+    }
@@ -0,0 +1,30 @@
+"""Local stand-in for the FastAPI server at SERVER_URL, answering every call with success"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        body = json.dumps({"success": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _answer
+    do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_backend(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve the stub in a daemon thread, the bound port is `server.server_address[1]`"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True).start()
+    return server
@@ -0,0 +1,108 @@
+"""Synthetic stand-ins for the app's datasets, so the benchmarks run offline"""
+import numpy as np
+import pandas as pd
+
+X_INDICATOR = "Fertility rate, total (births per woman)"
+Y_INDICATOR = "Life expectancy at birth, total (years)"
+
+
+def make_indicators(n_countries: int, n_indicators: int = 10, n_years: int = 25, seed: int = 0) -> pd.DataFrame:
+    """Long-format World-Bank style frame: Country Name, Indicator Name, Year, Value"""
+    rng = np.random.default_rng(seed)
+    countries = np.array(["Japan"] + [f"Country {i}" for i in range(n_countries - 1)], dtype=object)
+    indicators = np.array([X_INDICATOR, Y_INDICATOR] + [f"Indicator {i}" for i in range(n_indicators - 2)], dtype=object)
+    years = np.arange(2008 - n_years, 2008)
+
+    country, indicator, year = (
+        grid.ravel() for grid in np.meshgrid(
+            np.arange(len(countries)), np.arange(len(indicators)), years, indexing="ij"
+        )
+    )
+    # drop a few rows so that series have gaps, and shuffle like a real export
+    keep = rng.random(len(country)) > 0.05
+    order = rng.permutation(int(keep.sum()))
+    return pd.DataFrame({
+        "Country Name": countries[country[keep]][order],
+        "Indicator Name": indicators[indicator[keep]][order],
+        "Year": year[keep][order],
+        "Value": rng.random(int(keep.sum()))[order] * 100,
+    })
+
+
+def make_iris_like(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Frame with the iris feature columns and `n_rows` rows drawn around three centers"""
+    rng = np.random.default_rng(seed)
+    columns = ["sepal length (cm)", "sepal width (cm)", "petal length (cm)", "petal width (cm)"]
+    centers = rng.random((3, len(columns))) * 5
+    labels = rng.integers(0, 3, n_rows)
+    return pd.DataFrame(centers[labels] + rng.normal(0, 0.4, (n_rows, len(columns))), columns=columns)
+
+
+def make_ticks(n_ticks: int, n_symbols: int = 4, start: float = 1_700_000_000.0, seed: int = 0) -> pd.DataFrame:
+    """Trades of `n_symbols` random-walk prices, about 100 a second: time, symbol, price, size"""
+    rng = np.random.default_rng(seed)
+    symbol = rng.integers(0, n_symbols, n_ticks)
+    steps = rng.normal(0, 0.0005, n_ticks)
+    # each symbol walks on its own from a price between 10 and 500
+    log_price = np.empty(n_ticks)
+    for code in range(n_symbols):
+        mask = symbol == code
+        log_price[mask] = np.log(rng.uniform(10, 500)) + np.cumsum(steps[mask])
+    return pd.DataFrame({
+        "time": start + np.cumsum(rng.exponential(0.01, n_ticks)),
+        "symbol": np.array([f"SYM{code}" for code in range(n_symbols)], dtype=object)[symbol],
+        "price": np.round(np.exp(log_price), 2),
+        "size": rng.integers(1, 500, n_ticks).astype(np.float64),
+    })
+
+
+def make_ohlcv(n_bars: int, n_symbols: int = 4, start: float = 1_700_000_000.0, seed: int = 0) -> pd.DataFrame:
+    """One-minute bars of `n_symbols` random-walk prices: time, symbol, open, high, low, close, volume"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for code in range(n_symbols):
+        close = rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(0, 0.001, n_bars)))
+        open_ = np.append(close[0], close[:-1]) * np.exp(rng.normal(0, 0.0002, n_bars))
+        spread = np.abs(rng.normal(0, 0.0005, (2, n_bars)))
+        frames.append(pd.DataFrame({
+            "time": start + 60.0 * np.arange(n_bars),
+            "symbol": f"SYM{code}",
+            "open": open_,
+            "high": np.maximum(open_, close) * (1 + spread[0]),
+            "low": np.minimum(open_, close) * (1 - spread[1]),
+            "close": close,
+            "volume": rng.integers(1, 10_000, n_bars).astype(np.float64),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_order_flow(n_commands: int, symbol: str = "SYM0", seed: int = 0) -> list[tuple]:
+    """
+    Matching engine commands in journal form: limit orders around a drifting mid
+    price, cancels of recent orders and market orders, one second apart
+    """
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(3, n_commands, p=[0.65, 0.25, 0.10])
+    sides = rng.choice([1, -1], n_commands)
+    quantities = rng.integers(1, 100, n_commands)
+    mid = 100 + np.cumsum(rng.normal(0, 0.01, n_commands))
+    # passive orders mostly, some cross the spread
+    offsets = np.abs(rng.normal(0.05, 0.1, n_commands))
+    commands, live = [], []
+    next_id = 1
+    for i in range(n_commands):
+        now = float(i)
+        if kinds[i] == 1 and live:
+            commands.append(("cancel", live.pop(int(rng.integers(len(live)))), now))
+            continue
+        side, quantity = int(sides[i]), int(quantities[i])
+        if kinds[i] == 2:
+            commands.append(("market", f"user{i % 100}", symbol, side, quantity, now))
+        else:
+            price = round(float(mid[i] - side * offsets[i] + side * 0.03), 2)
+            commands.append(("limit", f"user{i % 100}", symbol, side, quantity, price, now))
+            live.append(next_id)
+            # only the latest orders are cancelled, as a market maker would
+            live = live[-200:]
+        next_id += 1
+    return commands
@@ -0,0 +1,41 @@
+import statistics
+import time
+from collections.abc import Callable
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min_ms": ordered[0] * 1e3 if ordered else 0.0,
+        "mean_ms": statistics.fmean(ordered) * 1e3 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1e3,
+        "p95_ms": percentile(ordered, 0.95) * 1e3,
+        "p99_ms": percentile(ordered, 0.99) * 1e3,
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 50, warmup: int = 3, setup: Callable[[], object] | None = None) -> dict:
+    """
+    Time `repeat` calls of `fn` after `warmup` untimed calls. `setup` runs untimed
+    before every call, e.g. to clear a cache for cold-path measurements.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
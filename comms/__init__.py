@@ -1,2 +1,3 @@
-__all__ = ["get_sign_up_response"]
-from .communications import *
\ No newline at end of file
+__all__ = ["get_sign_up_response", "register_user", "BackendUnavailableError", "backend_client", "BackendClient", "CircuitOpenError"]
+from .communications import *
+from .backend_client import backend_client, BackendClient, CircuitOpenError
\ No newline at end of file
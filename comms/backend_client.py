@@ -0,0 +1,291 @@
+import atexit
+import threading
+import time
+from collections import deque
+from os import environ
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import logger
+from utils.metrics import metrics
+
+SERVER_URL = f"http://127.0.0.1:{environ.get('FASTAPI_PORT')}"
+
+# Seconds, either a single value or a (connect, read) tuple as accepted by requests
+DEFAULT_TIMEOUT = (3.05, float(environ.get("BACKEND_TIMEOUT", 5)))
+ENDPOINT_TIMEOUTS: dict[str, float | tuple[float, float]] = {
+    "/sign_up": (3.05, 5),
+}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling the backend while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the backend is down.
+
+    After `failure_threshold` consecutive failures the circuit opens and every call
+    is rejected for `reset_timeout` seconds. After that a single trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            # half-open: only one trial call at a time
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Give the trial slot back without an outcome, e.g. when the call failed before reaching the backend"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Backend circuit opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyStats:
+    """Call count, error count and a window of recent latencies for one endpoint"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+
+    def record(self, elapsed: float, error: bool = False) -> None:
+        self.count += 1
+        self.errors += error
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self._recent.append(elapsed)
+
+    def summary(self) -> dict:
+        recent = sorted(self._recent)
+
+        def percentile(p: float) -> float:
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": self.max,
+        }
+
+
+class BackendClient:
+    """
+    Long-lived client for the FastAPI server.
+
+    Holds a pooled keep-alive `requests.Session` so connections are reused between
+    requests, applies per-endpoint timeouts, retries connection failures with
+    exponential backoff and trips a circuit breaker while the backend is down.
+    Every call to the FastAPI server should go through the shared `backend_client`.
+    Latency and errors are recorded as `backend_request_*` metrics, and the circuit and
+    pool usage of `stats()` are copied into `backend_*` metrics by `collect_metrics`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        max_retries: int = 2,
+        backoff_factor: float = 0.2,
+        default_timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+        timeouts: dict[str, float | tuple[float, float]] | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        # urllib3 only retries non-idempotent methods (POST) on connection errors,
+        # i.e. when the request never reached the server, so sign-ups are not duplicated
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._stats: dict[str, LatencyStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Send a request to `endpoint` on the backend
+
+        :raises CircuitOpenError: if the circuit breaker is open
+        :raises requests.RequestException: if the request failed after all retries
+        """
+        if not self.circuit_breaker.allow_request():
+            self._record(endpoint, 0.0, error=True)
+            raise CircuitOpenError(f"Backend circuit is open, not calling {endpoint}")
+
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.default_timeout))
+        start = time.perf_counter()
+        # the breaker must hear about every call it let through, or a half-open
+        # circuit keeps its trial slot taken and rejects everything after it
+        outcome = None
+        try:
+            response = self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+            outcome = response.status_code < 500
+        except requests.RequestException:
+            outcome = False
+            raise
+        finally:
+            self._record(endpoint, time.perf_counter() - start, error=outcome is not True)
+            if outcome is None:
+                self.circuit_breaker.release()
+            elif outcome:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+        return response
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def _record(self, endpoint: str, elapsed: float, error: bool) -> None:
+        metrics.observe("backend_request_duration_seconds", elapsed, endpoint=endpoint)
+        metrics.inc("backend_requests_total", endpoint=endpoint)
+        if error:
+            metrics.inc("backend_request_errors_total", endpoint=endpoint)
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = LatencyStats()
+            stats.record(elapsed, error)
+
+    def pool_stats(self) -> dict:
+        """Connection pool usage, per backend host"""
+        pools = {}
+        pool_manager = self._adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                # unused slots in urllib3's pool queue are None placeholders
+                "idle": sum(conn is not None for conn in pool.pool.queue) if pool.pool is not None else 0,
+            }
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "pools": pools,
+        }
+
+    def stats(self) -> dict:
+        """Pool usage, circuit breaker state and latency summary per endpoint"""
+        with self._stats_lock:
+            latency = {endpoint: stats.summary() for endpoint, stats in self._stats.items()}
+        return {
+            "circuit": self.circuit_breaker.state,
+            "pool": self.pool_stats(),
+            "endpoints": latency,
+        }
+
+    def collect_metrics(self) -> None:
+        """Set the circuit breaker and connection pool gauges from `stats()`"""
+        stats = self.stats()
+        for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+            metrics.gauge_set("backend_circuit_state", int(stats["circuit"] == state), state=state)
+        pool = stats["pool"]
+        metrics.gauge_set("backend_pool_maxsize", pool["pool_maxsize"])
+        for host, usage in pool["pools"].items():
+            metrics.gauge_set("backend_pool_connections_opened", usage["connections_opened"], host=host)
+            metrics.gauge_set("backend_pool_idle_connections", usage["idle"], host=host)
+            metrics.counter_set("backend_pool_requests_total", usage["requests"], host=host)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+backend_client = BackendClient(
+    SERVER_URL,
+    pool_connections=int(environ.get("BACKEND_POOL_CONNECTIONS", 4)),
+    pool_maxsize=int(environ.get("BACKEND_POOL_MAXSIZE", 16)),
+    max_retries=int(environ.get("BACKEND_MAX_RETRIES", 2)),
+    backoff_factor=float(environ.get("BACKEND_BACKOFF_FACTOR", 0.2)),
+    timeouts=ENDPOINT_TIMEOUTS,
+    circuit_breaker=CircuitBreaker(
+        failure_threshold=int(environ.get("BACKEND_CIRCUIT_FAILURES", 5)),
+        reset_timeout=float(environ.get("BACKEND_CIRCUIT_RESET", 30)),
+    ),
+)
+atexit.register(backend_client.close)
+
+metrics.describe("backend_circuit_state", "1 for the current state of the backend circuit breaker")
+metrics.describe("backend_pool_maxsize", "Connections kept per backend host")
+metrics.describe("backend_pool_connections_opened", "Connections opened to a backend host")
+metrics.describe("backend_pool_idle_connections", "Open connections to a backend host waiting for a request")
+metrics.describe("backend_pool_requests_total", "Requests sent over the pool of a backend host")
+metrics.collect(backend_client.collect_metrics)
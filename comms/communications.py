@@ -1,23 +1,49 @@
 import requests
 from urllib3.exceptions import MaxRetryError
-from os import environ
 
 from utils import logger
-
-SERVER_URL = f"http://127.0.0.1:{environ.get('FASTAPI_PORT')}"
+from .backend_client import CircuitOpenError, backend_client
 
 def get_sign_up_response(email: str, username: str, password: str):
     try:
-        response: requests.Response = requests.post(
-            url=f"{SERVER_URL}/sign_up",
+        response: requests.Response = backend_client.post(
+            "/sign_up",
             params={"email": email, "username": username, "password": password},
-            verify=False,
-            timeout=5
         )
         return response
-    except MaxRetryError as error:
+    except CircuitOpenError as error:
+        logger.error(f"Server is unavailable: {error}")
+        return {"internal_error": error}
+    except (MaxRetryError, requests.exceptions.RetryError) as error:
         logger.error(f"Got too many retries for server: {error}")
         return {"internal_error": error}
     except Exception as error:
         logger.error(f"Got unexpected error: {error}")
-        return {"internal_error": error}
\ No newline at end of file
+        return {"internal_error": error}
+
+class BackendUnavailableError(Exception):
+    """Raised when the backend could not be reached or answered with a server error"""
+
+def register_user(email: str, username: str, password: str) -> dict:
+    """
+    Register the user with the FastAPI server, meant to run on the job queue
+
+    :returns: the server's JSON answer
+    :raises BackendUnavailableError: if the call should be retried
+    :raises CircuitOpenError: if the backend is known to be down, not worth retrying
+    """
+    response = get_sign_up_response(email=email, username=username, password=password)
+    if isinstance(response, dict) and isinstance(response["internal_error"], CircuitOpenError):
+        # retrying within the backoff would only hit the open circuit again
+        raise response["internal_error"]
+    if isinstance(response, dict):
+        raise BackendUnavailableError(f"Communication between servers has failed: {response['internal_error']}")
+    if response.status_code >= 500:
+        raise BackendUnavailableError(f"Server answered with status {response.status_code}")
+
+    response_json: dict = response.json()
+    if response_json.get("success") == True:
+        logger.debug(f"User {username} sign up has been successful")
+    else:
+        logger.error(f"User {username} sign up has failed")
+    return response_json
\ No newline at end of file
@@ -10,6 +10,41 @@ class DefaultConfig:
     SECRET_KEY =  environ.get("SECRET_KEY")
     PORT = environ.get("FLASK_PORT")
 
+    # Render the README index page during warm-up instead of on the first request
+    PRECOMPUTE_README = environ.get("PRECOMPUTE_README", "true").lower() == "true"
+    # Build the Dash apps and call their callbacks once during warm-up instead of on their first request
+    DASH_WARM_UP = environ.get("DASH_WARM_UP", "true").lower() == "true"
+    # Run the warm-up stages in a background thread, /readyz reports when they are done
+    WARM_UP_BACKGROUND = environ.get("WARM_UP_BACKGROUND", "true").lower() == "true"
+
+    # Sampling profiler, requests can also be profiled with a signed X-Profile header
+    # (see utils/profiler.py)
+    PROFILING_ENABLED = environ.get("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(environ.get("PROFILING_SAMPLE_RATE", 0.01))
+    PROFILING_INTERVAL = float(environ.get("PROFILING_INTERVAL", 0.005))
+    PROFILING_MAX_PER_MINUTE = int(environ.get("PROFILING_MAX_PER_MINUTE", 10))
+    PROFILING_DIR = environ.get("PROFILING_DIR", "profiles")
+
+    # Market data
+    # Tick source feeding the in-process tick store, empty for none (see market/sources.py)
+    MARKET_SOURCE = environ.get("MARKET_SOURCE", "")
+    # Seconds between two matches of the resting paper orders against the new ticks
+    MATCHING_SYNC_INTERVAL = float(environ.get("MATCHING_SYNC_INTERVAL", 0.25))
+    # Seconds between two revaluations of the paper portfolios
+    PORTFOLIO_MARK_INTERVAL = float(environ.get("PORTFOLIO_MARK_INTERVAL", 0.25))
+    # Made-up users with random positions, for demos of the portfolio page
+    PORTFOLIO_DEMO_USERS = int(environ.get("PORTFOLIO_DEMO_USERS", 0))
+
     # Static Assets
+    # Fingerprint and precompress the static folder at startup (see utils/assets.py)
+    ASSET_PIPELINE = environ.get("ASSET_PIPELINE", "true").lower() == "true"
+    # Cache lifetime of fingerprinted static files, in seconds
+    ASSET_MAX_AGE = int(environ.get("ASSET_MAX_AGE", 365 * 24 * 3600))
     STATIC_FOLDER = "static"
     TEMPLATE_FOLDER = "templates"
+    # Compiled templates are cached on disk and shared by the workers, empty to disable
+    TEMPLATE_CACHE_DIR = environ.get("TEMPLATE_CACHE_DIR", ".jinja_cache")
+    # Check templates for changes on every render, only useful while developing
+    TEMPLATES_AUTO_RELOAD = environ.get(
+        "TEMPLATES_AUTO_RELOAD", environ.get("FLASK_DEBUG", "false")
+    ).lower() in ("1", "true")
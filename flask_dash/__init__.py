@@ -1 +1 @@
-__all__: list[str] = ["crossfilter_example", "flask_dash_integrator", "demo", "iris_kmeans"]
\ No newline at end of file
+__all__: list[str] = ["crossfilter_example", "flask_dash_integrator", "demo", "iris_kmeans", "indicator_store", "live_chart", "portfolio", "backtest", "registry"]
\ No newline at end of file
@@ -0,0 +1,237 @@
+from os import environ
+
+from dash import dash_table, dcc, html
+from dash.dependencies import Input, Output, State
+import dash_bootstrap_components as dbc
+from flask import Flask
+import numpy as np
+
+from flask_dash.flask_dash_integrator import FlaskDash
+from market import tick_store
+from market.backtest import METRICS, Bars, equity_curve, run_backtest
+
+# OHLCV bars to test on (time, symbol, open, high, low, close, volume), the live candles when unset
+BACKTEST_FILE = environ.get("BACKTEST_FILE")
+BACKTEST_INTERVAL = environ.get("BACKTEST_INTERVAL", "1m")
+# windows tried along each axis of the grid
+GRID_POINTS = 10
+
+METRIC_NAMES = {
+    "total_return": "Total return",
+    "sharpe": "Sharpe",
+    "max_drawdown": "Max drawdown",
+    "trades": "Trades",
+    "exposure": "Exposure",
+}
+
+controls = dbc.Card(
+    [
+        dbc.Label("Fast window"),
+        dcc.RangeSlider(id="backtest-fast", min=2, max=100, step=1, value=[5, 40], marks=None,
+                        tooltip={"placement": "bottom"}),
+        dbc.Label("Slow window"),
+        dcc.RangeSlider(id="backtest-slow", min=10, max=500, step=5, value=[50, 300], marks=None,
+                        tooltip={"placement": "bottom"}),
+        dbc.Label("Cost per fill (bps)"),
+        dbc.Input(id="backtest-cost", type="number", min=0, value=5),
+        dbc.Checklist(id="backtest-long-only", options=[{"label": "Long only", "value": True}], value=[],
+                      switch=True, className="my-2"),
+        dbc.Button("Run", id="backtest-run", color="primary"),
+        html.Div(id="backtest-status", className="small text-muted mt-2"),
+    ],
+    body=True,
+)
+
+
+def create_page_layout() -> dbc.Container:
+    """
+    Create the layout for this page
+    """
+    page_layout = dbc.Container(
+        [
+            html.H1("Backtest"),
+            html.P("Moving average crossover: long while the fast average is above the slow one, "
+                   "filled at the next bar's open."),
+            html.Hr(),
+            dbc.Row(
+                [
+                    dbc.Col(controls, md=3),
+                    dbc.Col(
+                        [
+                            dcc.Dropdown(id="backtest-symbol", clearable=False),
+                            dcc.Loading(dcc.Graph(id="backtest-heatmap")),
+                        ],
+                        md=5,
+                    ),
+                    dbc.Col(dcc.Graph(id="backtest-equity"), md=4),
+                ]
+            ),
+            html.H4("Best parameters per symbol"),
+            dash_table.DataTable(
+                id="backtest-best",
+                columns=[{"name": "Symbol", "id": "symbol"}, {"name": "Fast", "id": "fast"},
+                         {"name": "Slow", "id": "slow"}]
+                + [{"name": METRIC_NAMES[metric], "id": metric, "type": "numeric", "format": {"specifier": ",.3f"}}
+                   for metric in METRICS],
+                sort_action="native",
+                page_size=20,
+            ),
+            dcc.Store(id="backtest-results"),
+        ],
+        fluid=True,
+    )
+    return page_layout
+
+page_layout = create_page_layout()
+
+
+def load_bars() -> Bars:
+    if BACKTEST_FILE:
+        return Bars.from_csv(BACKTEST_FILE)
+    return Bars.from_store(tick_store, BACKTEST_INTERVAL)
+
+def grid(bounds: list[int]) -> np.ndarray:
+    return np.unique(np.linspace(bounds[0], bounds[1], GRID_POINTS).round().astype(int))
+
+def run_backtests(_, fast, slow, cost_bps, long_only, symbol):
+    bars = load_bars()
+    if not bars.symbols:
+        return None, "No bars to test on yet", [], None
+    settings = {"cost": (cost_bps or 0) / 1e4, "long_only": bool(long_only)}
+    results = run_backtest(bars, grid(fast), grid(slow), **settings)
+    status = f"{len(results):,} backtests over {len(bars.columns['time']):,} bars"
+    options = [{"label": symbol, "value": symbol} for symbol in bars.symbols]
+    symbol = symbol if symbol in bars.symbols else bars.symbols[0]
+    # time of the first and last bar tested per symbol, the equity curve is rebuilt on the same bars
+    times, spans = bars.columns["time"], {}
+    for name in bars.symbols:
+        rows = bars.rows(name)
+        spans[name] = [float(times[rows.start]), float(times[rows.stop - 1])]
+    return {"settings": settings, "spans": spans, "rows": results.to_dict("records")}, status, options, symbol
+
+def heatmap_figure(rows: list[dict]) -> dict:
+    fast = sorted({row["fast"] for row in rows})
+    slow = sorted({row["slow"] for row in rows})
+    sharpe = np.full((len(fast), len(slow)), np.nan)
+    for row in rows:
+        sharpe[fast.index(row["fast"]), slow.index(row["slow"])] = row["sharpe"]
+    return {
+        "data": [{
+            "type": "heatmap",
+            "x": slow,
+            "y": fast,
+            "z": [[None if np.isnan(value) else value for value in line] for line in sharpe.tolist()],
+            "colorscale": "RdBu",
+            "zmid": 0,
+            "colorbar": {"title": {"text": "Sharpe"}},
+        }],
+        "layout": {
+            "height": 450,
+            "margin": {"l": 60, "b": 50, "t": 20, "r": 20},
+            "xaxis": {"title": {"text": "Slow window"}},
+            "yaxis": {"title": {"text": "Fast window"}},
+        },
+    }
+
+def show_results(symbol, data):
+    if not data or symbol is None:
+        return heatmap_figure([]), []
+    rows = data["rows"]
+    best = {}
+    for row in rows:
+        if row["symbol"] not in best or row["sharpe"] > best[row["symbol"]]["sharpe"]:
+            best[row["symbol"]] = row
+    return heatmap_figure([row for row in rows if row["symbol"] == symbol]), list(best.values())
+
+def show_equity(symbol, click_data, data):
+    if not data or symbol is None:
+        return {"data": [], "layout": {}}
+    rows = [row for row in data["rows"] if row["symbol"] == symbol]
+    if not rows:
+        return {"data": [], "layout": {}}
+    pairs = {(row["fast"], row["slow"]) for row in rows}
+    point = (click_data or {}).get("points", [{}])[0]
+    pair = (point.get("y"), point.get("x"))
+    if pair not in pairs:
+        best = max(rows, key=lambda row: row["sharpe"])
+        pair = (best["fast"], best["slow"])
+
+    span = data.get("spans", {}).get(symbol)
+    try:
+        bars = load_bars().symbol(symbol, *span) if span else None
+    except KeyError:
+        # no longer among the bars, e.g. the store was restarted since the run
+        bars = None
+    if bars is None or len(bars["time"]) == 0:
+        return {"data": [], "layout": {}}
+    equity = equity_curve(bars, *pair, **data["settings"])
+    return {
+        "data": [{
+            "type": "scattergl",
+            "mode": "lines",
+            "x": (bars["time"] * 1000).astype("datetime64[ms]").astype(str).tolist(),
+            "y": equity.tolist(),
+            "name": f"{pair[0]}/{pair[1]}",
+        }],
+        "layout": {
+            "height": 450,
+            "margin": {"l": 50, "b": 50, "t": 40, "r": 20},
+            "title": {"text": f"Equity, fast {pair[0]} / slow {pair[1]}"},
+        },
+    }
+
+def init_callbacks(flask_dash_app: FlaskDash):
+    flask_dash_app.callback(
+        [
+            Output("backtest-results", "data"),
+            Output("backtest-status", "children"),
+            Output("backtest-symbol", "options"),
+            Output("backtest-symbol", "value"),
+        ],
+        [Input("backtest-run", "n_clicks")],
+        [
+            State("backtest-fast", "value"),
+            State("backtest-slow", "value"),
+            State("backtest-cost", "value"),
+            State("backtest-long-only", "value"),
+            State("backtest-symbol", "value"),
+        ],
+    )(run_backtests)
+
+    flask_dash_app.callback(
+        [Output("backtest-heatmap", "figure"), Output("backtest-best", "data")],
+        [Input("backtest-symbol", "value"), Input("backtest-results", "data")],
+    )(show_results)
+
+    flask_dash_app.callback(
+        Output("backtest-equity", "figure"),
+        [
+            Input("backtest-symbol", "value"),
+            Input("backtest-heatmap", "clickData"),
+            Input("backtest-results", "data"),
+        ],
+    )(show_equity)
+
+    return flask_dash_app
+
+
+def init_flask_dash_app(server: Flask):
+    """Create a Plotly Dash dashboard."""
+    flask_dash_app = FlaskDash(
+        server=server,
+        routes_pathname_prefix="/backtest/",
+    )
+
+    # create dash layout
+    flask_dash_app.layout = page_layout
+
+    # initialize callbacks
+    init_callbacks(flask_dash_app)
+
+    return flask_dash_app.server
+
+
+if __name__ == "__main__":
+    flask_dash_app = FlaskDash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    init_callbacks(flask_dash_app)
+    flask_dash_app.run_server(debug=True, port=8080)
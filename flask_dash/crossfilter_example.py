@@ -1,15 +1,34 @@
+from os import environ
+
 import numpy as np
-from dash import dcc, html
+from dash import ctx, dcc, html
 from dash.dependencies import Input, Output
+from dash.exceptions import MissingCallbackContextException, PreventUpdate
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.graph_objs as go
 from flask import Flask
 
+from flask_dash.downsample import grid_sample_indices, lttb_indices
 from flask_dash.flask_dash_integrator import FlaskDash
+from flask_dash.indicator_store import IndicatorStore
+
+store = IndicatorStore.from_csv("data/indicators.csv")
+available_indicators: np.ndarray = store.indicators
+
+# Rendering tiers: SVG scatter up to WEBGL_THRESHOLD points, WebGL above it, and past
+# MAX_POINTS the points in view are downsampled (binned for the scatter plot, LTTB
+# for time series). Zooming re-queries the zoomed range at full resolution.
+WEBGL_THRESHOLD = int(environ.get("CROSSFILTER_WEBGL_THRESHOLD", 2000))
+MAX_POINTS = int(environ.get("CROSSFILTER_MAX_POINTS", 5000))
+# Ship every year's points for the selected indicators to the browser at once, so
+# the year slider and the axis types are handled client side without server requests.
+# Each year is downsampled to MAX_POINTS up front and zooming does not re-query.
+CLIENTSIDE_YEARS = environ.get("CROSSFILTER_CLIENTSIDE_YEARS", "false").lower() == "true"
 
-df: pd.DataFrame = pd.read_csv("data/indicators.csv")  # noqa: PD901
-available_indicators: np.ndarray = df["Indicator Name"].unique()
+SCATTER_MARKER = {
+    "size": 15,
+    "opacity": 0.5,
+    "line": {"width": 0.5, "color": "white"},
+}
 
 def create_page_layout() -> dbc.Container:
     """
@@ -68,12 +87,12 @@ def create_page_layout() -> dbc.Container:
                             dbc.Card(
                                 dcc.Slider(
                                     id="crossfilter-year--slider",
-                                    min=df["Year"].min(),
-                                    max=df["Year"].max(),
-                                    value=df["Year"].max(),
+                                    min=store.years.min(),
+                                    max=store.years.max(),
+                                    value=store.years.max(),
                                     step=None,
                                     marks={
-                                        str(year): str(year) for year in df["Year"].unique()
+                                        str(year): str(year) for year in store.years
                                     },
                                 ),
                                 className="pt-2"
@@ -127,51 +146,156 @@ def create_page_layout() -> dbc.Container:
         fluid=True,
     )
 
+    if CLIENTSIDE_YEARS:
+        page_layout.children.append(dcc.Store(id="crossfilter-year-slices"))
+
     return page_layout
 
 page_layout = create_page_layout()
 
+def _triggered_props() -> list[str]:
+    """Inputs that triggered the current callback, none when called outside one"""
+    try:
+        return ctx.triggered_prop_ids
+    except MissingCallbackContextException:
+        return []
+
+def _zoom_range(relayout_data: dict | None, axis: str, axis_type: str) -> tuple[float, float] | None:
+    """Data range of a zoomed axis from the graph's relayoutData, None when not zoomed"""
+    if not relayout_data or relayout_data.get(f"{axis}.autorange"):
+        return None
+    bounds = relayout_data.get(f"{axis}.range")
+    if bounds is None:
+        bounds = (relayout_data.get(f"{axis}.range[0]"), relayout_data.get(f"{axis}.range[1]"))
+    if None in bounds:
+        return None
+    low, high = sorted(float(bound) for bound in bounds)
+    if axis_type == "Log":
+        # log axes report their range in powers of ten
+        return 10 ** low, 10 ** high
+    return low, high
+
+def trace_type(n_points: int) -> str:
+    return "scattergl" if n_points > WEBGL_THRESHOLD else "scatter"
+
 def update_graph(
-    xaxis_column_name, yaxis_column_name, xaxis_type, yaxis_type, year_value
+    xaxis_column_name, yaxis_column_name, xaxis_type, yaxis_type, year_value, relayout_data=None
 ):
-    dff = df[df["Year"] == year_value]
+    countries, x, y = store.scatter(year_value, xaxis_column_name, yaxis_column_name)
+    triggered = _triggered_props()
+    if "crossfilter-indicator-scatter.relayoutData" in triggered:
+        zoom_change = any(key.startswith(("xaxis.", "yaxis.")) for key in relayout_data or {})
+        if len(x) <= MAX_POINTS or not (zoom_change or relayout_data is None):
+            # every point is already in the figure and plotly zooms on its own,
+            # or the relayout was not a zoom (autosize, drag mode)
+            raise PreventUpdate
+    if any(prop.startswith(("crossfilter-xaxis", "crossfilter-yaxis")) for prop in triggered):
+        # the zoom belongs to the previous axes, reset_zoom clears it
+        relayout_data = None
+
+    if relayout_data:
+        in_view = np.ones(len(x), dtype=bool)
+        for axis, values, axis_type in (("xaxis", x, xaxis_type), ("yaxis", y, yaxis_type)):
+            bounds = _zoom_range(relayout_data, axis, axis_type)
+            if bounds is not None:
+                in_view &= (values >= bounds[0]) & (values <= bounds[1])
+        countries, x, y = countries[in_view], x[in_view], y[in_view]
 
+    n_points = len(x)
+    if n_points > MAX_POINTS:
+        keep = grid_sample_indices(x, y, MAX_POINTS)
+        countries, x, y = countries[keep], x[keep], y[keep]
+    names = countries.tolist()
+
+    # plain dicts holding the NumPy arrays, graph objects would validate and copy them
     return {
         "data": [
-            go.Scatter(
-                x=dff[dff["Indicator Name"] == xaxis_column_name]["Value"],
-                y=dff[dff["Indicator Name"] == yaxis_column_name]["Value"],
-                text=dff[dff["Indicator Name"] == yaxis_column_name]["Country Name"],
-                customdata=dff[dff["Indicator Name"] == yaxis_column_name][
-                    "Country Name"
-                ],
-                mode="markers",
-                marker={
-                    "size": 15,
-                    "opacity": 0.5,
-                    "line": {"width": 0.5, "color": "white"},
-                },
-            )
+            {
+                "type": trace_type(n_points),
+                "x": x,
+                "y": y,
+                "text": names,
+                "customdata": names,
+                "mode": "markers",
+                "marker": SCATTER_MARKER,
+            }
         ],
-        "layout": go.Layout(
-            xaxis={
-                "title": xaxis_column_name,
-                "type": "linear" if xaxis_type == "Linear" else "log",
-            },
-            yaxis={
-                "title": yaxis_column_name,
-                "type": "linear" if yaxis_type == "Linear" else "log",
-            },
-            # margin={"l": 40, "b": 30, "t": 10, "r": 0},
-            margin={"l": 80, "b": 60, "t": 20, "r": 20},
-            height=450,
-            hovermode="closest",
-        ),
+        "layout": scatter_layout(xaxis_column_name, yaxis_column_name, xaxis_type, yaxis_type),
     }
 
-def create_time_series(dff, axis_type, title):
+def scatter_layout(xaxis_column_name, yaxis_column_name, xaxis_type, yaxis_type) -> dict:
     return {
-        "data": [go.Scatter(x=dff["Year"], y=dff["Value"], mode="lines+markers")],
+        "xaxis": {
+            "title": {"text": xaxis_column_name},
+            "type": "linear" if xaxis_type == "Linear" else "log",
+        },
+        "yaxis": {
+            "title": {"text": yaxis_column_name},
+            "type": "linear" if yaxis_type == "Linear" else "log",
+        },
+        # "margin": {"l": 40, "b": 30, "t": 10, "r": 0},
+        "margin": {"l": 80, "b": 60, "t": 20, "r": 20},
+        "height": 450,
+        "hovermode": "closest",
+        # keep the user's zoom across updates until the axes change
+        "uirevision": f"{xaxis_column_name}|{xaxis_type}|{yaxis_column_name}|{yaxis_type}",
+    }
+
+def update_year_slices(xaxis_column_name, yaxis_column_name) -> dict:
+    """
+    Points of every year for the selected indicators, for the clientside figure.
+    Countries are sent once and referenced by position in each year's slice.
+    """
+    years = {}
+    for year in store.years.tolist():
+        codes, x, y = store.scatter_codes(year, xaxis_column_name, yaxis_column_name)
+        kind = trace_type(len(x))
+        if len(x) > MAX_POINTS:
+            keep = grid_sample_indices(x, y, MAX_POINTS)
+            codes, x, y = codes[keep], x[keep], y[keep]
+        years[str(year)] = {"country": codes, "x": x, "y": y, "type": kind}
+
+    used = np.unique(np.concatenate([year_slice["country"] for year_slice in years.values()]))
+    for year_slice in years.values():
+        year_slice["country"] = np.searchsorted(used, year_slice["country"]).astype(np.int32)
+    return {
+        "countries": store.countries[used].tolist(),
+        "years": years,
+        "trace": {"mode": "markers", "marker": SCATTER_MARKER},
+        # axis types and uirevision are filled in by the clientside callback
+        "layout": scatter_layout(xaxis_column_name, yaxis_column_name, "Linear", "Linear"),
+    }
+
+# Mirrors update_graph, from the slices of update_year_slices
+YEAR_SLICES_FIGURE = """
+function(slices, year, xaxisType, yaxisType) {
+    if (!slices) {
+        return window.dash_clientside.no_update;
+    }
+    const slice = slices.years[String(year)] || {country: [], x: [], y: [], type: "scatter"};
+    const names = slice.country.map((code) => slices.countries[code]);
+    const trace = Object.assign({}, slices.trace, {
+        type: slice.type, x: slice.x, y: slice.y, text: names, customdata: names,
+    });
+    const layout = JSON.parse(JSON.stringify(slices.layout));
+    layout.xaxis.type = xaxisType === "Linear" ? "linear" : "log";
+    layout.yaxis.type = yaxisType === "Linear" ? "linear" : "log";
+    layout.uirevision = [layout.xaxis.title.text, xaxisType, layout.yaxis.title.text, yaxisType].join("|");
+    return {data: [trace], layout: layout};
+}
+"""
+
+def reset_zoom(*_):
+    """Forget the zoom when the axes change, it belongs to the previous indicators"""
+    return None
+
+def create_time_series(years, values, axis_type, title):
+    n_points = len(years)
+    if n_points > MAX_POINTS:
+        keep = lttb_indices(years, values, MAX_POINTS)
+        years, values = years[keep], values[keep]
+    return {
+        "data": [{"type": trace_type(n_points), "x": years, "y": values, "mode": "lines+markers"}],
         "layout": {
             "height": 225,
             # "margin": {"l": 20, "b": 30, "r": 10, "t": 10},
@@ -197,17 +321,37 @@ def create_time_series(dff, axis_type, title):
 
 def update_y_timeseries(hoverData, xaxis_column_name, axis_type):
     country_name = hoverData["points"][0]["customdata"]
-    dff = df[df["Country Name"] == country_name]
-    dff = dff[dff["Indicator Name"] == xaxis_column_name]
+    years, values = store.timeseries(country_name, xaxis_column_name)
     title = f"<b>{country_name}</b><br>{xaxis_column_name}"
-    return create_time_series(dff, axis_type, title)
+    return create_time_series(years, values, axis_type, title)
 
 def update_x_timeseries(hoverData, yaxis_column_name, axis_type):
-    dff = df[df["Country Name"] == hoverData["points"][0]["customdata"]]
-    dff = dff[dff["Indicator Name"] == yaxis_column_name]
-    return create_time_series(dff, axis_type, yaxis_column_name)
+    years, values = store.timeseries(hoverData["points"][0]["customdata"], yaxis_column_name)
+    return create_time_series(years, values, axis_type, yaxis_column_name)
+
+def init_scatter_callbacks(flask_dash_app: FlaskDash):
+    if CLIENTSIDE_YEARS:
+        # the server is only asked again when the indicator selection changes
+        flask_dash_app.callback(
+            Output("crossfilter-year-slices", "data"),
+            [
+                Input("crossfilter-xaxis-column", "value"),
+                Input("crossfilter-yaxis-column", "value"),
+            ],
+        )(update_year_slices)
+
+        flask_dash_app.clientside_callback(
+            YEAR_SLICES_FIGURE,
+            Output("crossfilter-indicator-scatter", "figure"),
+            [
+                Input("crossfilter-year-slices", "data"),
+                Input("crossfilter-year--slider", "value"),
+                Input("crossfilter-xaxis-type", "value"),
+                Input("crossfilter-yaxis-type", "value"),
+            ],
+        )
+        return
 
-def init_callbacks(flask_dash_app: FlaskDash):
     flask_dash_app.callback(
         Output("crossfilter-indicator-scatter", "figure"),
         [
@@ -216,9 +360,24 @@ def init_callbacks(flask_dash_app: FlaskDash):
             Input("crossfilter-xaxis-type", "value"),
             Input("crossfilter-yaxis-type", "value"),
             Input("crossfilter-year--slider", "value"),
+            Input("crossfilter-indicator-scatter", "relayoutData"),
         ],
     )(update_graph)
 
+    flask_dash_app.callback(
+        Output("crossfilter-indicator-scatter", "relayoutData"),
+        [
+            Input("crossfilter-xaxis-column", "value"),
+            Input("crossfilter-yaxis-column", "value"),
+            Input("crossfilter-xaxis-type", "value"),
+            Input("crossfilter-yaxis-type", "value"),
+        ],
+        prevent_initial_call=True,
+    )(reset_zoom)
+
+def init_callbacks(flask_dash_app: FlaskDash):
+    init_scatter_callbacks(flask_dash_app)
+
     flask_dash_app.callback(
         Output("x-time-series", "figure"),
         [
@@ -0,0 +1,94 @@
+"""
+Server-side downsampling, so figure payloads stay bounded whatever the data size.
+
+`lttb_indices` keeps the visual shape of a line (Largest-Triangle-Three-Buckets),
+`grid_sample_indices` thins a scatter plot cell by cell while keeping its density
+and its outliers. Both return indices into the input, so the caller can pick the
+matching labels and hover data.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: split the points into `n_out - 2` buckets and keep
+    the first point, the last point and, per bucket, the point forming the largest
+    triangle with the previously kept point and the average of the next bucket
+
+    :param x: sorted x values
+    :returns: `n_out` increasing indices, or all of them when there are fewer points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # bucket i holds points edges[i]:edges[i + 1], the first and last points stand alone
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    # the last bucket looks ahead to the last point
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[a], y[a]
+        areas = np.abs(
+            (ax - mean_x[bucket]) * (y[start:end] - ay) - (ax - x[start:end]) * (mean_y[bucket] - ay)
+        )
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+    return selected
+
+
+def grid_sample_indices(x: np.ndarray, y: np.ndarray, n_out: int, seed: int = 0) -> np.ndarray:
+    """
+    Thin a scatter plot to about `n_out` points: every occupied cell of a grid over
+    the points keeps at least one point (outliers survive), the rest of the budget is
+    shared between cells in proportion to their counts (dense regions stay dense)
+
+    :returns: increasing indices, or all of them when there are at most `n_out` points
+    """
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # at most half the budget goes to the one-point-per-cell minimum
+    bins = max(int(np.sqrt(n_out / 2)), 1)
+    cells = _bin(x, bins) * bins + _bin(y, bins)
+
+    # points within a cell are taken in a fixed pseudo-random order
+    order = np.random.default_rng(seed).permutation(n)
+    order = order[np.argsort(cells[order], kind="stable")]
+    sorted_cells = cells[order]
+    _, starts, counts = np.unique(sorted_cells, return_index=True, return_counts=True)
+
+    # one point per cell, plus the rest of the budget shared in proportion to the
+    # remaining points (largest remainder, so rounding down does not waste it)
+    share = (counts - 1) * ((n_out - len(counts)) / (n - len(counts)))
+    quota = 1 + share.astype(np.int64)
+    leftover = n_out - int(quota.sum())
+    if leftover > 0:
+        quota[np.argpartition(quota - share, leftover - 1)[:leftover]] += 1
+    rank = np.arange(n) - np.repeat(starts, counts)
+    keep = order[rank < np.repeat(quota, counts)]
+    keep.sort()
+    return keep
+
+
+def _bin(values: np.ndarray, bins: int) -> np.ndarray:
+    """Grid column of each value, NaNs go to the first column"""
+    low, high = np.nanmin(values), np.nanmax(values)
+    if not np.isfinite(low) or high <= low:
+        return np.zeros(len(values), dtype=np.int64)
+    index = ((np.nan_to_num(values, nan=low) - low) * (bins / (high - low))).astype(np.int64, copy=False)
+    return np.clip(index, 0, bins - 1)
@@ -1,8 +1,279 @@
+from functools import wraps
+import importlib.util
+from os import environ
+import time
+
 import dash
-from flask import render_template
+from dash.exceptions import PreventUpdate
+from dash.fingerprint import check_fingerprint
+from flask import Flask, render_template, request, Response
 from markupsafe import Markup
+import plotly.io as pio
+
+from utils import logger
+from utils.assets import ONE_YEAR
+from utils.http_cache import CachedPayload, compress_response
+from utils.metrics import metrics
+
+# More distinct index pages than this per app means they are not static, stop caching
+MAX_CACHED_SHELLS = 16
+# Seconds to cache the serialized result of layout functions, off when unset. Only for
+# layouts that do not depend on the request or user, every client gets the same copy.
+DASH_LAYOUT_TTL = environ.get("DASH_LAYOUT_TTL")
+# JSON engine for callback responses and layouts: "orjson", "json", or "auto" for
+# orjson when it is installed
+DASH_JSON_ENGINE = environ.get("DASH_JSON_ENGINE", "auto").lower()
+
+
+def set_json_engine(engine: str) -> str:
+    """
+    Select the engine of `plotly.io.json.to_json_plotly`, which Dash encodes every
+    callback response with. orjson writes NumPy arrays natively; figures built from
+    plain dicts and arrays (rather than graph objects) take its fast path with no
+    per-element conversion. The setting is process wide, so it is made once, when
+    this module is imported, rather than per app.
+
+    :returns: the engine now in use
+    """
+    if engine not in ("auto", "orjson", "json"):
+        raise ValueError(f"Unknown JSON engine {engine!r}, expected 'auto', 'orjson' or 'json'")
+    if engine != "json" and importlib.util.find_spec("orjson") is None:
+        if engine == "orjson":
+            logger.warning("orjson is not installed, Dash responses are encoded with json")
+        engine = "json"
+    elif engine == "auto":
+        engine = "orjson"
+    pio.json.config.default_engine = engine
+    return engine
+
+
+JSON_ENGINE = set_json_engine(DASH_JSON_ENGINE)
+
+
+def layout_components(layout) -> dict[str, object]:
+    """Components of the layout tree that have a string id, by id"""
+    return {
+        component.id: component
+        for component in (layout, *layout._traverse())
+        if isinstance(getattr(component, "id", None), str)
+    }
+
+
+def callback_request(callback: dict, components: dict[str, object]) -> dict | None:
+    """
+    `_dash-update-component` body of an initial call of `callback` (an entry of
+    `Dash._callback_list`) with the values its inputs have in the layout, None for
+    pattern-matching callbacks
+    """
+    output = callback["output"]
+    dependencies = callback["inputs"] + callback["state"]
+    if "{" in output or any(dependency["id"].startswith("{") for dependency in dependencies):
+        return None
+
+    def prop(spec: str) -> dict:
+        component_id, name = spec.rsplit(".", 1)
+        return {"id": component_id, "property": name}
+
+    if output.startswith(".."):
+        outputs = [prop(spec) for spec in output[2:-2].split("...")]
+    else:
+        outputs = prop(output)
+
+    def with_values(dependencies: list[dict]) -> list[dict]:
+        return [
+            {**dependency, "value": getattr(components.get(dependency["id"]), dependency["property"], None)}
+            for dependency in dependencies
+        ]
+
+    return {
+        "output": output,
+        "outputs": outputs,
+        "inputs": with_values(callback["inputs"]),
+        "state": with_values(callback["state"]),
+        "changedPropIds": [],
+    }
+
 
 class FlaskDash(dash.Dash):
+    def __init__(self, *args, layout_ttl: float | None = None, **kwargs):
+        """
+        Responses are encoded with the process wide $DASH_JSON_ENGINE (see `set_json_engine`)
+
+        :param layout_ttl: seconds to reuse the output of a layout function, defaults to
+            $DASH_LAYOUT_TTL, None to call it on every page load. Static layouts are
+            always serialized once.
+        """
+        # rendered shells per interpolate_index inputs, and their payloads per rendered page
+        self._index_shells: dict[tuple, str] = {}
+        self._index_payloads: dict[str, CachedPayload] = {}
+        self.json_engine = JSON_ENGINE
+        # component suites per (package, path without its fingerprint), only registered
+        # resources get there so the cache is bounded by the app's dependencies
+        self._suite_payloads: dict[tuple[str, str], CachedPayload] = {}
+        # (extra component count, expiry, payload) of the serialized layout
+        self._layout_cache: tuple[int, float, CachedPayload] | None = None
+        if layout_ttl is None and DASH_LAYOUT_TTL:
+            layout_ttl = float(DASH_LAYOUT_TTL)
+        self.layout_ttl = layout_ttl
+        super().__init__(*args, **kwargs)
+        if isinstance(self.server, Flask):
+            self.server.after_request(self._compress_response)
+            self.server.extensions["flask_dash"] = self
+
+    def callback(self, *args, **kwargs):
+        """
+        Register a callback like `dash.Dash.callback`, recording its latency,
+        calls, errors and in-flight count under its output id
+        """
+        register = super().callback(*args, **kwargs)
+        outputs = args[0] if args else kwargs.get("output")
+        if isinstance(outputs, (list, tuple)):
+            output_id = ",".join(str(output) for output in outputs)
+        else:
+            output_id = str(outputs)
+
+        def decorator(func):
+            @wraps(func)
+            def timed_callback(*func_args, **func_kwargs):
+                metrics.gauge_add("dash_callbacks_in_flight", 1, callback=output_id)
+                start = time.perf_counter()
+                try:
+                    return func(*func_args, **func_kwargs)
+                except PreventUpdate:
+                    raise
+                except Exception:
+                    metrics.inc("dash_callback_errors_total", callback=output_id)
+                    raise
+                finally:
+                    metrics.gauge_add("dash_callbacks_in_flight", -1, callback=output_id)
+                    metrics.observe("dash_callback_duration_seconds", time.perf_counter() - start, callback=output_id)
+                    metrics.inc("dash_callback_calls_total", callback=output_id)
+
+            return register(timed_callback)
+
+        return decorator
+
+    def warm_up(self) -> None:
+        """
+        Render the index page and the layout, and call every server-side callback once
+        with the initial values of its inputs in the layout, so caches, lazy imports
+        and worker pools are ready before the first user
+        """
+        client = self.server.test_client()
+        prefix = self.config.routes_pathname_prefix
+        client.get(prefix)
+        client.get(f"{prefix}_dash-layout")
+
+        components = layout_components(self.get_layout())
+        for callback in self._callback_list:
+            if callback.get("clientside_function") or callback.get("background"):
+                continue
+            body = callback_request(callback, components)
+            if body is None:
+                continue
+            # layout values can be NumPy scalars, encode them like Dash does
+            response = client.post(
+                f"{prefix}_dash-update-component",
+                data=pio.json.to_json_plotly(body),
+                content_type="application/json",
+            )
+            if response.status_code >= 400:
+                logger.warning(f"Warm-up call of callback {callback['output']} answered {response.status_code}")
+
+    @property
+    def layout(self):
+        return dash.Dash.layout.fget(self)
+
+    @layout.setter
+    def layout(self, value):
+        dash.Dash.layout.fset(self, value)
+        self._layout_cache = None
+
+    def _layout_payload(self) -> CachedPayload | None:
+        """Serialized layout, from the cache while it is valid, None when it may not be cached"""
+        static = not self._layout_is_function and not self._hooks.get_hooks("layout")
+        if not static and self.layout_ttl is None:
+            return None
+        extras = len(self._extra_components)
+        now = time.monotonic()
+        cached = self._layout_cache
+        if cached is not None and cached[0] == extras and (static or now < cached[1]):
+            return cached[2]
+
+        payload = CachedPayload(pio.json.to_json_plotly(self.get_layout()), "application/json")
+        self._layout_cache = (extras, now + (self.layout_ttl or 0), payload)
+        return payload
+
+    def serve_layout(self) -> Response:
+        """
+        Serve the layout JSON with an ETag and precompressed variants. A static layout
+        is serialized once (again if `layout` is reassigned, in-place changes to the
+        component tree are not picked up); layout functions run on every request
+        unless `layout_ttl` is set.
+        """
+        payload = self._layout_payload()
+        if payload is None:
+            return compress_response(super().serve_layout())
+        return payload.response()
+
+    def _add_url(self, name: str, view_func, methods=("GET",)) -> None:
+        if name.startswith("_dash-component-suites/"):
+            view_func = self._cached_suites(view_func)
+        super()._add_url(name, view_func, methods)
+
+    def _cached_suites(self, serve):
+        """
+        Wrap Dash's component suite view: a suite (JS bundle) is read and compressed
+        once, then served from memory, as immutable when the path is fingerprinted.
+        Dash's view rejects resources that are not registered, so only those are cached.
+        """
+
+        @wraps(serve)
+        def serve_cached(package_name: str, fingerprinted_path: str) -> Response:
+            path, fingerprinted = check_fingerprint(fingerprinted_path)
+            payload = self._suite_payloads.get((package_name, path))
+            if payload is None:
+                response = serve(package_name, fingerprinted_path)
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                payload = self._suite_payloads.setdefault(
+                    (package_name, path), CachedPayload(response.get_data(), response.mimetype)
+                )
+            if fingerprinted:
+                return payload.response(max_age=ONE_YEAR, immutable=True)
+            return payload.response()
+
+        return serve_cached
+
+    def _compress_response(self, response: Response) -> Response:
+        """Compress callback responses on the fly"""
+        if request.path.endswith("/_dash-update-component"):
+            return compress_response(response)
+        return response
+
+    def _config(self):
+        config = super()._config()
+        # Dash signs a fresh end_id token into every page load, it is only used to bind
+        # background callback handles. Apps without background callbacks leave it out
+        # so their index page stays static and cacheable.
+        if "end_id" in config and not any(cb.get("background") for cb in self.callback_map.values()):
+            del config["end_id"]
+        return config
+
+    def index(self, *args, **kwargs) -> Response:
+        """
+        Serve the index page from a cached payload with a strong ETag and
+        precompressed variants
+        """
+        page = super().index(*args, **kwargs)
+        # interpolate_index hands back the same cached str, whose hash Python keeps
+        payload = self._index_payloads.get(page)
+        if payload is None:
+            payload = CachedPayload(page)
+            if len(self._index_payloads) < MAX_CACHED_SHELLS:
+                self._index_payloads[page] = payload
+        return payload.response()
+
     def interpolate_index(
         self,
         metas="",
@@ -16,11 +287,17 @@ class FlaskDash(dash.Dash):
     ) -> str:
         """
         Override the default interpolate_index function in order to provide
-        support for flask
+        support for flask. The rendered shell only changes when the app is
+        deployed, so it is cached per set of inputs.
         """
+        key = (metas, css, config, scripts, app_entry, renderer)
+        shell = self._index_shells.get(key)
+        if shell is not None:
+            return shell
+
         # markupsafe.Markup is used to prevent Jinja from
         # escaping the Dash-rendered markup
-        return render_template(
+        shell = render_template(
             "dash.html",
             metas=Markup(metas),
             css=Markup(css),
@@ -32,3 +309,6 @@ class FlaskDash(dash.Dash):
             app_entry=Markup(app_entry),
             renderer=Markup(renderer),
         )
+        if len(self._index_shells) < MAX_CACHED_SHELLS:
+            self._index_shells[key] = shell
+        return shell
@@ -0,0 +1,158 @@
+"""
+Indexed columnar store for the World-Bank style indicators dataset
+(one row per country, indicator and year).
+
+The rows are kept twice as contiguous NumPy columns, once ordered by
+(year, indicator, country) and once by (country, indicator, year), with a dict
+mapping every (year, indicator) and (country, indicator) pair to its slice. A
+crossfilter lookup is then a dict lookup plus a slice instead of boolean-mask
+scans over the whole frame. `from_csv` maps these columns read-only from a
+columnar cache, so all worker processes share one copy.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar_cache import load_columnar
+
+
+def _group_table(*keys: np.ndarray) -> np.ndarray:
+    """
+    One row per run of equal keys in the (sorted) key columns:
+    the key values followed by the run's start and stop
+    """
+    n = len(keys[0])
+    if n == 0:
+        return np.empty((0, len(keys) + 2), dtype=np.int64)
+    boundary = np.zeros(n, dtype=bool)
+    boundary[0] = True
+    for key in keys:
+        boundary[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(boundary)
+    stops = np.append(starts[1:], n)
+    return np.column_stack([key[starts] for key in keys] + [starts, stops]).astype(np.int64)
+
+
+def _group_slices(table: np.ndarray) -> dict[tuple, slice]:
+    return {
+        tuple(row[:-2]): slice(row[-2], row[-1])
+        for row in table.tolist()
+    }
+
+
+class IndicatorStore:
+    # bump when the layout written by build_columns changes
+    LAYOUT_VERSION = 1
+
+    def __init__(self, columns: dict[str, np.ndarray], countries: list[str], indicators: list[str]):
+        """
+        :param columns: the layout arrays produced by `build_columns`
+        :param countries: country names, indexed by country code
+        :param indicators: indicator names, indexed by indicator code
+        """
+        self.countries = np.asarray(countries, dtype=object)
+        self.indicators = np.asarray(indicators, dtype=object)
+        self._country_code = {name: code for code, name in enumerate(countries)}
+        self._indicator_code = {name: code for code, name in enumerate(indicators)}
+        self.years = columns["years"]
+
+        # rows ordered by year, indicator, country: scatter plot lookups
+        self._by_year_country = columns["by_year_country"]
+        self._by_year_value = columns["by_year_value"]
+        self._by_year = _group_slices(columns["by_year_groups"])
+
+        # rows ordered by country, indicator, year: time series lookups
+        self._by_country_year = columns["by_country_year"]
+        self._by_country_value = columns["by_country_value"]
+        self._by_country = _group_slices(columns["by_country_groups"])
+
+    @staticmethod
+    def build_columns(df: pd.DataFrame) -> tuple[dict[str, np.ndarray], dict]:
+        """Turn the long-format frame into the store's sorted layout arrays and metadata"""
+        country_codes, countries = pd.factorize(df["Country Name"], sort=True)
+        indicator_codes, indicators = pd.factorize(df["Indicator Name"], sort=True)
+        years = df["Year"].to_numpy(dtype=np.int64)
+        values = df["Value"].to_numpy(dtype=np.float64)
+
+        by_year = np.lexsort((country_codes, indicator_codes, years))
+        by_country = np.lexsort((years, indicator_codes, country_codes))
+        columns = {
+            "years": np.unique(years),
+            "by_year_country": country_codes[by_year].astype(np.int32),
+            "by_year_value": values[by_year],
+            "by_year_groups": _group_table(years[by_year], indicator_codes[by_year]),
+            "by_country_year": years[by_country],
+            "by_country_value": values[by_country],
+            "by_country_groups": _group_table(country_codes[by_country], indicator_codes[by_country]),
+        }
+        meta = {"countries": countries.tolist(), "indicators": indicators.tolist()}
+        return columns, meta
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "IndicatorStore":
+        columns, meta = cls.build_columns(df)
+        return cls(columns, **meta)
+
+    @classmethod
+    def from_csv(cls, path: str | Path, cache_dir: str | Path | None = None) -> "IndicatorStore":
+        """
+        Load the store from its memory-mapped columnar cache, converting the CSV
+        the first time and whenever it changes
+        """
+        columns, meta = load_columnar(
+            path,
+            lambda source: cls.build_columns(pd.read_csv(source)),
+            cache_dir=cache_dir,
+            version=cls.LAYOUT_VERSION,
+        )
+        return cls(columns, **meta)
+
+    def _year_slice(self, year, indicator: str) -> slice | None:
+        code = self._indicator_code.get(indicator)
+        if code is None:
+            return None
+        return self._by_year.get((year, code))
+
+    def scatter_codes(self, year, x_indicator: str, y_indicator: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Values of two indicators in one year, aligned by country
+
+        :returns: (country codes, x values, y values) for the countries that have both
+        """
+        x_slice = self._year_slice(year, x_indicator)
+        y_slice = self._year_slice(year, y_indicator)
+        if x_slice is None or y_slice is None:
+            empty = np.empty(0)
+            return np.empty(0, dtype=np.int32), empty, empty
+
+        # both slices are sorted by country code, so intersecting them aligns the rows
+        codes, x_index, y_index = np.intersect1d(
+            self._by_year_country[x_slice],
+            self._by_year_country[y_slice],
+            return_indices=True,
+        )
+        return codes, self._by_year_value[x_slice][x_index], self._by_year_value[y_slice][y_index]
+
+    def scatter(self, year, x_indicator: str, y_indicator: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Values of two indicators in one year, aligned by country
+
+        :returns: (country names, x values, y values) for the countries that have both
+        """
+        codes, x, y = self.scatter_codes(year, x_indicator, y_indicator)
+        return self.countries[codes], x, y
+
+    def timeseries(self, country: str, indicator: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Yearly values of one indicator for one country
+
+        :returns: (years, values), views into the store ordered by year. They are
+            plain ndarrays rather than memmaps, which JSON encoders such as orjson reject.
+        """
+        country_code = self._country_code.get(country)
+        indicator_code = self._indicator_code.get(indicator)
+        rows = self._by_country.get((country_code, indicator_code))
+        if rows is None:
+            rows = slice(0, 0)
+        return np.asarray(self._by_country_year[rows]), np.asarray(self._by_country_value[rows])
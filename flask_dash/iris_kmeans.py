@@ -3,19 +3,37 @@ Dash port of Shiny iris k-means example:
 
 https://shiny.rstudio.com/gallery/kmeans-example.html
 """
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+import multiprocessing
+from os import environ
+import threading
+
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
-import plotly.graph_objs as go
 from sklearn import datasets
 from sklearn.cluster import KMeans
 
+from utils.lru_cache import SizedLRUCache
 from .flask_dash_integrator import FlaskDash
 
 iris_raw = datasets.load_iris()
 iris = pd.DataFrame(iris_raw["data"], columns=iris_raw["feature_names"])
 
+# Fitted results per (x, y, n_clusters), bounded by the size of labels, centers and figure arrays
+kmeans_cache = SizedLRUCache(max_bytes=int(environ.get("KMEANS_CACHE_BYTES", 16 * 1024 * 1024)))
+# 0 fits in the request thread
+KMEANS_PROCESSES = int(environ.get("KMEANS_PROCESSES", 2))
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+# most recent pending fit per browser tab, older ones are dropped
+_latest_fit: dict[str, Future] = {}
+_latest_fit_lock = threading.Lock()
+
 controls = dbc.Card(
     [
         dbc.Col(
@@ -59,6 +77,8 @@ app_layout = dbc.Container(
             ],
             align="center",
         ),
+        # id of this browser tab, set in the browser, so that a newer fit only replaces the tab's own
+        dcc.Store(id="kmeans-client"),
     ],
     fluid=True,
 )
@@ -70,39 +90,119 @@ def filter_options(v):
     return [{"label": col, "value": col, "disabled": col == v} for col in iris.columns]
 
 
-def make_graph(x, y, n_clusters):
+class KMeansResult:
+    __slots__ = ("labels", "centers", "figure")
+
+    def __init__(self, labels: np.ndarray, centers: np.ndarray, figure: dict):
+        self.labels = labels
+        self.centers = centers
+        self.figure = figure
+
+    @property
+    def size(self) -> int:
+        arrays = sum(trace["x"].nbytes + trace["y"].nbytes for trace in self.figure["data"])
+        return self.labels.nbytes + self.centers.nbytes + arrays
+
+
+def fit_kmeans(values: np.ndarray, n_clusters: int) -> tuple[np.ndarray, np.ndarray]:
+    """Runs in the process pool, returns the labels and cluster centers"""
     # minimal input validation, make sure there's at least one cluster
     km = KMeans(n_clusters=max(n_clusters, 1))
-    df = iris.loc[:, [x, y]]  # noqa: PD901
-    km.fit(df.values)
-    df["cluster"] = km.labels_
+    km.fit(values)
+    return km.labels_, km.cluster_centers_
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if _executor is None and KMEANS_PROCESSES > 0:
+        with _executor_lock:
+            if _executor is None:
+                # spawned, not forked: the process already runs the log, market and warm-up threads
+                _executor = ProcessPoolExecutor(
+                    max_workers=KMEANS_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
 
-    centers = km.cluster_centers_
+def _fit(values: np.ndarray, n_clusters: int, client: str | None) -> tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Fit in the process pool. A newer fit from the same client (browser tab) cancels
+    this one if it has not started yet, otherwise this one is flagged as superseded.
 
+    :returns: (labels, centers, superseded)
+    """
+    executor = _get_executor()
+    if executor is None:
+        return (*fit_kmeans(values, n_clusters), False)
+
+    future = executor.submit(fit_kmeans, values, n_clusters)
+    if client is not None:
+        with _latest_fit_lock:
+            previous = _latest_fit.get(client)
+            _latest_fit[client] = future
+        if previous is not None:
+            previous.cancel()
+
+    try:
+        labels, centers = future.result()
+    except CancelledError:
+        raise PreventUpdate from None
+
+    superseded = False
+    if client is not None:
+        with _latest_fit_lock:
+            superseded = _latest_fit.get(client) is not future
+            if not superseded:
+                del _latest_fit[client]
+    return labels, centers, superseded
+
+
+def create_figure(x, y, values: np.ndarray, n_clusters, labels: np.ndarray, centers: np.ndarray) -> dict:
+    """
+    Figure as plain dicts of NumPy arrays, which the orjson engine encodes directly
+    (see `FlaskDash`), graph objects would validate and copy every array
+    """
     data = [
-        go.Scatter(
-            x=df.loc[df.cluster == c, x],
-            y=df.loc[df.cluster == c, y],
-            mode="markers",
-            marker={"size": 8},
-            name=f"Cluster {c}",
-        )
+        {
+            "type": "scatter",
+            "x": values[labels == c, 0],
+            "y": values[labels == c, 1],
+            "mode": "markers",
+            "marker": {"size": 8},
+            "name": f"Cluster {c}",
+        }
         for c in range(n_clusters)
     ]
 
     data.append(
-        go.Scatter(
-            x=centers[:, 0],
-            y=centers[:, 1],
-            mode="markers",
-            marker={"color": "#000", "size": 12, "symbol": "diamond"},
-            name="Cluster centers",
-        )
+        {
+            "type": "scatter",
+            "x": centers[:, 0],
+            "y": centers[:, 1],
+            "mode": "markers",
+            "marker": {"color": "#000", "size": 12, "symbol": "diamond"},
+            "name": "Cluster centers",
+        }
     )
 
-    layout = {"xaxis": {"title": x}, "yaxis": {"title": y}}
+    layout = {"xaxis": {"title": {"text": x}}, "yaxis": {"title": {"text": y}}}
 
-    return go.Figure(data=data, layout=layout)
+    return {"data": data, "layout": layout}
+
+
+def make_graph(x, y, n_clusters, client=None):
+    key = (x, y, n_clusters)
+    result: KMeansResult | None = kmeans_cache.get(key)
+    if result is None:
+        values = iris.loc[:, [x, y]].to_numpy()
+        labels, centers, superseded = _fit(values, n_clusters, client)
+        result = KMeansResult(labels, centers, create_figure(x, y, values, n_clusters, labels, centers))
+        kmeans_cache.put(key, result, result.size)
+        if superseded:
+            # the client has already asked for something newer
+            raise PreventUpdate
+
+    return result.figure
 
 
 def init_callbacks(dash_app):
@@ -113,7 +213,19 @@ def init_callbacks(dash_app):
             Input("y-variable", "value"),
             Input("cluster-count", "value"),
         ],
+        [State("kmeans-client", "data")],
     )(make_graph)
+    dash_app.clientside_callback(
+        """
+        function(_) {
+            return window.crypto && crypto.randomUUID
+                ? crypto.randomUUID()
+                : Date.now().toString(36) + Math.random().toString(36).slice(2);
+        }
+        """,
+        Output("kmeans-client", "data"),
+        Input("kmeans-client", "id"),
+    )
     # functionality is the same for both dropdowns, so we reuse filter_options
     dash_app.callback(
         Output("x-variable", "options"),
@@ -0,0 +1,164 @@
+from os import environ
+
+from dash import dcc, html
+from dash.dependencies import Input, Output, State
+import dash_bootstrap_components as dbc
+from flask import Flask
+
+from flask_dash.flask_dash_integrator import FlaskDash
+from market import tick_store
+
+# candles loaded with the page, the stream then updates the latest one and appends new ones
+CANDLES = int(environ.get("LIVE_CHART_CANDLES", 300))
+INTERVALS = ["1s", "1m", "5m", "1h"]
+
+
+def create_page_layout() -> dbc.Container:
+    """
+    Create the layout for this page
+    """
+    page_layout = dbc.Container(
+        [
+            html.H1("Live chart"),
+            html.Hr(),
+            dbc.Row(
+                [
+                    dbc.Col(dcc.Dropdown(id="live-chart-symbol", clearable=False), md=4),
+                    dbc.Col(
+                        dbc.RadioItems(
+                            id="live-chart-interval",
+                            inline=True,
+                            options=[{"label": i, "value": i} for i in INTERVALS],
+                            value="1m",
+                        ),
+                        md=4,
+                    ),
+                    dbc.Col(html.H4(id="live-chart-price"), md=4),
+                ]
+            ),
+            dcc.Graph(id="live-chart-graph", config={"displayModeBar": False}),
+            # the symbol currently streamed, written by the clientside callback
+            dcc.Store(id="live-chart-stream"),
+        ],
+        fluid=True,
+    )
+    return page_layout
+
+page_layout = create_page_layout()
+
+
+def symbol_options(_):
+    symbols = tick_store.symbols()
+    return [{"label": s, "value": s} for s in symbols], symbols[0] if symbols else None
+
+def candle_figure(symbol, interval) -> dict:
+    """History of `symbol`, the stream takes over from the latest candle"""
+    candles = tick_store.candles(symbol, interval, CANDLES)
+    # plain lists, not typed arrays, so that the stream can grow them in the browser
+    columns = {name: candles[name].tolist() for name in ("time", "open", "high", "low", "close")}
+    return {
+        "data": [{
+            "type": "candlestick",
+            "x": [time * 1000 for time in columns.pop("time")],
+            **columns,
+            "name": symbol,
+        }],
+        "layout": {
+            "height": 550,
+            "margin": {"l": 60, "b": 40, "t": 20, "r": 20},
+            "xaxis": {"type": "date", "rangeslider": {"visible": False}},
+            "yaxis": {"title": {"text": symbol}},
+            "uirevision": f"{symbol}|{interval}",
+        },
+    }
+
+# Opens one EventSource per page on /market/stream and applies each message to the
+# chart in place with Plotly, without a round trip through the Dash server.
+# A message carries the two latest candles per interval: the first replaces or
+# closes the chart's last candle, the second is the open one.
+LIVE_STREAM = """
+function(figure, symbol, interval) {
+    if (window.liveChartSource) {
+        window.liveChartSource.close();
+        window.liveChartSource = null;
+    }
+    if (!symbol) {
+        return null;
+    }
+    const source = new EventSource("/market/stream?symbols=" + encodeURIComponent(symbol));
+    source.addEventListener("quote", (event) => {
+        const quote = JSON.parse(event.data);
+        window.dash_clientside.set_props("live-chart-price", {children: quote.price.toFixed(2)});
+        const graph = document.querySelector("#live-chart-graph .js-plotly-plot");
+        if (!graph || !graph.data || !graph.data.length) {
+            return;
+        }
+        const trace = graph.data[0];
+        for (const [time, open, high, low, close] of quote.candles[interval] || []) {
+            const x = time * 1000;
+            const last = trace.x.length - 1;
+            let i = last;
+            if (last < 0 || x > trace.x[last]) {
+                trace.x.push(x); trace.open.push(open); trace.high.push(high);
+                trace.low.push(low); trace.close.push(close);
+                i = last + 1;
+            } else if (x !== trace.x[last]) {
+                continue;
+            }
+            trace.open[i] = open; trace.high[i] = high; trace.low[i] = low; trace.close[i] = close;
+        }
+        const extra = trace.x.length - %d;
+        if (extra > 0) {
+            for (const key of ["x", "open", "high", "low", "close"]) {
+                trace[key].splice(0, extra);
+            }
+        }
+        window.Plotly.redraw(graph);
+    });
+    window.liveChartSource = source;
+    return symbol;
+}
+""" % CANDLES
+
+def init_callbacks(flask_dash_app: FlaskDash):
+    flask_dash_app.callback(
+        [Output("live-chart-symbol", "options"), Output("live-chart-symbol", "value")],
+        [Input("live-chart-interval", "id")],
+    )(symbol_options)
+
+    flask_dash_app.callback(
+        Output("live-chart-graph", "figure"),
+        [Input("live-chart-symbol", "value"), Input("live-chart-interval", "value")],
+    )(candle_figure)
+
+    # (re)subscribe once the history of the selected symbol is drawn
+    flask_dash_app.clientside_callback(
+        LIVE_STREAM,
+        Output("live-chart-stream", "data"),
+        [Input("live-chart-graph", "figure")],
+        [State("live-chart-symbol", "value"), State("live-chart-interval", "value")],
+    )
+
+    return flask_dash_app
+
+
+def init_flask_dash_app(server: Flask):
+    """Create a Plotly Dash dashboard."""
+    flask_dash_app = FlaskDash(
+        server=server,
+        routes_pathname_prefix="/live-chart/",
+    )
+
+    # create dash layout
+    flask_dash_app.layout = page_layout
+
+    # initialize callbacks
+    init_callbacks(flask_dash_app)
+
+    return flask_dash_app.server
+
+
+if __name__ == "__main__":
+    flask_dash_app = FlaskDash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    init_callbacks(flask_dash_app)
+    flask_dash_app.run_server(debug=True, port=8080)
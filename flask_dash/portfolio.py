@@ -0,0 +1,198 @@
+from os import environ
+
+from dash import dash_table, dcc, html, no_update
+from dash.dependencies import Input, Output, State
+import dash_bootstrap_components as dbc
+from flask import Flask
+
+from flask_dash.flask_dash_integrator import FlaskDash
+from market import portfolio_engine
+from utils.sessions import current_user
+
+# users offered to admins in the dropdown, by equity
+USERS_LISTED = int(environ.get("PORTFOLIO_USERS_LISTED", 200))
+# the page refreshes when the market stream has a quote for a held symbol, at most this often
+REFRESH_MS = int(environ.get("PORTFOLIO_REFRESH_MS", 2000))
+
+SUMMARY_FIELDS = [
+    ("equity", "Equity"),
+    ("cash", "Cash"),
+    ("unrealized", "Unrealized P&L"),
+    ("realized", "Realized P&L"),
+    ("gross_exposure", "Gross exposure"),
+]
+POSITION_COLUMNS = [
+    ("symbol", "Symbol"),
+    ("quantity", "Quantity"),
+    ("average_price", "Average price"),
+    ("mark", "Mark"),
+    ("market_value", "Market value"),
+    ("unrealized", "Unrealized P&L"),
+]
+
+
+def create_page_layout() -> dbc.Container:
+    """
+    Create the layout for this page
+    """
+    page_layout = dbc.Container(
+        [
+            html.H1("Portfolio"),
+            html.Hr(),
+            dbc.Row([dbc.Col(dcc.Dropdown(id="portfolio-user", clearable=False), md=4)]),
+            dbc.Row(id="portfolio-summary", className="my-3"),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dash_table.DataTable(
+                            id="portfolio-positions",
+                            columns=[
+                                {"name": name, "id": key, "type": "numeric", "format": {"specifier": ",.2f"}}
+                                if key != "symbol" else {"name": name, "id": key}
+                                for key, name in POSITION_COLUMNS
+                            ],
+                            sort_action="native",
+                            page_size=20,
+                        ),
+                        md=7,
+                    ),
+                    dbc.Col(dcc.Graph(id="portfolio-exposure"), md=5),
+                ]
+            ),
+            # symbols of the shown positions, the clientside callback streams their quotes
+            dcc.Store(id="portfolio-symbols"),
+            dcc.Store(id="portfolio-stream"),
+            # written by the clientside callback when a streamed quote calls for a refresh
+            dcc.Store(id="portfolio-refresh"),
+        ],
+        fluid=True,
+    )
+    return page_layout
+
+page_layout = create_page_layout()
+
+
+def user_options(_):
+    user, admin = current_user()
+    if admin:
+        users = [name for name, _ in portfolio_engine.top(USERS_LISTED)]
+    else:
+        users = [user] if user else []
+    return [{"label": name, "value": name} for name in users], users[0] if users else None
+
+def summary_cards(snapshot: dict) -> list:
+    return [
+        dbc.Col(dbc.Card(dbc.CardBody([html.H6(label), html.H4(f"{snapshot[key]:,.2f}")])))
+        for key, label in SUMMARY_FIELDS
+    ]
+
+def exposure_figure(positions: list[dict]) -> dict:
+    return {
+        "data": [{
+            "type": "bar",
+            "x": [position["market_value"] for position in positions],
+            "y": [position["symbol"] for position in positions],
+            "orientation": "h",
+            "marker": {"color": ["#2c7be5" if position["market_value"] >= 0 else "#e63757" for position in positions]},
+        }],
+        "layout": {
+            "height": 450,
+            "margin": {"l": 80, "b": 40, "t": 20, "r": 20},
+            "xaxis": {"title": {"text": "Market value"}},
+            "yaxis": {"autorange": "reversed"},
+        },
+    }
+
+def update_portfolio(user, _, streamed):
+    viewer_name, admin = current_user()
+    if viewer_name is None and not admin:
+        return dbc.Col(html.P("Sign in to see your portfolio")), [], exposure_figure([]), []
+    # the dropdown value comes from the browser, only admins look at other users
+    snapshot = portfolio_engine.snapshot(user) if user and (admin or user == viewer_name) else None
+    if snapshot is None:
+        return [], [], exposure_figure([]), []
+    positions = snapshot["positions"]
+    symbols = sorted(position["symbol"] for position in positions)
+    return (
+        summary_cards(snapshot),
+        positions,
+        exposure_figure(positions),
+        no_update if symbols == streamed else symbols,
+    )
+
+# Opens one EventSource per page on /market/stream for the held symbols. A quote
+# only schedules a refresh of the page, at most one per REFRESH_MS.
+PORTFOLIO_STREAM = """
+function(symbols) {
+    if (window.portfolioSource) {
+        window.portfolioSource.close();
+        window.portfolioSource = null;
+    }
+    if (!symbols || !symbols.length) {
+        return null;
+    }
+    const source = new EventSource("/market/stream?symbols=" + encodeURIComponent(symbols.join(",")));
+    let last = 0;
+    let timer = null;
+    source.addEventListener("quote", () => {
+        if (timer !== null) {
+            return;
+        }
+        timer = setTimeout(() => {
+            timer = null;
+            last = Date.now();
+            window.dash_clientside.set_props("portfolio-refresh", {data: last});
+        }, Math.max(0, last + %d - Date.now()));
+    });
+    window.portfolioSource = source;
+    return symbols;
+}
+""" % REFRESH_MS
+
+def init_callbacks(flask_dash_app: FlaskDash):
+    flask_dash_app.callback(
+        [Output("portfolio-user", "options"), Output("portfolio-user", "value")],
+        [Input("portfolio-user", "id")],
+    )(user_options)
+
+    flask_dash_app.callback(
+        [
+            Output("portfolio-summary", "children"),
+            Output("portfolio-positions", "data"),
+            Output("portfolio-exposure", "figure"),
+            Output("portfolio-symbols", "data"),
+        ],
+        [Input("portfolio-user", "value"), Input("portfolio-refresh", "data")],
+        [State("portfolio-symbols", "data")],
+    )(update_portfolio)
+
+    # (re)subscribe when the held symbols change
+    flask_dash_app.clientside_callback(
+        PORTFOLIO_STREAM,
+        Output("portfolio-stream", "data"),
+        [Input("portfolio-symbols", "data")],
+    )
+
+    return flask_dash_app
+
+
+def init_flask_dash_app(server: Flask):
+    """Create a Plotly Dash dashboard."""
+    flask_dash_app = FlaskDash(
+        server=server,
+        routes_pathname_prefix="/portfolio/",
+    )
+
+    # create dash layout
+    flask_dash_app.layout = page_layout
+
+    # initialize callbacks
+    init_callbacks(flask_dash_app)
+
+    return flask_dash_app.server
+
+
+if __name__ == "__main__":
+    flask_dash_app = FlaskDash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    init_callbacks(flask_dash_app)
+    flask_dash_app.run_server(debug=True, port=8080)
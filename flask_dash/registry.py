@@ -0,0 +1,193 @@
+"""
+Lazy mounting of the Dash apps.
+
+Every Dash app is registered with its URL prefix and module at startup, but its
+module (with pandas, plotly, sklearn and its datasets) is only imported, and its
+layout and callbacks only built, on the first request to that prefix or from the
+background warm-up thread. Each app gets its own Flask server sharing the main
+app's config and templates, because Flask does not accept new routes once the
+main app has started serving; a WSGI dispatcher in front of the main app hands
+requests under a registered prefix to that server.
+"""
+from collections.abc import Callable
+import importlib
+import threading
+import time
+
+from flask import Flask, Response
+
+from utils import logger
+
+# seconds before mounting an app that failed to mount is tried again
+MOUNT_RETRY_AFTER = 60
+
+
+class DashMountError(Exception):
+    """Raised when a Dash app's module could not be imported or its app built"""
+
+
+class DashAppEntry:
+    __slots__ = ("prefix", "module_name", "server", "import_time", "init_time", "lock", "error", "failed_at")
+
+    def __init__(self, prefix: str, module_name: str):
+        self.prefix = prefix
+        self.module_name = module_name
+        self.server: Flask | None = None
+        self.import_time: float | None = None
+        self.init_time: float | None = None
+        self.lock = threading.Lock()
+        # last mount failure, answered with a 503 until MOUNT_RETRY_AFTER has passed
+        self.error: str | None = None
+        self.failed_at = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "prefix": self.prefix,
+            "module": self.module_name,
+            "mounted": self.server is not None,
+            "import_time": self.import_time,
+            "init_time": self.init_time,
+            "error": self.error,
+        }
+
+
+class DashRegistry:
+    def __init__(self, flask_app: Flask):
+        self.flask_app = flask_app
+        self._entries: dict[str, DashAppEntry] = {}
+        self._mount_hooks: list[Callable[[Flask], None]] = []
+        flask_app.extensions["dash_registry"] = self
+        flask_app.wsgi_app = LazyDashDispatcher(flask_app.wsgi_app, self)
+
+    def register(self, prefix: str, module_name: str) -> None:
+        """
+        Register the Dash app built by `module_name.init_flask_dash_app(server)`,
+        served under `prefix` (its `routes_pathname_prefix`)
+        """
+        self._entries[prefix] = DashAppEntry(prefix, module_name)
+
+    def on_mount(self, hook: Callable[[Flask], None]) -> None:
+        """Call `hook(server)` on the Flask server of every Dash app before it is built"""
+        self._mount_hooks.append(hook)
+        for entry in self._entries.values():
+            if entry.server is not None:
+                hook(entry.server)
+
+    def match(self, path: str) -> DashAppEntry | None:
+        for prefix, entry in self._entries.items():
+            if path.startswith(prefix) or path == prefix.rstrip("/"):
+                return entry
+        return None
+
+    def create_server(self) -> Flask:
+        """Flask server for one Dash app, sharing config and templates with the main app"""
+        server = Flask(
+            self.flask_app.import_name,
+            root_path=self.flask_app.root_path,
+            template_folder=self.flask_app.template_folder,
+            static_folder=None,
+        )
+        server.config.update(self.flask_app.config)
+        for hook in self._mount_hooks:
+            hook(server)
+        return server
+
+    def mount(self, entry: DashAppEntry) -> Flask:
+        """
+        Import and build the Dash app of `entry`, once
+
+        :raises DashMountError: if it failed within the last MOUNT_RETRY_AFTER seconds
+        """
+        if entry.server is not None:
+            return entry.server
+        with entry.lock:
+            if entry.server is not None:
+                return entry.server
+            if entry.error is not None and time.monotonic() - entry.failed_at < MOUNT_RETRY_AFTER:
+                raise DashMountError(entry.error)
+
+            try:
+                start = time.perf_counter()
+                module = importlib.import_module(entry.module_name)
+                entry.import_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                server = self.create_server()
+                with server.app_context():
+                    module.init_flask_dash_app(server)
+                entry.init_time = time.perf_counter() - start
+            except Exception as error:
+                entry.error = f"{type(error).__name__}: {error}"
+                entry.failed_at = time.monotonic()
+                logger.exception(f"Could not mount {entry.module_name} at {entry.prefix}")
+                raise DashMountError(entry.error) from error
+
+            entry.server = server
+            entry.error = None
+            logger.info(
+                f"Mounted {entry.module_name} at {entry.prefix}: "
+                f"import {entry.import_time:.3f}s, init {entry.init_time:.3f}s"
+            )
+            return server
+
+    def mount_all(self) -> None:
+        for entry in self._entries.values():
+            try:
+                self.mount(entry)
+            except DashMountError:
+                # logged by mount
+                pass
+
+    def warm_up(self, background: bool = True) -> threading.Thread | None:
+        """Mount every registered app now, or in a background thread"""
+        if not background:
+            self.mount_all()
+            return None
+        thread = threading.Thread(target=self.mount_all, name="dash-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def warm_callbacks(self) -> None:
+        """Render the pages of every mounted app and call its callbacks once (see `FlaskDash.warm_up`)"""
+        for entry in self._entries.values():
+            dash_app = entry.server.extensions.get("flask_dash") if entry.server is not None else None
+            if dash_app is None:
+                continue
+            start = time.perf_counter()
+            try:
+                dash_app.warm_up()
+            except Exception as error:
+                logger.error(f"Could not warm up {entry.module_name} at {entry.prefix}: {error}")
+                continue
+            logger.info(f"Warmed up {entry.module_name} at {entry.prefix} in {time.perf_counter() - start:.3f}s")
+
+    def report(self) -> list[dict]:
+        """Startup time per registered Dash module"""
+        return [entry.to_dict() for entry in self._entries.values()]
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+
+class LazyDashDispatcher:
+    """WSGI middleware handing requests under a registered prefix to that Dash app's server"""
+
+    def __init__(self, wsgi_app, registry: DashRegistry):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+
+    def __call__(self, environ, start_response):
+        entry = self.registry.match(environ.get("PATH_INFO", ""))
+        if entry is None:
+            return self.wsgi_app(environ, start_response)
+        try:
+            server = self.registry.mount(entry)
+        except DashMountError:
+            response = Response(
+                "This dashboard is unavailable, please try again later",
+                status=503,
+                mimetype="text/plain",
+                headers={"Retry-After": str(MOUNT_RETRY_AFTER)},
+            )
+            return response(environ, start_response)
+        return server(environ, start_response)
@@ -1,15 +1,39 @@
 from flask import Flask
 from flask_bootstrap import Bootstrap
 
+from market.sources import init_market
+from utils.assets import init_assets
+from utils.metrics import init_metrics
+from utils.profiler import init_profiler
+from utils.sessions import init_sessions
+from utils.templates import configure_templates, precompile_templates
+from utils.warm_up import init_warm_up, start_in_workers
+
 def create_app():
     flask_app = Flask(__name__, instance_relative_config=True)
     flask_app.config.from_object("config.DefaultConfig") # can't import DefaultConfig from config.config ?
     Bootstrap(flask_app)
+    configure_templates(flask_app)
+    init_assets(flask_app)
+    init_metrics(flask_app)
+    init_profiler(flask_app)
+    init_sessions(flask_app)
+    warm_up = init_warm_up(flask_app)
+    warm_up.add_stage("templates", lambda: precompile_templates(flask_app))
+    if flask_app.config.get("PRECOMPUTE_README"):
+        from utils.render_readme import precompute_readme
+        warm_up.add_stage("readme", precompute_readme)
 
     with flask_app.app_context() as _:
         from routes import flask_routes
         from routes import dash_routes
 
+    init_market(flask_app)
+    # /readyz answers 503 until the warm-up stages have run
+    if flask_app.config.get("WARM_UP_BACKGROUND"):
+        start_in_workers(flask_app, warm_up.start)
+    else:
+        warm_up.start(background=False)
     return flask_app
     
 if __name__ == "__main__":
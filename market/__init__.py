@@ -0,0 +1,6 @@
+__all__: list[str] = ["ticks", "sources", "streaming", "matching", "portfolio", "backtest"]
+from . import *
+from .ticks import tick_store
+from .streaming import stream_hub
+from .matching import matching_engine
+from .portfolio import portfolio_engine
@@ -0,0 +1,293 @@
+"""
+Vectorized backtests of a moving average crossover on OHLCV bars.
+
+The bars of all symbols are columns sorted by symbol and time, and `bounds` gives
+the rows of each symbol. They load from a memory-mapped columnar cache, like the
+app's datasets, or come from the tick store's candles. A run evaluates a grid of
+(fast, slow) windows. The averages of every window come from one cumulative sum.
+The positions of a chunk of parameter pairs form one 2-D array, and fills, costs
+and equity are computed over it at once. Symbols and grid chunks fan out over a
+process pool: the bars are copied once into shared memory, and a task carries only
+the block's name and its row bounds.
+"""
+from collections.abc import Iterable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, wait
+import multiprocessing
+import os
+from os import environ
+from pathlib import Path
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar_cache import load_columnar
+from utils.shared_arrays import SharedArrays, attach
+
+from .ticks import CANDLE_FIELDS, TickStore
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+METRICS = ["total_return", "sharpe", "max_drawdown", "trades", "exposure"]
+# (parameter pairs x bars) cells simulated at once, small enough for the temporaries to stay in cache
+CHUNK_CELLS = 250_000
+# 0 runs in the calling thread
+BACKTEST_PROCESSES = int(environ.get("BACKTEST_PROCESSES", 2))
+# workers are spawned, not forked: the app process already runs the log, market and warm-up threads
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+class Bars:
+    """OHLCV bars of several symbols, the rows of `symbols[i]` are `bounds[i]:bounds[i + 1]`"""
+
+    # bump when the layout written by build_columns changes
+    LAYOUT_VERSION = 1
+
+    def __init__(self, columns: dict[str, np.ndarray], symbols: list[str]):
+        self.columns = columns
+        self.symbols = symbols
+        self.bounds = columns["bounds"]
+        self._code = {symbol: code for code, symbol in enumerate(symbols)}
+
+    @staticmethod
+    def build_columns(frame: pd.DataFrame) -> tuple[dict[str, np.ndarray], dict]:
+        """Sort a frame of time, symbol, open, high, low, close, volume rows into the layout arrays"""
+        codes, symbols = pd.factorize(frame["symbol"], sort=True)
+        times = frame["time"]
+        if not pd.api.types.is_numeric_dtype(times):
+            times = pd.to_datetime(times, utc=True).astype("int64") / 1e9
+        times = times.to_numpy(dtype=np.float64)
+        order = np.lexsort((times, codes))
+        columns = {"time": times[order]}
+        for field in CANDLE_FIELDS[1:]:
+            values = frame[field] if field in frame else pd.Series(0.0, index=frame.index)
+            columns[field] = values.to_numpy(dtype=np.float64)[order]
+        columns["bounds"] = np.searchsorted(codes[order], np.arange(len(symbols) + 1)).astype(np.int64)
+        return columns, {"symbols": symbols.tolist()}
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "Bars":
+        columns, meta = cls.build_columns(frame)
+        return cls(columns, **meta)
+
+    @classmethod
+    def from_csv(cls, path: str | Path, cache_dir: str | Path | None = None) -> "Bars":
+        """Map the bars from their columnar cache, converting the CSV the first time and whenever it changes"""
+        columns, meta = load_columnar(
+            path,
+            lambda source: cls.build_columns(pd.read_csv(source)),
+            cache_dir=cache_dir,
+            version=cls.LAYOUT_VERSION,
+        )
+        return cls(columns, **meta)
+
+    @classmethod
+    def from_store(cls, store: TickStore, interval: str = "1m", n: int | None = None) -> "Bars":
+        """The closed candles of every symbol in `store`, copied out"""
+        parts, symbols, bounds = [], [], [0]
+        for symbol in store.symbols():
+            candles = store.candles(symbol, interval, n)
+            if len(candles["time"]) < 2:
+                continue
+            parts.append({field: values[:-1] for field, values in candles.items()})
+            symbols.append(symbol)
+            bounds.append(bounds[-1] + len(candles["time"]) - 1)
+        columns = {
+            field: np.concatenate([part[field] for part in parts]) if parts else np.empty(0)
+            for field in CANDLE_FIELDS
+        }
+        columns["bounds"] = np.array(bounds, dtype=np.int64)
+        return cls(columns, symbols)
+
+    def rows(self, symbol: str) -> slice:
+        """:raises KeyError: for an unknown symbol"""
+        code = self._code[symbol]
+        return slice(int(self.bounds[code]), int(self.bounds[code + 1]))
+
+    def symbol(self, symbol: str, start: float | None = None, end: float | None = None) -> dict[str, np.ndarray]:
+        """
+        The bars of `symbol`, only those timed within [start, end] when given
+
+        :raises KeyError: for an unknown symbol
+        """
+        rows = self.rows(symbol)
+        if start is not None or end is not None:
+            times = self.columns["time"][rows]
+            first = np.searchsorted(times, -np.inf if start is None else start, side="left")
+            last = np.searchsorted(times, np.inf if end is None else end, side="right")
+            rows = slice(rows.start + int(first), rows.start + int(last))
+        return {field: self.columns[field][rows] for field in CANDLE_FIELDS}
+
+    def periods_per_year(self) -> float:
+        """Bars per year at the median spacing of the bars"""
+        times, bounds = self.columns["time"], self.bounds
+        steps = np.diff(times)
+        # drop the steps between the last bar of a symbol and the first of the next
+        steps = np.delete(steps, bounds[1:-1] - 1) if len(steps) else steps
+        steps = steps[steps > 0]
+        return SECONDS_PER_YEAR / float(np.median(steps)) if len(steps) else 1.0
+
+
+def parameter_grid(fast: Iterable[int], slow: Iterable[int]) -> np.ndarray:
+    """Every (fast, slow) window pair with fast < slow, as an int array of shape (n, 2)"""
+    fast, slow = np.unique(np.asarray(list(fast), dtype=np.int64)), np.unique(np.asarray(list(slow), dtype=np.int64))
+    pairs = np.stack(np.meshgrid(fast, slow, indexing="ij"), axis=-1).reshape(-1, 2)
+    return pairs[(pairs[:, 0] < pairs[:, 1]) & (pairs[:, 0] > 0)]
+
+
+def moving_averages(close: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    """Simple moving averages of `close`, one row per window, NaN until the window is full"""
+    n = len(close)
+    sums = np.concatenate(([0.0], np.cumsum(close)))
+    averages = np.full((len(windows), n), np.nan)
+    for row, window in enumerate(windows.tolist()):
+        if window <= n:
+            averages[row, window - 1:] = (sums[window:] - sums[:-window]) / window
+    return averages
+
+
+def crossover_signals(averages: np.ndarray, windows: np.ndarray, pairs: np.ndarray, long_only: bool) -> np.ndarray:
+    """
+    Target position at each close for each pair: long while the fast average is above
+    the slow one, short (or flat when `long_only`) below it, flat until both exist
+    """
+    index = np.searchsorted(windows, pairs)
+    signals = np.nan_to_num(np.sign(averages[index[:, 0]] - averages[index[:, 1]]))
+    return np.maximum(signals, 0) if long_only else signals
+
+
+def simulate(open_: np.ndarray, close: np.ndarray, signals: np.ndarray, cost: float) -> np.ndarray:
+    """
+    Per bar returns of the positions in `signals` (one row per parameter pair). A
+    signal at the close of a bar is filled at the next open, paying `cost` per unit
+    of position traded. The position held overnight earns the gap to the open and
+    the new one the move from open to close.
+    """
+    held = np.zeros_like(signals)
+    held[:, 1:] = signals[:, :-1]
+    before = np.zeros_like(held)
+    before[:, 1:] = held[:, :-1]
+    gap = np.zeros_like(close)
+    gap[1:] = open_[1:] / close[:-1] - 1
+    intraday = close / open_ - 1
+    return (1 + before * gap) * (1 + held * intraday) - 1 - np.abs(held - before) * cost
+
+
+def metrics(returns: np.ndarray, signals: np.ndarray, periods_per_year: float) -> np.ndarray:
+    """Total return, annualized Sharpe ratio, max drawdown, trades and exposure per row, in METRICS order"""
+    equity = np.cumprod(1 + returns, axis=1)
+    deviation = returns.std(axis=1)
+    sharpe = np.divide(returns.mean(axis=1), deviation, out=np.zeros(len(returns)), where=deviation > 0)
+    drawdown = 1 - equity / np.maximum.accumulate(equity, axis=1)
+    held = signals[:, :-1]
+    trades = np.count_nonzero(np.diff(held, axis=1, prepend=0), axis=1)
+    return np.column_stack([
+        equity[:, -1] - 1,
+        sharpe * np.sqrt(periods_per_year),
+        drawdown.max(axis=1),
+        trades,
+        np.count_nonzero(held, axis=1) / max(held.shape[1], 1),
+    ])
+
+
+def evaluate(open_: np.ndarray, close: np.ndarray, pairs: np.ndarray, cost: float,
+             long_only: bool, periods_per_year: float) -> np.ndarray:
+    """METRICS of every parameter pair on one symbol's bars, shape (len(pairs), len(METRICS))"""
+    results = np.zeros((len(pairs), len(METRICS)))
+    if len(close) < 2 or len(pairs) == 0:
+        return results
+    windows = np.unique(pairs)
+    averages = moving_averages(close, windows)
+    step = max(CHUNK_CELLS // len(close), 1)
+    for start in range(0, len(pairs), step):
+        chunk = pairs[start:start + step]
+        signals = crossover_signals(averages, windows, chunk, long_only)
+        results[start:start + step] = metrics(simulate(open_, close, signals, cost), signals, periods_per_year)
+    return results
+
+
+def equity_curve(bars: dict[str, np.ndarray], fast: int, slow: int, cost: float = 0.0005,
+                 long_only: bool = False) -> np.ndarray:
+    """Equity of one parameter pair on one symbol's bars (see `Bars.symbol`), starting at 1"""
+    pairs = np.array([[fast, slow]])
+    windows = np.unique(pairs)
+    signals = crossover_signals(moving_averages(bars["close"], windows), windows, pairs, long_only)
+    return np.cumprod(1 + simulate(bars["open"], bars["close"], signals, cost)[0])
+
+
+def _evaluate_shared(spec: dict, start: int, stop: int, pairs: np.ndarray, cost: float,
+                     long_only: bool, periods_per_year: float) -> np.ndarray:
+    """Runs in the process pool, on bars mapped from shared memory"""
+    columns = attach(spec)
+    return evaluate(columns["open"][start:stop], columns["close"][start:stop], pairs, cost, long_only, periods_per_year)
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if _executor is None and BACKTEST_PROCESSES > 0:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=BACKTEST_PROCESSES, mp_context=MP_CONTEXT)
+    return _executor
+
+
+def _pool_size(executor: Executor) -> int:
+    # ProcessPoolExecutor and ThreadPoolExecutor keep their size there, other executors get one task per core
+    return getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+
+
+def run_backtest(
+    bars: Bars,
+    fast: Iterable[int],
+    slow: Iterable[int],
+    cost: float = 0.0005,
+    long_only: bool = False,
+    symbols: list[str] | None = None,
+    executor: Executor | None = None,
+    parallel: bool = True,
+) -> pd.DataFrame:
+    """
+    Evaluate the crossover over the (fast, slow) grid on every symbol
+
+    :param cost: fraction of the traded value paid per fill, fees and slippage
+    :param symbols: a subset of `bars.symbols`
+    :param executor: process pool, by default the shared pool of BACKTEST_PROCESSES workers
+    :param parallel: False runs the grid in the calling thread, as does BACKTEST_PROCESSES=0
+    :returns: one row per symbol and pair: symbol, fast, slow and METRICS
+    """
+    pairs = parameter_grid(fast, slow)
+    symbols = bars.symbols if symbols is None else symbols
+    periods_per_year = bars.periods_per_year()
+    executor = (executor or _get_executor()) if parallel else None
+
+    if executor is None:
+        results = [
+            evaluate(columns["open"], columns["close"], pairs, cost, long_only, periods_per_year)
+            for columns in map(bars.symbol, symbols)
+        ]
+    else:
+        # split the grids until there are two tasks per worker, so that a few symbols keep every worker busy
+        splits = min(max(-(-2 * _pool_size(executor) // max(len(symbols), 1)), 1), max(len(pairs), 1))
+        with SharedArrays({"open": bars.columns["open"], "close": bars.columns["close"]}) as shared:
+            futures: list[list[Future]] = []
+            try:
+                for rows in map(bars.rows, symbols):
+                    futures.append([
+                        executor.submit(_evaluate_shared, shared.spec, rows.start, rows.stop, chunk, cost,
+                                        long_only, periods_per_year)
+                        for chunk in np.array_split(pairs, splits)
+                    ])
+                results = [np.concatenate([future.result() for future in chunks]) for chunks in futures]
+            finally:
+                # the block is unlinked on exit, no task may still be reading it
+                pending = [future for chunks in futures for future in chunks if not future.cancel()]
+                wait(pending)
+
+    frame = pd.DataFrame(np.concatenate(results) if results else np.empty((0, len(METRICS))), columns=METRICS)
+    frame.insert(0, "symbol", np.repeat(symbols, len(pairs)))
+    frame.insert(1, "fast", np.tile(pairs[:, 0], len(symbols)))
+    frame.insert(2, "slow", np.tile(pairs[:, 1], len(symbols)))
+    frame["trades"] = frame["trades"].astype(np.int64)
+    return frame
@@ -0,0 +1,468 @@
+"""
+Paper-trading matching engine.
+
+Each symbol has an order book of price levels: a sorted list of level prices per side
+and a FIFO queue of orders per level, so orders match by price, then time. Prices
+are held as integer ticks of `tick_size`. Cancelled orders stay in their queue until
+matching reaches them, while the level's open quantity and order count are updated
+at once, so a cancel never scans a queue. A level goes when its last open order
+does, whatever float rounding left of its quantity.
+
+Resting orders are filled by incoming orders, and by the market itself: `sync`
+takes the ticks the tick store got since the last call and fills every resting
+order the market traded through, at the order's price. The remainder of a market
+order that the book cannot fill is filled at the last traded price when the engine
+has a tick store, and cancelled otherwise. The journal records that price with the
+order, so a replay fills the remainder the same way whatever the store holds then.
+
+Every operation takes its time from the engine's clock and every order id comes
+from a counter, so an engine can record its operations (`journal`) and `replay`
+them into a fresh engine with identical fills, e.g. in tests.
+"""
+from bisect import bisect_left, insort
+from collections import deque
+from collections.abc import Callable, Iterable
+import hashlib
+import json
+from os import environ
+import threading
+import time
+
+from utils.logger_script import logger
+
+from .ticks import TickStore, tick_store
+
+BUY = 1
+SELL = -1
+
+LIMIT = "limit"
+MARKET = "market"
+
+OPEN = "open"
+FILLED = "filled"
+CANCELLED = "cancelled"
+
+
+class OrderError(ValueError):
+    """Raised for an order the engine cannot accept"""
+
+
+class Order:
+    __slots__ = ("id", "owner", "symbol", "side", "kind", "price", "quantity", "remaining", "status", "time")
+
+    def __init__(self, id: int, owner: str, symbol: str, side: int, kind: str, price: int, quantity: float, time: float):
+        self.id = id
+        self.owner = owner
+        self.symbol = symbol
+        self.side = side
+        self.kind = kind
+        # in ticks, 0 for market orders
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.status = OPEN
+        self.time = time
+
+    def to_dict(self, tick_size: float) -> dict:
+        return {
+            "id": self.id,
+            "owner": self.owner,
+            "symbol": self.symbol,
+            "side": "buy" if self.side == BUY else "sell",
+            "kind": self.kind,
+            "price": self.price * tick_size if self.kind == LIMIT else None,
+            "quantity": self.quantity,
+            "remaining": self.remaining,
+            "status": self.status,
+        }
+
+
+class Fill:
+    __slots__ = ("symbol", "price", "quantity", "buy_id", "sell_id", "buyer", "seller", "time")
+
+    def __init__(self, symbol: str, price: float, quantity: float, buy: Order | None, sell: Order | None, time: float):
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+        # the market is the counterparty of fills against the tick store
+        self.buy_id = buy.id if buy else None
+        self.sell_id = sell.id if sell else None
+        self.buyer = buy.owner if buy else None
+        self.seller = sell.owner if sell else None
+        self.time = time
+
+    def to_tuple(self) -> tuple:
+        return (self.symbol, self.price, self.quantity, self.buy_id, self.sell_id, self.buyer, self.seller, self.time)
+
+
+class BookSide:
+    """Price levels of one side, `prices` is sorted so that the best level is last"""
+
+    __slots__ = ("side", "prices", "queues", "volumes", "counts")
+
+    def __init__(self, side: int):
+        self.side = side
+        # keys sort ascending towards the best price: price for bids, -price for asks
+        self.prices: list[int] = []
+        self.queues: dict[int, deque[Order]] = {}
+        self.volumes: dict[int, float] = {}
+        # open orders per level
+        self.counts: dict[int, int] = {}
+
+    def _key(self, price: int) -> int:
+        return price if self.side == BUY else -price
+
+    def best(self) -> int | None:
+        return self._key(self.prices[-1]) if self.prices else None
+
+    def add(self, order: Order) -> None:
+        queue = self.queues.get(order.price)
+        if queue is None:
+            queue = self.queues[order.price] = deque()
+            self.volumes[order.price] = 0.0
+            self.counts[order.price] = 0
+            insort(self.prices, self._key(order.price))
+        queue.append(order)
+        self.volumes[order.price] += order.remaining
+        self.counts[order.price] += 1
+
+    def reduce(self, price: int, quantity: float, closed: int = 0) -> None:
+        """
+        Take `quantity` off the level's open volume and `closed` orders off its open
+        orders, drops the level when none is left
+        """
+        count = self.counts[price] - closed
+        if count > 0:
+            self.volumes[price] = max(self.volumes[price] - quantity, 0.0)
+            self.counts[price] = count
+            return
+        self.remove(price)
+
+    def remove(self, price: int) -> None:
+        """Drop the level and its queue"""
+        del self.volumes[price]
+        del self.queues[price]
+        del self.counts[price]
+        key = self._key(price)
+        if self.prices[-1] == key:
+            self.prices.pop()
+        else:
+            del self.prices[bisect_left(self.prices, key)]
+
+    def depth(self, levels: int) -> list[tuple[int, float]]:
+        return [(self._key(key), self.volumes[self._key(key)]) for key in reversed(self.prices[-levels:])]
+
+
+class OrderBook:
+    __slots__ = ("symbol", "bids", "asks")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(BUY)
+        self.asks = BookSide(SELL)
+
+
+class MatchingEngine:
+    def __init__(
+        self,
+        store: TickStore | None = None,
+        tick_size: float = 0.01,
+        clock: Callable[[], float] = time.time,
+        record: bool = False,
+    ):
+        """
+        :param store: tick store to match resting orders against, see `sync`
+        :param record: keep a journal of the operations, for `replay`
+        """
+        self.store = store
+        self.tick_size = tick_size
+        self.clock = clock
+        self.journal: list[tuple] | None = [] if record else None
+        self.books: dict[str, OrderBook] = {}
+        self.orders: dict[int, Order] = {}
+        self._next_id = 1
+        # tick count of each symbol when it was last synced
+        self._synced: dict[str, int] = {}
+        self._listeners: list[Callable[[list[Fill]], None]] = []
+        # fills of the running batch, published together at its end
+        self._deferred: list[Fill] | None = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def on_fills(self, listener: Callable[[list[Fill]], None]) -> None:
+        """Call `listener` with the fills of every operation that produced some"""
+        self._listeners.append(listener)
+
+    def _book(self, symbol: str) -> OrderBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+            if self.store is not None:
+                # ticks from before the first order are not matched against it
+                self._synced[symbol] = self.store.version(symbol)
+        return book
+
+    def _record(self, *command) -> None:
+        if self.journal is not None:
+            self.journal.append(command)
+
+    def _publish(self, fills: list[Fill]) -> list[Fill]:
+        if self._deferred is not None:
+            self._deferred.extend(fills)
+        elif fills:
+            for listener in self._listeners:
+                listener(fills)
+        return fills
+
+    def _new_order(self, owner: str, symbol: str, side: int, kind: str, price: int, quantity: float, now: float) -> Order:
+        if side not in (BUY, SELL):
+            raise OrderError(f"Unknown side {side!r}, expected BUY (1) or SELL (-1)")
+        if not quantity > 0:
+            raise OrderError(f"Order quantity must be positive, got {quantity!r}")
+        order = Order(self._next_id, owner, symbol, side, kind, price, quantity, now)
+        self._next_id += 1
+        self.orders[order.id] = order
+        return order
+
+    def submit_limit(self, owner: str, symbol: str, side: int, quantity: float, price: float, now: float | None = None) -> tuple[Order, list[Fill]]:
+        """Match a limit order, the rest of it rests in the book"""
+        ticks = round(price / self.tick_size)
+        if ticks <= 0:
+            raise OrderError(f"Limit price must be positive, got {price!r}")
+        with self._lock:
+            now = self.clock() if now is None else now
+            order = self._new_order(owner, symbol, side, LIMIT, ticks, quantity, now)
+            self._record(LIMIT, owner, symbol, side, quantity, price, now)
+            fills = self._match(order, now)
+            if order.remaining > 0:
+                book = self._book(symbol)
+                (book.bids if side == BUY else book.asks).add(order)
+            return order, self._publish(fills)
+
+    def submit_market(self, owner: str, symbol: str, side: int, quantity: float, now: float | None = None) -> tuple[Order, list[Fill]]:
+        """Match a market order, whatever the book cannot fill is filled at the last price or cancelled"""
+        with self._lock:
+            last = self.store.last_price(symbol) if self.store is not None else None
+            return self._submit_market(owner, symbol, side, quantity, now, last)
+
+    def _submit_market(self, owner: str, symbol: str, side: int, quantity: float, now: float | None, last: float | None) -> tuple[Order, list[Fill]]:
+        """`submit_market` with the remainder filled at `last`, or cancelled when it is None"""
+        with self._lock:
+            now = self.clock() if now is None else now
+            order = self._new_order(owner, symbol, side, MARKET, 0, quantity, now)
+            self._record(MARKET, owner, symbol, side, quantity, now, last)
+            fills = self._match(order, now)
+            if order.remaining > 0:
+                if last is not None:
+                    fills.append(self._fill_against_market(order, last, now))
+                else:
+                    order.status = CANCELLED
+                    del self.orders[order.id]
+            return order, self._publish(fills)
+
+    def cancel(self, order_id: int, now: float | None = None) -> Order | None:
+        """Cancel an open order, returns None when it is unknown or no longer open"""
+        with self._lock:
+            now = self.clock() if now is None else now
+            self._record("cancel", order_id, now)
+            order = self.orders.get(order_id)
+            if order is None or order.status != OPEN or order.kind != LIMIT:
+                return None
+            book = self.books[order.symbol]
+            (book.bids if order.side == BUY else book.asks).reduce(order.price, order.remaining, closed=1)
+            order.status = CANCELLED
+            del self.orders[order_id]
+            return order
+
+    def submit_batch(self, commands: Iterable[tuple]) -> list[Fill]:
+        """Apply many journal-style commands under one lock acquisition, returns all fills"""
+        with self._lock:
+            self._deferred = []
+            try:
+                for command in commands:
+                    self.apply(command)
+            finally:
+                fills, self._deferred = self._deferred, None
+            return self._publish(fills)
+
+    def apply(self, command: tuple) -> list[Fill]:
+        """Run one journal command: (limit, owner, symbol, side, quantity, price, time),
+        (market, owner, symbol, side, quantity, time, last price), (cancel, id, time) or
+        (trades, symbol, low, high, time). A market command without the last price
+        takes it from the tick store."""
+        kind = command[0]
+        if kind == LIMIT:
+            _, owner, symbol, side, quantity, price, now = command
+            return self.submit_limit(owner, symbol, side, quantity, price, now)[1]
+        if kind == MARKET:
+            if len(command) == 6:
+                _, owner, symbol, side, quantity, now = command
+                return self.submit_market(owner, symbol, side, quantity, now)[1]
+            _, owner, symbol, side, quantity, now, last = command
+            return self._submit_market(owner, symbol, side, quantity, now, last)[1]
+        if kind == "cancel":
+            _, order_id, now = command
+            self.cancel(order_id, now)
+            return []
+        if kind == "trades":
+            _, symbol, low, high, now = command
+            return self.match_trades(symbol, low, high, now)
+        raise OrderError(f"Unknown command {kind!r}")
+
+    def _match(self, order: Order, now: float) -> list[Fill]:
+        book = self.books.get(order.symbol)
+        if book is None:
+            return []
+        opposite = book.asks if order.side == BUY else book.bids
+        fills = []
+        limit = order.price
+        while order.remaining > 0 and opposite.prices:
+            price = opposite.best()
+            if order.kind == LIMIT and (price > limit if order.side == BUY else price < limit):
+                break
+            queue = opposite.queues[price]
+            while order.remaining > 0 and queue:
+                resting = queue[0]
+                if resting.status != OPEN:
+                    queue.popleft()
+                    continue
+                quantity = min(order.remaining, resting.remaining)
+                resting.remaining -= quantity
+                order.remaining -= quantity
+                closed = 0
+                if resting.remaining <= 0:
+                    resting.status = FILLED
+                    queue.popleft()
+                    del self.orders[resting.id]
+                    closed = 1
+                buy, sell = (order, resting) if order.side == BUY else (resting, order)
+                fills.append(Fill(order.symbol, price * self.tick_size, quantity, buy, sell, now))
+                # may drop the level, and its queue, once it is used up
+                opposite.reduce(price, quantity, closed)
+            if not queue and price in opposite.queues:
+                # nothing open was left behind the cancelled orders
+                opposite.remove(price)
+        if order.remaining <= 0:
+            order.status = FILLED
+            del self.orders[order.id]
+        return fills
+
+    def _fill_against_market(self, order: Order, price: float, now: float) -> Fill:
+        quantity, order.remaining = order.remaining, 0.0
+        order.status = FILLED
+        self.orders.pop(order.id, None)
+        buy, sell = (order, None) if order.side == BUY else (None, order)
+        return Fill(order.symbol, price, quantity, buy, sell, now)
+
+    def match_trades(self, symbol: str, low: float, high: float, now: float | None = None) -> list[Fill]:
+        """
+        Fill the resting orders that market trades between `low` and `high` went
+        through: bids at or above `low`, asks at or below `high`, at their own price
+        """
+        with self._lock:
+            now = self.clock() if now is None else now
+            self._record("trades", symbol, low, high, now)
+            book = self.books.get(symbol)
+            if book is None:
+                return []
+            fills = []
+            low_ticks, high_ticks = round(low / self.tick_size), round(high / self.tick_size)
+            for side, crossed in ((book.bids, lambda price: price >= low_ticks), (book.asks, lambda price: price <= high_ticks)):
+                while side.prices and crossed(side.best()):
+                    price = side.best()
+                    for order in side.queues[price]:
+                        if order.status == OPEN:
+                            fills.append(self._fill_against_market(order, price * self.tick_size, now))
+                    side.remove(price)
+            return self._publish(fills)
+
+    def sync(self, symbol: str | None = None) -> list[Fill]:
+        """Match resting orders against the ticks the store got since the last sync"""
+        if self.store is None:
+            return []
+        fills = []
+        for name in [symbol] if symbol else list(self.books):
+            version = self.store.version(name)
+            new = min(version - self._synced.get(name, 0), self.store.capacity)
+            self._synced[name] = version
+            if new <= 0:
+                continue
+            with self.store.ticks_view(name, new) as window:
+                low, high = float(window["price"].min()), float(window["price"].max())
+            fills.extend(self.match_trades(name, low, high))
+        return fills
+
+    def top_of_book(self, symbol: str) -> dict:
+        book = self.books.get(symbol)
+        bid = book.bids.best() if book else None
+        ask = book.asks.best() if book else None
+        return {
+            "bid": bid * self.tick_size if bid is not None else None,
+            "ask": ask * self.tick_size if ask is not None else None,
+        }
+
+    def depth(self, symbol: str, levels: int = 10) -> dict:
+        """Open quantity of the best `levels` price levels per side"""
+        book = self.books.get(symbol)
+        if book is None:
+            return {"bids": [], "asks": []}
+        with self._lock:
+            return {
+                side: [(price * self.tick_size, volume) for price, volume in book_side.depth(levels)]
+                for side, book_side in (("bids", book.bids), ("asks", book.asks))
+            }
+
+    def start(self, interval: float = 0.25) -> None:
+        """Sync against the tick store every `interval` seconds from a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="matching-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Matching engine sync failed")
+
+
+def replay(commands: Iterable[tuple], store: TickStore | None = None, tick_size: float = 0.01) -> tuple[MatchingEngine, list[Fill]]:
+    """Apply recorded commands to a fresh engine, returns it and every fill in order"""
+    engine = MatchingEngine(store=store, tick_size=tick_size, record=True)
+    fills = []
+    for command in commands:
+        fills.extend(engine.apply(tuple(command)))
+    return engine, fills
+
+
+def fills_digest(fills: Iterable[Fill]) -> str:
+    """Hash of a sequence of fills, equal for two runs that filled the same way"""
+    digest = hashlib.sha256()
+    for fill in fills:
+        digest.update(json.dumps(fill.to_tuple()).encode())
+    return digest.hexdigest()
+
+
+def save_journal(journal: list[tuple], path) -> None:
+    with open(path, "w") as fp:
+        for command in journal:
+            fp.write(json.dumps(command) + "\n")
+
+
+def load_journal(path) -> list[tuple]:
+    with open(path) as fp:
+        return [tuple(json.loads(line)) for line in fp if line.strip()]
+
+
+matching_engine = MatchingEngine(
+    store=tick_store,
+    tick_size=float(environ.get("MATCHING_TICK_SIZE", 0.01)),
+)
@@ -0,0 +1,330 @@
+"""
+Mark-to-market of every user's paper positions.
+
+Positions are stored per symbol, as columns over the users holding it: user row,
+quantity, cost basis and market value, in NumPy arrays that grow by doubling. Per
+user totals (market value, gross exposure, cost, cash, realized P&L) are arrays
+indexed by user row. A price update of a symbol revalues its holders in one
+vectorized pass and adds the change of each holder's value to their totals, so
+the work follows the changed symbols and their holders, never users x symbols.
+Fills from the matching engine update single positions the same way.
+"""
+from collections.abc import Iterable
+from os import environ
+import threading
+
+import numpy as np
+
+from utils.logger_script import logger
+
+from .matching import BUY, SELL, Fill, matching_engine
+from .ticks import TickStore, tick_store
+
+INITIAL_CAPACITY = 64
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class SymbolPositions:
+    """Holders of one symbol, slots [0, size) are in use"""
+
+    __slots__ = ("users", "quantity", "cost", "value", "size", "slots")
+
+    def __init__(self):
+        self.users = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.quantity = np.zeros(INITIAL_CAPACITY)
+        self.cost = np.zeros(INITIAL_CAPACITY)
+        self.value = np.zeros(INITIAL_CAPACITY)
+        self.size = 0
+        # user row -> slot
+        self.slots: dict[int, int] = {}
+
+    def reserve(self, size: int) -> None:
+        self.users = _grow(self.users, size)
+        self.quantity = _grow(self.quantity, size)
+        self.cost = _grow(self.cost, size)
+        self.value = _grow(self.value, size)
+
+    def slot(self, user: int) -> int:
+        slot = self.slots.get(user)
+        if slot is None:
+            slot = self.slots[user] = self.size
+            self.reserve(slot + 1)
+            self.users[slot] = user
+            self.size += 1
+        return slot
+
+
+class PortfolioEngine:
+    def __init__(self, store: TickStore | None = None, starting_cash: float = 100_000.0):
+        """
+        :param store: tick store the marks are taken from, see `sync`
+        :param starting_cash: cash of a user's first appearance
+        """
+        self.store = store
+        self.starting_cash = starting_cash
+        self.users: dict[str, int] = {}
+        self.names: list[str] = []
+        self.positions: dict[str, SymbolPositions] = {}
+        self.marks: dict[str, float] = {}
+        # per user row
+        self.cash = np.zeros(INITIAL_CAPACITY)
+        self.realized = np.zeros(INITIAL_CAPACITY)
+        self.cost = np.zeros(INITIAL_CAPACITY)
+        self.market_value = np.zeros(INITIAL_CAPACITY)
+        self.gross_exposure = np.zeros(INITIAL_CAPACITY)
+        # tick count of each symbol when it was last marked
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _user(self, owner: str) -> int:
+        row = self.users.get(owner)
+        if row is None:
+            row = self.users[owner] = len(self.names)
+            self.names.append(owner)
+            self._reserve_users(row + 1)
+            self.cash[row] = self.starting_cash
+        return row
+
+    def _reserve_users(self, size: int) -> None:
+        for name in ("cash", "realized", "cost", "market_value", "gross_exposure"):
+            setattr(self, name, _grow(getattr(self, name), size))
+
+    def _positions(self, symbol: str) -> SymbolPositions:
+        positions = self.positions.get(symbol)
+        if positions is None:
+            positions = self.positions[symbol] = SymbolPositions()
+        return positions
+
+    def load(self, owners: list[str], symbols: list[str], user_index: np.ndarray, symbol_index: np.ndarray,
+             quantity: np.ndarray, price: np.ndarray) -> None:
+        """
+        Add many positions at once, e.g. restored from storage: position i is
+        `quantity[i]` of `symbols[symbol_index[i]]` bought by `owners[user_index[i]]`
+        at `price[i]`, paid from the user's cash. Nothing is loaded when a check fails.
+
+        :raises ValueError: for arrays of different lengths, an index out of range, or a
+            (user, symbol) pair given twice or already held in the engine (use
+            `apply_fill` to add to a position)
+        """
+        if not len(user_index) == len(symbol_index) == len(quantity) == len(price):
+            raise ValueError("user_index, symbol_index, quantity and price must have the same length")
+        for name, index, size in (("user_index", user_index, len(owners)), ("symbol_index", symbol_index, len(symbols))):
+            if len(index) and (index.min() < 0 or index.max() >= size):
+                raise ValueError(f"{name} must be in [0, {size})")
+        # names can repeat in owners and symbols, pairs are compared by name
+        owner_ids, symbol_ids = {}, {}
+        owner_codes = np.array([owner_ids.setdefault(owner, len(owner_ids)) for owner in owners], dtype=np.int64)
+        symbol_codes = np.array([symbol_ids.setdefault(symbol, len(symbol_ids)) for symbol in symbols], dtype=np.int64)
+        pairs = np.sort(owner_codes[user_index] * len(symbol_ids) + symbol_codes[symbol_index])
+        if np.any(pairs[1:] == pairs[:-1]):
+            raise ValueError("a (user, symbol) pair is given more than once")
+        order = np.argsort(symbol_index, kind="stable")
+        bounds = np.searchsorted(symbol_index[order], np.arange(len(symbols) + 1))
+        with self._lock:
+            known = np.array([self.users.get(owner, -1) for owner in owners], dtype=np.int64)[user_index]
+            for code, symbol in enumerate(symbols):
+                positions = self.positions.get(symbol)
+                held = known[order[bounds[code]:bounds[code + 1]]]
+                if positions is not None and not positions.slots.keys().isdisjoint(held.tolist()):
+                    raise ValueError(f"a user already holds a position in {symbol}")
+            rows = np.array([self._user(owner) for owner in owners], dtype=np.int64)[user_index]
+            for code, symbol in enumerate(symbols):
+                selected = order[bounds[code]:bounds[code + 1]]
+                if len(selected) == 0:
+                    continue
+                positions = self._positions(symbol)
+                users, quantities = rows[selected], quantity[selected].astype(np.float64)
+                costs = quantities * price[selected]
+                start = positions.size
+                end = start + len(selected)
+                positions.reserve(end)
+                positions.users[start:end] = users
+                positions.quantity[start:end] = quantities
+                positions.cost[start:end] = costs
+                positions.value[start:end] = costs
+                positions.slots.update(zip(users.tolist(), range(start, end)))
+                positions.size = end
+                self.cash[users] -= costs
+                self.cost[users] += costs
+                self.market_value[users] += costs
+                self.gross_exposure[users] += np.abs(costs)
+                mark = self.marks.get(symbol)
+                if mark is not None:
+                    self._revalue(positions, mark)
+
+    def apply_fill(self, owner: str, symbol: str, side: int, quantity: float, price: float) -> None:
+        """
+        Book one side of a fill: average cost for the open quantity, realized P&L on
+        the closed part
+
+        :param side: BUY or SELL
+        """
+        with self._lock:
+            self._apply(owner, symbol, side, quantity, price)
+
+    def apply_fills(self, fills: Iterable[Fill]) -> None:
+        """Book both sides of matching engine fills, the market side is skipped"""
+        with self._lock:
+            for fill in fills:
+                if fill.buyer is not None:
+                    self._apply(fill.buyer, fill.symbol, BUY, fill.quantity, fill.price)
+                if fill.seller is not None:
+                    self._apply(fill.seller, fill.symbol, SELL, fill.quantity, fill.price)
+
+    def _apply(self, owner: str, symbol: str, side: int, quantity: float, price: float) -> None:
+        user = self._user(owner)
+        positions = self._positions(symbol)
+        slot = positions.slot(user)
+        held, cost = float(positions.quantity[slot]), float(positions.cost[slot])
+        change = side * quantity
+        new_held = held + change
+        if held == 0 or (held > 0) == (change > 0):
+            new_cost = cost + change * price
+        else:
+            average = cost / held
+            closed = min(abs(change), abs(held))
+            self.realized[user] += closed * (price - average) * (1 if held > 0 else -1)
+            # what is left of the position keeps its average, a flipped one starts at `price`
+            new_cost = new_held * (average if abs(change) <= abs(held) else price)
+        self.cash[user] -= change * price
+
+        mark = self.marks.get(symbol, price)
+        old_value, new_value = float(positions.value[slot]), new_held * mark
+        positions.quantity[slot] = new_held
+        positions.cost[slot] = new_cost
+        positions.value[slot] = new_value
+        self.cost[user] += new_cost - cost
+        self.market_value[user] += new_value - old_value
+        self.gross_exposure[user] += abs(new_value) - abs(old_value)
+
+    def mark(self, prices: dict[str, float]) -> None:
+        """Revalue the holders of each symbol in `prices`, one vectorized pass per symbol"""
+        with self._lock:
+            for symbol, price in prices.items():
+                self.marks[symbol] = price
+                positions = self.positions.get(symbol)
+                if positions is not None and positions.size:
+                    self._revalue(positions, price)
+
+    def _revalue(self, positions: SymbolPositions, price: float) -> None:
+        n = positions.size
+        users, old_value = positions.users[:n], positions.value[:n]
+        new_value = positions.quantity[:n] * price
+        # users are unique within a symbol, so the fancy-indexed additions do not collide
+        self.market_value[users] += new_value - old_value
+        self.gross_exposure[users] += np.abs(new_value) - np.abs(old_value)
+        positions.value[:n] = new_value
+
+    def sync(self) -> int:
+        """Mark the held symbols that got ticks since the last call, returns how many"""
+        if self.store is None:
+            return 0
+        with self._lock:
+            held = list(self.positions)
+        prices = {}
+        for symbol in held:
+            version = self.store.version(symbol)
+            if version != self._versions.get(symbol):
+                self._versions[symbol] = version
+                price = self.store.last_price(symbol)
+                if price is not None:
+                    prices[symbol] = price
+        if prices:
+            self.mark(prices)
+        return len(prices)
+
+    def snapshot(self, owner: str) -> dict | None:
+        """Totals and open positions of `owner`, None for an unknown user"""
+        with self._lock:
+            user = self.users.get(owner)
+            if user is None:
+                return None
+            positions = []
+            for symbol, symbol_positions in self.positions.items():
+                slot = symbol_positions.slots.get(user)
+                if slot is None or symbol_positions.quantity[slot] == 0:
+                    continue
+                quantity = float(symbol_positions.quantity[slot])
+                cost, value = float(symbol_positions.cost[slot]), float(symbol_positions.value[slot])
+                positions.append({
+                    "symbol": symbol,
+                    "quantity": quantity,
+                    "average_price": cost / quantity,
+                    "mark": value / quantity,
+                    "market_value": value,
+                    "unrealized": value - cost,
+                })
+            market_value, cost = float(self.market_value[user]), float(self.cost[user])
+            return {
+                "user": owner,
+                "cash": float(self.cash[user]),
+                "market_value": market_value,
+                "equity": float(self.cash[user]) + market_value,
+                "unrealized": market_value - cost,
+                "realized": float(self.realized[user]),
+                "gross_exposure": float(self.gross_exposure[user]),
+                "net_exposure": market_value,
+                "positions": sorted(positions, key=lambda position: -abs(position["market_value"])),
+            }
+
+    def top(self, n: int = 10, by: str = "equity") -> list[tuple[str, float]]:
+        """The `n` users with the highest equity (or "unrealized", "realized", "gross_exposure")"""
+        with self._lock:
+            count = len(self.names)
+            values = {
+                "equity": lambda: self.cash[:count] + self.market_value[:count],
+                "unrealized": lambda: self.market_value[:count] - self.cost[:count],
+            }.get(by, lambda: getattr(self, by)[:count])()
+            best = np.argpartition(-values, min(n, count) - 1)[:n] if count > n else np.arange(count)
+            best = best[np.argsort(-values[best], kind="stable")]
+            return [(self.names[row], float(values[row])) for row in best]
+
+    def start(self, interval: float = 0.25) -> None:
+        """Mark against the tick store every `interval` seconds from a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="portfolio-marks", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Portfolio mark-to-market failed")
+
+
+def seed_demo_positions(engine: PortfolioEngine, n_users: int, prices: dict[str, float],
+                        per_user: int = 5, seed: int = 0) -> None:
+    """Give `n_users` made-up users `per_user` random long and short positions each"""
+    rng = np.random.default_rng(seed)
+    symbols = list(prices)
+    per_user = min(per_user, len(symbols))
+    user_index = np.repeat(np.arange(n_users), per_user)
+    # distinct symbols per user: the first `per_user` of a random permutation
+    symbol_index = np.argsort(rng.random((n_users, len(symbols))), axis=1)[:, :per_user].ravel()
+    quantity = rng.integers(1, 100, len(user_index)) * rng.choice([1, 1, 1, -1], len(user_index))
+    price = np.array([prices[symbol] for symbol in symbols])[symbol_index]
+    engine.load([f"demo{i}" for i in range(n_users)], symbols, user_index, symbol_index, quantity, price)
+
+
+portfolio_engine = PortfolioEngine(
+    store=tick_store,
+    starting_cash=float(environ.get("PORTFOLIO_STARTING_CASH", 100_000)),
+)
+matching_engine.on_fills(portfolio_engine.apply_fills)
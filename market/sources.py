@@ -0,0 +1,233 @@
+"""
+Tick sources feed the tick store from a background thread. A source implements
+`run(store, stop)` and returns when `stop` is set or it runs out of ticks.
+
+`ReplaySource` replays a CSV file of `time,symbol,price,size` rows, for offline
+work: as fast as possible, or paced at a multiple of the recorded speed.
+`RandomWalkSource` makes up live prices for demos.
+"""
+from collections.abc import Callable
+from os import environ
+from pathlib import Path
+import threading
+import time
+
+from flask import Flask
+import numpy as np
+import pandas as pd
+
+from utils.columnar_cache import load_columnar
+from utils.logger_script import logger
+from utils.warm_up import start_in_workers
+
+from .matching import matching_engine
+from .portfolio import portfolio_engine, seed_demo_positions
+from .ticks import TickStore, tick_store
+
+# sources add their ticks to the store in steps of this many seconds (of recorded time for replays)
+REPLAY_STEP = 0.1
+
+
+class TickSource:
+    name = "source"
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run(self, store: TickStore, stop: threading.Event) -> None:
+        raise NotImplementedError
+
+    def start(self, store: TickStore = tick_store) -> "TickSource":
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(store,), name=f"tick-source-{self.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self, store: TickStore) -> None:
+        logger.info(f"Tick source {self.name} started")
+        try:
+            self.run(store, self._stop)
+        except Exception:
+            logger.exception(f"Tick source {self.name} failed")
+        else:
+            logger.info(f"Tick source {self.name} finished")
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+def _build_replay(source: Path) -> tuple[dict[str, np.ndarray], dict]:
+    frame = pd.read_csv(source)
+    times = frame["time"]
+    if not pd.api.types.is_numeric_dtype(times):
+        # ISO timestamps, as epoch seconds
+        times = pd.to_datetime(times, utc=True).astype("int64") / 1e9
+    symbols = frame["symbol"].astype("category")
+    order = np.argsort(times.to_numpy(), kind="stable")
+    size = frame["size"] if "size" in frame else pd.Series(0.0, index=frame.index)
+    arrays = {
+        "time": times.to_numpy(dtype=np.float64)[order],
+        "symbol": symbols.cat.codes.to_numpy(dtype=np.int32)[order],
+        "price": frame["price"].to_numpy(dtype=np.float64)[order],
+        "size": size.to_numpy(dtype=np.float64)[order],
+    }
+    return arrays, {"symbols": list(symbols.cat.categories)}
+
+
+class ReplaySource(TickSource):
+    name = "replay"
+
+    def __init__(self, path: str | Path, speed: float | None = None, loop: bool = False, shift: bool = True):
+        """
+        :param speed: multiple of the recorded speed, None replays as fast as possible
+        :param loop: start over at the end of the file, later rounds are shifted in time
+        :param shift: move the recording so that it starts now
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.speed = speed
+        self.loop = loop
+        self.shift = shift
+        self.replayed = 0
+
+    def load(self) -> tuple[dict[str, np.ndarray], list[str]]:
+        arrays, meta = load_columnar(self.path, _build_replay)
+        return arrays, meta["symbols"]
+
+    def run(self, store: TickStore, stop: threading.Event) -> None:
+        arrays, symbols = self.load()
+        times = arrays["time"]
+        if len(times) == 0:
+            return
+        span = times[-1] - times[0] + REPLAY_STEP
+        offset = time.time() - times[0] if self.shift else 0.0
+        while not stop.is_set():
+            if self.speed is None:
+                self._add(store, arrays, symbols, 0, len(times), offset)
+            else:
+                self._paced(store, arrays, symbols, offset, stop)
+            if not self.loop:
+                return
+            offset += span
+
+    def _paced(self, store: TickStore, arrays: dict, symbols: list[str], offset: float, stop: threading.Event) -> None:
+        times = arrays["time"]
+        started = time.monotonic()
+        begin = 0
+        for step_end in np.arange(times[0] + REPLAY_STEP, times[-1] + 2 * REPLAY_STEP, REPLAY_STEP):
+            end = int(np.searchsorted(times, step_end))
+            if end == begin:
+                continue
+            delay = (times[begin] - times[0]) / self.speed - (time.monotonic() - started)
+            if delay > 0 and stop.wait(delay):
+                return
+            self._add(store, arrays, symbols, begin, end, offset)
+            begin = end
+
+    def _add(self, store: TickStore, arrays: dict, symbols: list[str], begin: int, end: int, offset: float) -> None:
+        codes = arrays["symbol"][begin:end]
+        times = arrays["time"][begin:end] + offset
+        for code in np.unique(codes):
+            mask = codes == code
+            store.add_ticks(
+                symbols[code], times[mask], arrays["price"][begin:end][mask], arrays["size"][begin:end][mask]
+            )
+        self.replayed += end - begin
+
+
+class RandomWalkSource(TickSource):
+    name = "random"
+
+    def __init__(self, symbols: list[str], rate: float = 100.0, volatility: float = 0.0005, seed: int | None = None):
+        """
+        :param rate: ticks per second and symbol
+        :param volatility: standard deviation of the relative price change per tick
+        """
+        super().__init__()
+        self.symbols = symbols
+        self.rate = rate
+        self.volatility = volatility
+        self._rng = np.random.default_rng(seed)
+        self.prices = dict(zip(symbols, self._rng.uniform(10, 500, len(symbols))))
+
+    def run(self, store: TickStore, stop: threading.Event) -> None:
+        last = time.time()
+        while not stop.wait(REPLAY_STEP):
+            now = time.time()
+            for symbol in self.symbols:
+                n = self._rng.poisson(self.rate * (now - last))
+                if n == 0:
+                    continue
+                prices = self.prices[symbol] * np.exp(np.cumsum(self._rng.normal(0, self.volatility, n)))
+                self.prices[symbol] = prices[-1]
+                times = np.sort(self._rng.uniform(last, now, n))
+                store.add_ticks(symbol, times, np.round(prices, 2), self._rng.integers(1, 500, n).astype(np.float64))
+            last = now
+
+
+# source name -> factory, the factory reads its settings from the environment
+SOURCES: dict[str, Callable[[], TickSource]] = {
+    "replay": lambda: ReplaySource(
+        environ["MARKET_REPLAY_FILE"],
+        speed=float(environ["MARKET_REPLAY_SPEED"]) if environ.get("MARKET_REPLAY_SPEED") else None,
+        loop=environ.get("MARKET_REPLAY_LOOP", "false").lower() == "true",
+    ),
+    "random": lambda: RandomWalkSource(
+        environ.get("MARKET_RANDOM_SYMBOLS", "AAA,BBB,CCC").split(","),
+        rate=float(environ.get("MARKET_RANDOM_RATE", 100)),
+    ),
+}
+
+
+def init_market(app: Flask) -> TickSource | None:
+    """Set up the tick source named by MARKET_SOURCE, if any, and the engines that follow its prices"""
+    name = app.config.get("MARKET_SOURCE")
+    if not name:
+        return None
+    if name not in SOURCES:
+        raise ValueError(f"Unknown MARKET_SOURCE {name!r}, expected one of {sorted(SOURCES)}")
+    source = SOURCES[name]()
+    app.extensions["market_source"] = source
+
+    def start():
+        source.start(tick_store)
+        # resting paper orders fill as the market trades through them, positions follow the prices
+        matching_engine.start(app.config.get("MATCHING_SYNC_INTERVAL", 0.25))
+        portfolio_engine.start(app.config.get("PORTFOLIO_MARK_INTERVAL", 0.25))
+
+    # the threads run in the worker processes (see `start_in_workers`)
+    start_market = start_in_workers(app, start)
+    demo_users = app.config.get("PORTFOLIO_DEMO_USERS", 0)
+    if demo_users:
+        def seed_demo() -> None:
+            # a warm-up run without WARM_UP_BACKGROUND comes before the first request,
+            # so the source may not be running yet
+            start_market()
+            _seed_demo(demo_users)
+
+        app.extensions["warm_up"].add_stage("portfolio_demo", seed_demo)
+    return source
+
+
+def _seed_demo(n_users: int, timeout: float = 5.0) -> None:
+    """Demo positions in the symbols the source has delivered within `timeout` seconds"""
+    deadline = time.monotonic() + timeout
+    while True:
+        # a symbol is listed as soon as its first ticks are being added, before it has a price
+        prices = {symbol: price for symbol in tick_store.symbols() if (price := tick_store.last_price(symbol)) is not None}
+        if prices or time.monotonic() >= deadline:
+            break
+        time.sleep(REPLAY_STEP)
+    if not prices:
+        logger.warning("No ticks to seed the demo portfolios with")
+        return
+    seed_demo_positions(portfolio_engine, n_users, prices)
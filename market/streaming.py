@@ -0,0 +1,208 @@
+"""
+Server-Sent Events fan-out of the tick store.
+
+One publisher thread samples the tick store every STREAM_INTERVAL seconds and
+encodes one message per symbol that changed: the last price and the two latest
+candles of every interval (the one just closed and the open one). Subscribers do not
+get a queue: the hub keeps only the latest message of each symbol, and each client
+sends whatever changed since its last write. A slow client skips to the newest value
+instead of building up a backlog, and a publish costs the same whatever the number
+of subscribers.
+
+Each subscriber holds a worker thread (or greenlet) for as long as it is connected,
+so serve the stream with a threaded or gevent worker.
+"""
+from collections.abc import Iterator
+import json
+from os import environ
+import threading
+import time
+
+from flask import Response
+
+from utils.logger_script import logger
+from utils.metrics import metrics
+
+from .ticks import TickStore, tick_store
+
+metrics.describe("market_stream_subscribers", "Clients connected to the market data stream")
+metrics.describe("market_stream_publish_seconds", "Time to encode and publish one round of market data updates")
+
+
+class TooManySubscribersError(Exception):
+    """Raised when a client subscribes while the hub is at capacity"""
+
+
+class Subscription:
+    """
+    Iterator over the frames of one subscriber. Closing it gives its slot back,
+    whether or not a frame was ever taken: a generator that never started does not
+    run its `finally` on close, which is what a HEAD request or a dropped response does.
+    """
+
+    def __init__(self, hub: "StreamHub", frames: Iterator[bytes]):
+        self._hub = hub
+        self._frames = frames
+        self._closed = False
+
+    def __iter__(self) -> "Subscription":
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._frames)
+
+    def close(self) -> None:
+        self._frames.close()
+        if not self._closed:
+            self._closed = True
+            self._hub._unsubscribe()
+
+    def __del__(self):
+        self.close()
+
+
+class StreamHub:
+    def __init__(
+        self,
+        store: TickStore = tick_store,
+        interval: float = 0.25,
+        heartbeat: float = 15.0,
+        max_subscribers: int = 10_000,
+    ):
+        """
+        :param interval: seconds between two samples of the tick store
+        :param heartbeat: seconds of silence after which a comment line is sent, so
+            proxies keep the connection open and disconnected clients are noticed
+        """
+        self.store = store
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        # symbol -> (sequence number, encoded SSE frame)
+        self._latest: dict[str, tuple[int, bytes]] = {}
+        self._sequence = 0
+        self._subscribers = 0
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._versions: dict[str, int] = {}
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def start(self) -> None:
+        """Start the publisher thread, if it is not running yet"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="market-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish_changes()
+            except Exception:
+                logger.exception("Market stream publish failed")
+
+    def message(self, symbol: str) -> bytes:
+        """SSE frame with the latest price and candles of `symbol`"""
+        ticks = self.store.ticks(symbol, 1)
+        candles = {}
+        for interval in self.store.intervals:
+            window = self.store.candles(symbol, interval, 2)
+            candles[interval] = [list(row) for row in zip(*(column.tolist() for column in window.values()))]
+        payload = {
+            "symbol": symbol,
+            "time": float(ticks["time"][-1]),
+            "price": float(ticks["price"][-1]),
+            "candles": candles,
+            "sent": time.time(),
+        }
+        return f"event: quote\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode()
+
+    def publish_changes(self) -> int:
+        """Publish the symbols that got ticks since the last call, returns how many"""
+        start = time.perf_counter()
+        messages = {}
+        for symbol in self.store.symbols():
+            version = self.store.version(symbol)
+            if version != self._versions.get(symbol):
+                self._versions[symbol] = version
+                messages[symbol] = self.message(symbol)
+        if messages:
+            self.publish(messages)
+            metrics.observe("market_stream_publish_seconds", time.perf_counter() - start)
+        return len(messages)
+
+    def publish(self, messages: dict[str, bytes]) -> None:
+        """Replace the latest frame of each symbol and wake the subscribers"""
+        with self._condition:
+            for symbol, message in messages.items():
+                self._sequence += 1
+                self._latest[symbol] = (self._sequence, message)
+            self._condition.notify_all()
+
+    def _pending(self, seen: dict[str, int]) -> list[tuple[str, int, bytes]]:
+        latest = self._latest
+        return [
+            (symbol, *latest[symbol])
+            for symbol, sequence in seen.items()
+            if symbol in latest and latest[symbol][0] != sequence
+        ]
+
+    def subscribe(self, symbols: list[str]) -> Subscription:
+        """
+        SSE frames for `symbols`, starting with their latest values. The subscriber
+        counts against `max_subscribers` until the subscription is closed.
+
+        :raises TooManySubscribersError: when `max_subscribers` clients are connected
+        """
+        with self._condition:
+            if self._subscribers >= self.max_subscribers:
+                raise TooManySubscribersError(f"{self._subscribers} clients are already subscribed")
+            self._subscribers += 1
+        metrics.gauge_add("market_stream_subscribers", 1)
+        self.start()
+        return Subscription(self, self._frames(dict.fromkeys(symbols, 0)))
+
+    def _unsubscribe(self) -> None:
+        with self._condition:
+            self._subscribers -= 1
+        metrics.gauge_add("market_stream_subscribers", -1)
+
+    def _frames(self, seen: dict[str, int]) -> Iterator[bytes]:
+        yield b"retry: 2000\n\n"
+        while not self._stop.is_set():
+            with self._condition:
+                self._condition.wait_for(lambda: self._stop.is_set() or self._pending(seen), self.heartbeat)
+                pending = self._pending(seen)
+            if not pending:
+                yield b": keepalive\n\n"
+                continue
+            for symbol, sequence, _ in pending:
+                seen[symbol] = sequence
+            yield b"".join(message for _, _, message in pending)
+
+    def response(self, symbols: list[str]) -> Response:
+        response = Response(self.subscribe(symbols), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        # nginx would otherwise buffer the stream
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+
+stream_hub = StreamHub(
+    interval=float(environ.get("STREAM_INTERVAL", 0.25)),
+    heartbeat=float(environ.get("STREAM_HEARTBEAT", 15)),
+    max_subscribers=int(environ.get("STREAM_MAX_SUBSCRIBERS", 10_000)),
+)
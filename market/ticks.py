@@ -0,0 +1,275 @@
+"""
+In-process market data: ticks per symbol in NumPy ring buffers, with OHLCV candles
+for several intervals updated incrementally as ticks arrive.
+
+Every ring buffer stores each row twice, at `i` and `i + capacity`, so the latest
+`n` rows are always one contiguous slice. `RingBuffer.window` returns views that share
+memory with the buffer. `TickStore.ticks` and `TickStore.candles` copy them under the
+symbol's lock, so readers never see rows that are being written, at the cost of a copy
+per read. Readers that only reduce the rows (a min, a max, a sum) can use
+`ticks_view` and `candles_view` instead, which hold the lock while the views are used
+and copy nothing.
+"""
+from collections.abc import Iterator
+from contextlib import contextmanager
+from os import environ
+import threading
+
+import numpy as np
+
+# candle interval name -> seconds
+INTERVALS: dict[str, int] = {"1s": 1, "1m": 60, "5m": 300, "1h": 3600}
+
+TICK_FIELDS = ("time", "price", "size")
+CANDLE_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+class RingBuffer:
+    """Fixed number of float64 rows, the oldest are overwritten"""
+
+    def __init__(self, capacity: int, fields: tuple[str, ...]):
+        self.capacity = capacity
+        self.fields = fields
+        self.columns = {field: np.zeros(2 * capacity) for field in fields}
+        self._columns = tuple(self.columns[field] for field in fields)
+        # rows ever appended, the next row goes to count % capacity
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, row: tuple[float, ...]) -> None:
+        i = self.count % self.capacity
+        j = i + self.capacity
+        for column, value in zip(self._columns, row):
+            column[i] = value
+            column[j] = value
+        self.count += 1
+
+    def set_last(self, row: tuple[float, ...]) -> None:
+        """Overwrite the latest row"""
+        i = (self.count - 1) % self.capacity
+        j = i + self.capacity
+        for column, value in zip(self._columns, row):
+            column[i] = value
+            column[j] = value
+
+    def extend(self, columns: tuple[np.ndarray, ...]) -> None:
+        """Append many rows at once, one array per field"""
+        n = len(columns[0])
+        if n == 0:
+            return
+        skip = max(n - self.capacity, 0)
+        positions = (self.count + skip + np.arange(n - skip)) % self.capacity
+        for column, values in zip(self._columns, columns):
+            column[positions] = values[skip:]
+            column[positions + self.capacity] = values[skip:]
+        self.count += n
+
+    def window(self, n: int | None = None) -> dict[str, np.ndarray]:
+        """The latest `n` rows (all of them by default), oldest first, as views"""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        # the latest row is at both end - 1 and end - 1 - capacity, rows before it in
+        # the same copy are contiguous for up to `capacity` rows
+        end = (self.count - 1) % self.capacity + 1 + self.capacity if self.count else 0
+        return {field: column[end - n:end] for field, column in self.columns.items()}
+
+
+class CandleSeries:
+    """OHLCV candles of one interval; the open candle is kept in Python floats and written out lazily"""
+
+    def __init__(self, seconds: int, capacity: int):
+        self.seconds = seconds
+        self.bars = RingBuffer(capacity, CANDLE_FIELDS)
+        # the open candle: start time, open, high, low, close, volume
+        self._start = None
+        self._open = self._high = self._low = self._close = self._volume = 0.0
+        self._dirty = False
+
+    def _open_row(self) -> tuple[float, ...]:
+        return (self._start, self._open, self._high, self._low, self._close, self._volume)
+
+    def add(self, time: float, price: float, size: float) -> None:
+        start = time - time % self.seconds
+        if self._start is not None and start <= self._start:
+            # same candle, late ticks are folded into it
+            if price > self._high:
+                self._high = price
+            elif price < self._low:
+                self._low = price
+            self._close = price
+            self._volume += size
+            self._dirty = True
+            return
+        if self._dirty:
+            self.bars.set_last(self._open_row())
+        self._start = start
+        self._open = self._high = self._low = self._close = price
+        self._volume = size
+        self.bars.append(self._open_row())
+        self._dirty = False
+
+    def add_many(self, times: np.ndarray, prices: np.ndarray, sizes: np.ndarray) -> None:
+        """Vectorized `add` of ticks in time order"""
+        if len(times) == 0:
+            return
+        starts = times - times % self.seconds
+        if self._start is not None:
+            starts = np.maximum(starts, self._start)
+        first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        last = np.r_[first[1:], len(times)] - 1
+        opens, closes = prices[first], prices[last]
+        highs = np.maximum.reduceat(prices, first)
+        lows = np.minimum.reduceat(prices, first)
+        volumes = np.add.reduceat(sizes, first)
+
+        if self._start is not None and starts[0] == self._start:
+            # the first group continues the open candle
+            opens[0] = self._open
+            highs[0] = max(highs[0], self._high)
+            lows[0] = min(lows[0], self._low)
+            volumes[0] += self._volume
+            self.bars.set_last((self._start, opens[0], highs[0], lows[0], closes[0], volumes[0]))
+            rows = (starts[first][1:], opens[1:], highs[1:], lows[1:], closes[1:], volumes[1:])
+        else:
+            if self._dirty:
+                self.bars.set_last(self._open_row())
+            rows = (starts[first], opens, highs, lows, closes, volumes)
+        self.bars.extend(rows)
+
+        self._start = float(starts[-1])
+        self._open, self._high, self._low = float(opens[-1]), float(highs[-1]), float(lows[-1])
+        self._close, self._volume = float(closes[-1]), float(volumes[-1])
+        self._dirty = False
+
+    def window(self, n: int | None = None) -> dict[str, np.ndarray]:
+        if self._dirty:
+            self.bars.set_last(self._open_row())
+            self._dirty = False
+        return self.bars.window(n)
+
+
+class SymbolTicks:
+    __slots__ = ("ticks", "candles", "lock", "last_price")
+
+    def __init__(self, capacity: int, candle_capacity: int, intervals: dict[str, int]):
+        self.ticks = RingBuffer(capacity, TICK_FIELDS)
+        self.candles = {name: CandleSeries(seconds, candle_capacity) for name, seconds in intervals.items()}
+        self.lock = threading.Lock()
+        self.last_price: float | None = None
+
+
+class TickStore:
+    def __init__(
+        self,
+        capacity: int = 1_000_000,
+        candle_capacity: int = 10_000,
+        intervals: dict[str, int] | None = None,
+    ):
+        """
+        :param capacity: ticks kept per symbol
+        :param candle_capacity: candles kept per symbol and interval
+        """
+        self.capacity = capacity
+        self.candle_capacity = candle_capacity
+        self.intervals = dict(intervals or INTERVALS)
+        self._symbols: dict[str, SymbolTicks] = {}
+        self._lock = threading.Lock()
+
+    def _series(self, symbol: str) -> SymbolTicks:
+        series = self._symbols.get(symbol)
+        if series is None:
+            with self._lock:
+                series = self._symbols.get(symbol)
+                if series is None:
+                    series = self._symbols[symbol] = SymbolTicks(
+                        self.capacity, self.candle_capacity, self.intervals
+                    )
+        return series
+
+    def add_tick(self, symbol: str, time: float, price: float, size: float = 0.0) -> None:
+        series = self._series(symbol)
+        with series.lock:
+            series.ticks.append((time, price, size))
+            for candles in series.candles.values():
+                candles.add(time, price, size)
+            series.last_price = price
+
+    def add_ticks(self, symbol: str, times: np.ndarray, prices: np.ndarray, sizes: np.ndarray | None = None) -> None:
+        """Add a batch of ticks in time order, vectorized"""
+        times = np.asarray(times, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        sizes = np.zeros(len(times)) if sizes is None else np.asarray(sizes, dtype=np.float64)
+        if len(times) == 0:
+            return
+        series = self._series(symbol)
+        with series.lock:
+            series.ticks.extend((times, prices, sizes))
+            for candles in series.candles.values():
+                candles.add_many(times, prices, sizes)
+            series.last_price = float(prices[-1])
+
+    def ticks(self, symbol: str, n: int | None = None) -> dict[str, np.ndarray]:
+        """Copy of the latest `n` ticks of `symbol` (time, price, size), empty for an unknown symbol"""
+        with self.ticks_view(symbol, n) as window:
+            return {field: values.copy() for field, values in window.items()}
+
+    def candles(self, symbol: str, interval: str, n: int | None = None) -> dict[str, np.ndarray]:
+        """
+        Copy of the latest `n` candles of `symbol` (time, open, high, low, close, volume),
+        the last one is still open. Empty for an unknown symbol.
+
+        :raises KeyError: for an interval the store does not keep
+        """
+        with self.candles_view(symbol, interval, n) as window:
+            return {field: values.copy() for field, values in window.items()}
+
+    @contextmanager
+    def ticks_view(self, symbol: str, n: int | None = None) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Like `ticks`, but the arrays are views of the ring buffer. The symbol's lock is
+        held until the `with` block exits, which blocks the symbol's writers: keep the
+        block short and do not use the arrays after it.
+        """
+        series = self._symbols.get(symbol)
+        if series is None:
+            yield {field: np.empty(0) for field in TICK_FIELDS}
+            return
+        with series.lock:
+            yield series.ticks.window(n)
+
+    @contextmanager
+    def candles_view(self, symbol: str, interval: str, n: int | None = None) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Like `candles`, but the arrays are views of the ring buffer, valid inside the
+        `with` block only (see `ticks_view`).
+
+        :raises KeyError: for an interval the store does not keep
+        """
+        if interval not in self.intervals:
+            raise KeyError(interval)
+        series = self._symbols.get(symbol)
+        if series is None:
+            yield {field: np.empty(0) for field in CANDLE_FIELDS}
+            return
+        with series.lock:
+            yield series.candles[interval].window(n)
+
+    def version(self, symbol: str) -> int:
+        """Number of ticks `symbol` ever got, to tell whether it changed"""
+        series = self._symbols.get(symbol)
+        return series.ticks.count if series is not None else 0
+
+    def last_price(self, symbol: str) -> float | None:
+        series = self._symbols.get(symbol)
+        return series.last_price if series is not None else None
+
+    def symbols(self) -> list[str]:
+        return sorted(self._symbols)
+
+
+tick_store = TickStore(
+    capacity=int(environ.get("TICK_STORE_CAPACITY", 1_000_000)),
+    candle_capacity=int(environ.get("TICK_STORE_CANDLES", 10_000)),
+)
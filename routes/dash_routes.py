@@ -1,9 +1,28 @@
-from flask import Flask
 from flask import current_app as flask_app
-from flask import render_template
 
-from flask_dash import crossfilter_example, demo, iris_kmeans
+from flask_dash.registry import DashRegistry
+from utils.metrics import init_metrics
+from utils.sessions import init_sessions
+from utils.templates import configure_templates
 
-app: Flask = demo.init_flask_dash_app(flask_app)
-app: Flask = iris_kmeans.init_flask_dash_app(flask_app)
-app: Flask = crossfilter_example.init_flask_dash_app(flask_app)
+# Dash apps are only imported and built on the first request to their prefix
+# (or by the warm-up thread), so cold starts do not pay for every dashboard
+dash_registry = DashRegistry(flask_app._get_current_object())
+dash_registry.on_mount(configure_templates)
+# the Dash servers have no static folder, their pages link the main app's files
+static_url = flask_app.jinja_env.globals["static_url"]
+dash_registry.on_mount(lambda server: server.add_template_global(static_url, "static_url"))
+dash_registry.on_mount(init_metrics)
+dash_registry.on_mount(init_sessions)
+dash_registry.on_mount(flask_app.extensions["profiler"].init_app)
+dash_registry.register("/demo/", "flask_dash.demo")
+dash_registry.register("/iris-k-means/", "flask_dash.iris_kmeans")
+dash_registry.register("/crossfilter-example/", "flask_dash.crossfilter_example")
+dash_registry.register("/live-chart/", "flask_dash.live_chart")
+dash_registry.register("/portfolio/", "flask_dash.portfolio")
+dash_registry.register("/backtest/", "flask_dash.backtest")
+
+if flask_app.config.get("DASH_WARM_UP"):
+    warm_up = flask_app.extensions["warm_up"]
+    warm_up.add_stage("dash_apps", dash_registry.mount_all)
+    warm_up.add_stage("dash_callbacks", dash_registry.warm_callbacks)
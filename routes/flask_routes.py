@@ -1,16 +1,21 @@
 from flask import current_app as flask_app
-from flask import render_template, redirect
+from flask import render_template, redirect, session, jsonify, request, Response
 from flask.helpers import url_for
-from requests import Response
+from plotly.io.json import to_json_plotly
 
-from utils.render_readme import get_rendered_readme
+from utils.render_readme import get_readme_response
 from forms.userbase_logic import SignUpForm, LoginForm
-from comms import get_sign_up_response
-from utils import logger
+from comms import register_user, BackendUnavailableError
+from utils import logger, job_queue
+from utils.job_queue import QueueFullError
+from utils.metrics import metrics_response
+from utils.sessions import SESSION_SIGN_UP_JOB, sign_in_admin, sign_out, start_sign_up
+from market import tick_store, stream_hub
+from market.streaming import TooManySubscribersError
 
 @flask_app.route("/")
-def index() -> str:
-    return get_rendered_readme()
+def index():
+    return get_readme_response()
     
 
 @flask_app.route("/login", methods=["GET", "POST"])
@@ -28,25 +33,24 @@ def sign_up():
     form = SignUpForm()
 
     if form.validate_on_submit() and form.password.data == form.repeat_password.data:
-        # communicate with fastAPI server to regiter the user
-        print(f"{form.data}")
-        response = get_sign_up_response(email=form.email.data, username=form.username.data, password=form.password.data)
-        
-        if isinstance(response, Response):
-            try:
-                response_json: dict = response.json()
-                if response["success"] == True:
-                    logger.debug(f"User {form.username.data} sign up has been successful")
-                else:
-                    logger.error(f"User {form.username.data} sign up has failed")
-            except Exception as error:
-                logger.error(f"Got bad response from other server: {error}")
-        if isinstance(response, dict):
-            try:
-                logger.debug(f"Communication between servers has failed: {response["internal_error"]}")
-            except Exception as error:
-                logger.error(f"Got bad response from own server: {error}")
-        
+        # communicate with fastAPI server to regiter the user, in the background
+        # so the worker is not blocked while the other server answers
+        try:
+            job_id = job_queue.submit(
+                register_user,
+                email=form.email.data,
+                username=form.username.data,
+                password=form.password.data,
+                retry_on=(BackendUnavailableError,),
+            )
+        except QueueFullError as error:
+            logger.error(f"User {form.username.data} sign up was rejected: {error}")
+            return render_template("sign_up.html", form=form, error="Too many sign ups right now, please try again")
+
+        # the session is signed in once the job has registered the user (see utils/sessions.py)
+        start_sign_up(job_id, form.username.data)
+        logger.debug(f"User {form.username.data} sign up has been queued as job {job_id}")
+
         # Redirect to home page
         return redirect(url_for("index"))
     elif form.validate_on_submit() and form.password.data != form.repeat_password.data:
@@ -57,15 +61,77 @@ def sign_up():
         logger.error(f"User {form.username.data} sign up has failed miserably")
         return render_template("sign_up.html", form=form)
 
+@flask_app.route("/sign_up/status")
+@flask_app.route("/sign_up/status/<job_id>")
+def sign_up_status(job_id: str | None = None):
+    job_id = job_id or session.get(SESSION_SIGN_UP_JOB)
+    job = job_queue.get(job_id) if job_id else None
+    if job is None:
+        return jsonify({"error": "unknown sign up job"}), 404
+    return jsonify(job.to_dict())
+
+
+@flask_app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving"""
+    return jsonify({"status": "ok"})
+
+
+@flask_app.route("/readyz")
+def readyz():
+    """Readiness: the warm-up stages have run. Also lists the Dash apps and their mount times or errors."""
+    report = flask_app.extensions["warm_up"].report()
+    report["dash_apps"] = flask_app.extensions["dash_registry"].report()
+    return jsonify(report), 200 if report["ready"] else 503
+
 
 @flask_app.route("/logout")
 def logout():
-    # logout_user()
+    sign_out()
     return redirect(url_for("index"))
 
 
+@flask_app.route("/admin/sign_in/<token>")
+def admin_sign_in(token: str):
+    """Make the session an admin's, with a link from `python -m utils.sessions`"""
+    if not sign_in_admin(flask_app.config.get("SECRET_KEY"), token):
+        return jsonify({"error": "invalid or expired admin token"}), 403
+    return redirect("/portfolio/")
+
+
 @flask_app.route("/tradingview", methods=["GET", "POST"])
 def tradingview_page() -> str:
     return render_template(
         "tradingview.html"
         )
+
+
+@flask_app.route("/market/candles/<symbol>")
+def market_candles(symbol: str):
+    """Latest candles of `symbol` from the tick store, ?interval=1m&n=500"""
+    interval = request.args.get("interval", "1m")
+    n = request.args.get("n", 500, type=int)
+    if interval not in tick_store.intervals:
+        return jsonify({"error": f"unknown interval, expected one of {list(tick_store.intervals)}"}), 400
+    if symbol not in tick_store.symbols():
+        return jsonify({"error": "unknown symbol"}), 404
+    candles = tick_store.candles(symbol, interval, max(n, 0))
+    return Response(to_json_plotly({"symbol": symbol, "interval": interval, **candles}), mimetype="application/json")
+
+
+@flask_app.route("/market/stream")
+def market_stream():
+    """Server-Sent Events with the latest price and candles, ?symbols=AAA,BBB (all symbols by default)"""
+    symbols = [symbol for symbol in request.args.get("symbols", "").split(",") if symbol] or tick_store.symbols()
+    if not symbols:
+        return jsonify({"error": "no symbols to stream"}), 404
+    try:
+        return stream_hub.response(symbols)
+    except TooManySubscribersError as error:
+        logger.warning(f"Rejected market stream subscriber: {error}")
+        return jsonify({"error": "too many subscribers, please retry later"}), 503
+
+
+@flask_app.route("/metrics")
+def metrics_page():
+    return metrics_response()
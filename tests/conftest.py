@@ -0,0 +1,18 @@
+import os
+
+# settings read at import time by the project modules, before any test imports them
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("APP_NAME", "Test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("DASH_WARM_UP", "false")
+os.environ.setdefault("PRECOMPUTE_README", "false")
+os.environ.setdefault("WARM_UP_BACKGROUND", "false")
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app():
+    from main import create_app
+
+    return create_app()
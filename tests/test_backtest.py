@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market import backtest
+from market.backtest import Bars, run_backtest
+
+
+@pytest.fixture
+def bars():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "time": np.tile(np.arange(200.0) * 60, 2),
+        "symbol": np.repeat(["AAA", "BBB"], 200),
+        "open": 100 + rng.normal(0, 1, 400).cumsum(),
+        "close": 100 + rng.normal(0, 1, 400).cumsum(),
+    })
+    return Bars.from_frame(frame)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, max_workers: int):
+        super().__init__(max_workers)
+        self.tasks = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        self.tasks += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_grids_are_split_by_pool_size(bars):
+    expected = run_backtest(bars, [2, 3, 4, 5], [10, 20], parallel=False)
+    for workers, tasks in ((1, 2), (4, 8)):
+        with CountingExecutor(workers) as executor:
+            frame = run_backtest(bars, [2, 3, 4, 5], [10, 20], executor=executor)
+        assert executor.tasks == tasks
+        pd.testing.assert_frame_equal(frame, expected)
+
+
+def test_failed_runs_wait_for_their_tasks(bars, monkeypatch):
+    evaluate_shared, unlink_shared = backtest._evaluate_shared, backtest.SharedArrays.__exit__
+    running, running_at_unlink, started = [], [], threading.Event()
+
+    def fail_first(spec, start, *args):
+        if start == 0:
+            # fail while the other symbol's tasks read the block
+            started.wait(1)
+            raise RuntimeError("no bars")
+        running.append(start)
+        started.set()
+        time.sleep(0.1)
+        result = evaluate_shared(spec, start, *args)
+        running.remove(start)
+        return result
+
+    def unlink(shared, *exc_info):
+        running_at_unlink.append(len(running))
+        return unlink_shared(shared, *exc_info)
+
+    monkeypatch.setattr(backtest, "_evaluate_shared", fail_first)
+    monkeypatch.setattr(backtest.SharedArrays, "__exit__", unlink)
+    # enough workers to run every task at once
+    with ThreadPoolExecutor(8) as executor, pytest.raises(RuntimeError):
+        run_backtest(bars, [2, 3], [10, 20], executor=executor)
+    assert running_at_unlink == [0]
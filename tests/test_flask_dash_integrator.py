@@ -0,0 +1,49 @@
+import gzip
+import re
+
+import brotli
+from dash import html
+import pytest
+
+from flask_dash.flask_dash_integrator import FlaskDash
+
+
+@pytest.fixture
+def client(app):
+    server = app.extensions["dash_registry"].create_server()
+    dash_app = FlaskDash(server=server, routes_pathname_prefix="/app/")
+    dash_app.layout = html.Div("hello")
+    return server.test_client()
+
+
+def suite_paths(client) -> list[str]:
+    page = client.get("/app/").get_data(as_text=True)
+    return re.findall(r'src="(/app/_dash-component-suites/[^"]+\.js)"', page)
+
+
+@pytest.mark.parametrize("encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_repeat_suite_requests_are_compressed_once(client, encoding, decompress):
+    path = suite_paths(client)[0]
+    plain = client.get(path).get_data()
+    assert plain
+
+    for _ in range(3):
+        response = client.get(path, headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == encoding
+        assert decompress(response.get_data()) == plain
+
+
+def test_suites_are_cached_per_resource_not_per_path(client):
+    path = suite_paths(client)[0]
+    fingerprinted = re.sub(r"\.v\w+m\d+\.", ".v1_0_0m123.", path, count=1)
+    assert fingerprinted != path
+    app = client.application.extensions["flask_dash"]
+
+    first, second = client.get(path), client.get(fingerprinted)
+
+    assert first.get_data() == second.get_data()
+    assert len(app._suite_payloads) == 1
+    assert second.cache_control.immutable
+    assert client.get("/app/_dash-component-suites/dash/not-registered.js").status_code >= 400
+    assert len(app._suite_payloads) == 1
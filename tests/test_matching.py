@@ -0,0 +1,110 @@
+import itertools
+
+from market.matching import BUY, SELL, MatchingEngine, fills_digest, load_journal, replay, save_journal
+from market.ticks import TickStore
+
+
+def recorded_session(store: TickStore) -> MatchingEngine:
+    clock = itertools.count(1).__next__
+    engine = MatchingEngine(store=store, clock=clock, record=True)
+    engine.submit_limit("alice", "AAA", SELL, 10, 101.0)
+    engine.submit_limit("bob", "AAA", SELL, 5, 102.0)
+    cancelled, _ = engine.submit_limit("carol", "AAA", BUY, 7, 99.0)
+    engine.cancel(cancelled.id)
+    # more than the book holds, the remainder fills at the store's last price
+    engine.submit_market("dave", "AAA", BUY, 20)
+    engine.submit_limit("erin", "AAA", BUY, 3, 98.0)
+    store.add_tick("AAA", 10.0, 97.5, 1.0)
+    engine.sync()
+    engine.submit_market("frank", "AAA", SELL, 4)
+    # no ticks for this symbol, the market order is cancelled
+    engine.submit_market("grace", "BBB", SELL, 2)
+    return engine
+
+
+def store_with_ticks() -> TickStore:
+    store = TickStore(capacity=100, candle_capacity=10)
+    store.add_tick("AAA", 1.0, 100.0, 1.0)
+    return store
+
+
+def test_replay_gives_the_same_fills():
+    store = store_with_ticks()
+    fills = []
+    clock = itertools.count(1).__next__
+    engine = MatchingEngine(store=store, clock=clock, record=True)
+    engine.on_fills(fills.extend)
+    engine.submit_limit("alice", "AAA", SELL, 10, 101.0)
+    engine.submit_market("dave", "AAA", BUY, 20)
+
+    _, replayed = replay(engine.journal, store=store)
+
+    assert [fill.to_tuple() for fill in replayed] == [fill.to_tuple() for fill in fills]
+    assert [fill.price for fill in fills] == [101.0, 100.0]
+
+
+def test_replay_does_not_depend_on_the_store_at_replay_time():
+    store = store_with_ticks()
+    engine = recorded_session(store)
+    _, fills = replay(engine.journal, store=store_with_ticks())
+    market_fill = next(fill for fill in fills if fill.buyer == "dave" and fill.seller is None)
+    assert market_fill.price == 100.0
+
+    store.add_tick("AAA", 20.0, 150.0, 1.0)
+    store.add_tick("BBB", 20.0, 50.0, 1.0)
+    _, moved_on = replay(engine.journal, store=store)
+    _, without_store = replay(engine.journal)
+
+    assert fills_digest(moved_on) == fills_digest(fills)
+    assert fills_digest(without_store) == fills_digest(fills)
+    assert not any(fill.seller == "grace" for fill in moved_on)
+
+
+def test_saved_journal_replays_the_same(tmp_path):
+    engine = recorded_session(store_with_ticks())
+    _, fills = replay(engine.journal)
+    path = tmp_path / "journal.jsonl"
+    save_journal(engine.journal, path)
+
+    replayed_engine, replayed = replay(load_journal(path))
+
+    assert fills_digest(replayed) == fills_digest(fills)
+    assert replayed_engine.journal == engine.journal
+
+
+def test_market_command_without_a_price_uses_the_store():
+    store = store_with_ticks()
+    _, fills = replay([("market", "dave", "AAA", BUY, 5, 1.0)], store=store)
+    assert [(fill.price, fill.quantity) for fill in fills] == [(100.0, 5)]
+
+    _, fills = replay([("market", "dave", "AAA", BUY, 5, 1.0)])
+    assert fills == []
+
+
+def test_filled_levels_go_whatever_the_rounding():
+    engine = MatchingEngine(clock=itertools.count(1).__next__)
+    engine.submit_limit("alice", "AAA", SELL, 569203.9, 10.0)
+    engine.submit_limit("bob", "AAA", SELL, 255069.03, 10.0)
+    engine.submit_limit("carol", "AAA", SELL, 0.7, 10.5)
+
+    # the level's float volume does not come back to exactly 0
+    engine.submit_market("dave", "AAA", BUY, 569203.9)
+    engine.submit_market("dave", "AAA", BUY, 255069.03)
+    assert engine.top_of_book("AAA")["ask"] == 10.5
+
+    # crossing the emptied price goes on to the next level
+    _, fills = engine.submit_limit("erin", "AAA", BUY, 0.3, 11.0)
+    assert [(fill.price, fill.quantity) for fill in fills] == [(10.5, 0.3)]
+    assert engine.depth("AAA")["asks"] == [(10.5, 0.7 - 0.3)]
+
+
+def test_cancelled_orders_leave_no_level_behind():
+    engine = MatchingEngine(clock=itertools.count(1).__next__)
+    first, _ = engine.submit_limit("alice", "AAA", BUY, 0.1, 9.0)
+    second, _ = engine.submit_limit("bob", "AAA", BUY, 0.2, 9.0)
+    engine.submit_limit("carol", "AAA", SELL, 0.1, 9.0)
+    engine.cancel(second.id)
+
+    assert first.status == "filled"
+    assert engine.top_of_book("AAA")["bid"] is None
+    assert engine.depth("AAA")["bids"] == []
@@ -0,0 +1,36 @@
+import time
+
+from comms import backend_client
+from utils import job_queue
+from utils.metrics import MetricsRegistry
+
+
+def test_collectors_run_on_every_render():
+    registry = MetricsRegistry()
+    calls = []
+
+    def collect():
+        registry.gauge_set("depth", len(calls))
+        calls.append(None)
+
+    registry.collect(collect)
+
+    assert "depth 0" in registry.render()
+    assert "depth 1" in registry.render()
+
+
+def test_job_queue_stats_are_served(app):
+    job_id = job_queue.submit(lambda: None)
+    while not job_queue.get(job_id).done:
+        time.sleep(0.01)
+
+    page = app.test_client().get("/metrics").get_data(as_text=True)
+    assert "# TYPE job_queue_depth gauge" in page
+    succeeded = next(line for line in page.splitlines() if line.startswith('job_queue_jobs_total{outcome="succeeded"}'))
+    assert float(succeeded.split()[-1]) >= 1
+
+
+def test_backend_client_stats_are_served(app):
+    page = app.test_client().get("/metrics").get_data(as_text=True)
+    assert f'backend_circuit_state{{state="{backend_client.circuit_breaker.state}"}} 1' in page
+    assert f"backend_pool_maxsize {backend_client.pool_maxsize}" in page
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from market.matching import BUY
+from market.portfolio import PortfolioEngine
+
+
+def load(engine: PortfolioEngine, owners, symbols, user_index, symbol_index, quantity, price):
+    engine.load(owners, symbols, np.array(user_index), np.array(symbol_index), np.array(quantity, dtype=float),
+                np.array(price, dtype=float))
+
+
+def test_load_and_mark():
+    engine = PortfolioEngine(starting_cash=1000.0)
+    load(engine, ["alice", "bob"], ["AAA", "BBB"], [0, 0, 1], [0, 1, 0], [2, -1, 3], [10, 20, 10])
+    engine.mark({"AAA": 11.0})
+
+    alice = engine.snapshot("alice")
+    assert alice["market_value"] == pytest.approx(2 * 11 - 20)
+    assert alice["gross_exposure"] == pytest.approx(22 + 20)
+    assert alice["cash"] == pytest.approx(1000 - 20 + 20)
+    assert engine.snapshot("bob")["market_value"] == pytest.approx(33)
+
+
+@pytest.mark.parametrize("owners, symbols, user_index, symbol_index", [
+    (["alice"], ["AAA"], [0, 0], [0, 0]),
+    # the same names under two indices
+    (["alice", "alice"], ["AAA", "AAA"], [0, 1], [0, 1]),
+])
+def test_load_rejects_repeated_pairs(owners, symbols, user_index, symbol_index):
+    engine = PortfolioEngine()
+    with pytest.raises(ValueError):
+        load(engine, owners, symbols, user_index, symbol_index, [1, 1], [10, 10])
+    assert engine.users == {} and engine.positions == {}
+
+
+def test_load_rejects_held_pairs():
+    engine = PortfolioEngine(starting_cash=1000.0)
+    load(engine, ["alice"], ["AAA"], [0], [0], [2], [10])
+    engine.apply_fill("bob", "BBB", BUY, 1, 5.0)
+
+    for symbol in ("AAA", "BBB"):
+        with pytest.raises(ValueError):
+            load(engine, ["carol", "alice", "bob"], [symbol], [0, 1 if symbol == "AAA" else 2], [0, 0], [1, 1], [10, 10])
+
+    engine.mark({"AAA": 12.0, "BBB": 6.0})
+    assert engine.snapshot("alice")["market_value"] == pytest.approx(24)
+    assert engine.snapshot("bob")["market_value"] == pytest.approx(6)
+    assert "carol" not in engine.users
+
+
+def test_load_rejects_indices_out_of_range():
+    engine = PortfolioEngine()
+    with pytest.raises(ValueError):
+        load(engine, ["alice"], ["AAA"], [1], [0], [1], [10])
+    with pytest.raises(ValueError):
+        load(engine, ["alice"], ["AAA"], [0], [-1], [1], [10])
@@ -0,0 +1,98 @@
+import json
+import time
+
+import pytest
+
+from market import portfolio_engine
+from market.matching import BUY
+from utils import job_queue
+from utils.sessions import SESSION_SIGN_UP_JOB, SESSION_SIGN_UP_USER, make_admin_token
+
+OUTPUTS = [
+    ("portfolio-summary", "children"),
+    ("portfolio-positions", "data"),
+    ("portfolio-exposure", "figure"),
+    ("portfolio-symbols", "data"),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def positions():
+    portfolio_engine.apply_fill("alice", "AAA", BUY, 3, 10.0)
+    portfolio_engine.apply_fill("bob", "AAA", BUY, 5, 10.0)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def call(client, output_ids: list[tuple[str, str]], inputs: list[tuple[str, str, object]], state=()) -> dict:
+    def dependencies(values):
+        return [{"id": id_, "property": prop, "value": value} for id_, prop, value in values]
+
+    output = "...".join(f"{id_}.{prop}" for id_, prop in output_ids)
+    response = client.post("/portfolio/_dash-update-component", json={
+        "output": f"..{output}.." if len(output_ids) > 1 else output,
+        "outputs": [{"id": id_, "property": prop} for id_, prop in output_ids],
+        "inputs": dependencies(inputs),
+        "state": dependencies(state),
+        "changedPropIds": [],
+    })
+    assert response.status_code == 200
+    return json.loads(response.get_data())["response"]
+
+
+def portfolio(client, user: str | None) -> dict:
+    return call(client, OUTPUTS, [("portfolio-user", "value", user), ("portfolio-refresh", "data", None)],
+                [("portfolio-symbols", "data", None)])
+
+
+def user_options(client) -> list[str]:
+    response = call(client, [("portfolio-user", "options"), ("portfolio-user", "value")],
+                    [("portfolio-user", "id", "portfolio-user")])
+    return [option["value"] for option in response["portfolio-user"]["options"]]
+
+
+def sign_up(client, username: str, success: bool = True) -> None:
+    job_id = job_queue.submit(lambda username: {"success": success}, username=username)
+    while not job_queue.get(job_id).done:
+        time.sleep(0.01)
+    with client.session_transaction() as session:
+        session[SESSION_SIGN_UP_JOB], session[SESSION_SIGN_UP_USER] = job_id, username
+    client.get("/healthz")
+
+
+def test_signed_out_sessions_see_no_portfolio(client):
+    assert "Sign in" in json.dumps(portfolio(client, "alice")["portfolio-summary"])
+    assert user_options(client) == []
+
+
+def test_sign_up_signs_the_user_in(client):
+    sign_up(client, "alice")
+    with client.session_transaction() as session:
+        assert session["username"] == "alice"
+
+    assert user_options(client) == ["alice"]
+    response = portfolio(client, "alice")
+    assert [row["symbol"] for row in response["portfolio-positions"]["data"]] == ["AAA"]
+    # other users are not shown to a user
+    assert portfolio(client, "bob")["portfolio-positions"]["data"] == []
+
+
+def test_failed_sign_up_does_not_sign_in(client):
+    sign_up(client, "mallory", success=False)
+    with client.session_transaction() as session:
+        assert "username" not in session
+
+
+def test_admin_sign_in(app, client):
+    assert client.get("/admin/sign_in/forged").status_code == 403
+    token = make_admin_token(app.config["SECRET_KEY"])
+    assert client.get(f"/admin/sign_in/{token}").status_code == 302
+
+    assert {"alice", "bob"} <= set(user_options(client))
+    assert portfolio(client, "bob")["portfolio-positions"]["data"][0]["quantity"] == 5
+
+    client.get("/logout")
+    assert user_options(client) == []
@@ -0,0 +1,26 @@
+from flask import Flask
+
+from market import portfolio_engine
+from market.matching import matching_engine
+from market.sources import init_market
+from utils.warm_up import init_warm_up
+
+
+def test_demo_portfolios_are_seeded_by_a_synchronous_warm_up(monkeypatch):
+    monkeypatch.setenv("MARKET_RANDOM_SYMBOLS", "DEMO1,DEMO2")
+    monkeypatch.setenv("MARKET_RANDOM_RATE", "1000")
+    app = Flask(__name__)
+    app.config.update(MARKET_SOURCE="random", PORTFOLIO_DEMO_USERS=3)
+    warm_up = init_warm_up(app)
+    source = init_market(app)
+    try:
+        # no request has started the source yet
+        assert not source.running
+        warm_up.run()
+        assert warm_up.errors == {}
+        assert source.running
+        assert portfolio_engine.snapshot("demo2") is not None
+    finally:
+        source.stop()
+        matching_engine.stop()
+        portfolio_engine.stop()
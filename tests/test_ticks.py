@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from market.ticks import TickStore
+
+
+@pytest.fixture
+def store():
+    store = TickStore(capacity=4, candle_capacity=4, intervals={"1s": 1})
+    store.add_ticks("AAA", np.arange(6.0), np.arange(6.0) + 10, np.ones(6))
+    return store
+
+
+def test_views_match_copies_without_copying(store):
+    ticks = store.ticks("AAA", 3)
+    with store.ticks_view("AAA", 3) as view:
+        assert store._symbols["AAA"].lock.locked()
+        assert np.array_equal(view["price"], ticks["price"])
+        assert np.shares_memory(view["price"], store._symbols["AAA"].ticks.columns["price"])
+    assert not store._symbols["AAA"].lock.locked()
+    assert not np.shares_memory(ticks["price"], store._symbols["AAA"].ticks.columns["price"])
+
+    candles = store.candles("AAA", "1s")
+    with store.candles_view("AAA", "1s") as view:
+        assert view["close"].tolist() == candles["close"].tolist() == [12.0, 13.0, 14.0, 15.0]
+
+
+def test_views_of_unknown_symbols_are_empty(store):
+    with store.ticks_view("BBB") as view:
+        assert len(view["price"]) == 0
+    with pytest.raises(KeyError):
+        with store.candles_view("AAA", "1h"):
+            pass
@@ -1,3 +1,4 @@
-__all__ = ["render_readme", "logger_script"]
+__all__ = ["render_readme", "logger_script", "job_queue"]
 from . import *
-from .logger_script import logger
\ No newline at end of file
+from .logger_script import logger
+from .job_queue import job_queue
\ No newline at end of file
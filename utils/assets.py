@@ -0,0 +1,99 @@
+"""
+Fingerprinted, precompressed static files.
+
+At startup every file of the app's static folder is read once, hashed and, when it
+is text, compressed with gzip and brotli. `url_for("static", filename=...)` and the
+`static_url(...)` template global then point at `name.<hash>.ext`, which is served
+from memory with a one year immutable Cache-Control: a changed file gets a new URL,
+so clients never need to revalidate.
+The plain name still works and is revalidated with its ETag.
+"""
+from hashlib import sha1
+import mimetypes
+from pathlib import Path, PurePosixPath
+
+from flask import Flask, Response, has_request_context, request
+
+from .http_cache import CachedPayload
+from .logger_script import logger
+
+ONE_YEAR = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ("application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+
+def is_compressible(mimetype: str) -> bool:
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+
+def fingerprinted_name(filename: str, digest: str) -> str:
+    path = PurePosixPath(filename)
+    return str(path.with_name(f"{path.stem}.{digest[:12]}{path.suffix}"))
+
+
+class StaticAssets:
+    def __init__(self, folder: str | Path, max_age: int = ONE_YEAR):
+        self.folder = Path(folder)
+        self.max_age = max_age
+        # logical name -> fingerprinted name, and the payloads under both names
+        self.manifest: dict[str, str] = {}
+        self._payloads: dict[str, CachedPayload] = {}
+        self._fingerprinted: set[str] = set()
+        self._fallback = None
+
+    def scan(self) -> None:
+        manifest, payloads = {}, {}
+        for path in sorted(self.folder.rglob("*")):
+            if not path.is_file():
+                continue
+            filename = path.relative_to(self.folder).as_posix()
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            payload = CachedPayload(path.read_bytes(), mimetype, compress_body=is_compressible(mimetype))
+            manifest[filename] = fingerprinted_name(filename, payload.etag)
+            payloads[filename] = payloads[manifest[filename]] = payload
+        self.manifest, self._payloads = manifest, payloads
+        self._fingerprinted = set(manifest.values())
+        logger.info(f"Fingerprinted {len(manifest)} static files in {self.folder}")
+
+    def url_defaults(self, endpoint: str, values: dict) -> None:
+        if endpoint == "static" and values.get("filename") in self.manifest:
+            values["filename"] = self.manifest[values["filename"]]
+
+    def send(self, filename: str) -> Response:
+        payload = self._payloads.get(filename)
+        if payload is None:
+            # added after startup
+            return self._fallback(filename=filename)
+        if filename in self._fingerprinted:
+            return payload.response(max_age=self.max_age, immutable=True)
+        return payload.response()
+
+    def init_app(self, app: Flask) -> None:
+        self.scan()
+        self._fallback = app.view_functions["static"]
+        app.view_functions["static"] = self.send
+        app.url_defaults(self.url_defaults)
+        app.extensions["static_assets"] = self
+
+
+def static_url_for(app: Flask, assets: StaticAssets | None = None):
+    """
+    `static_url(filename)` for templates: the URL of one of `app`'s static files,
+    fingerprinted when `assets` is given. Unlike `url_for` it works without a request,
+    for pages rendered ahead of time like the README, and from the Dash apps' servers,
+    which have no static folder of their own.
+    """
+    def static_url(filename: str) -> str:
+        name = assets.manifest.get(filename, filename) if assets is not None else filename
+        root = request.script_root if has_request_context() else ""
+        return f"{root}{app.static_url_path}/{name}"
+
+    return static_url
+
+
+def init_assets(app: Flask) -> StaticAssets | None:
+    assets = None
+    if app.has_static_folder and app.config.get("ASSET_PIPELINE", True):
+        assets = StaticAssets(app.static_folder, max_age=app.config.get("ASSET_MAX_AGE", ONE_YEAR))
+        assets.init_app(app)
+    app.add_template_global(static_url_for(app, assets), "static_url")
+    return assets
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from os import environ
+from pathlib import Path
+
+import numpy as np
+
+from .logger_script import logger
+
+MANIFEST = "manifest.json"
+
+# build(source) -> (named arrays, JSON-serialisable metadata)
+ColumnarBuilder = Callable[[Path], tuple[dict[str, np.ndarray], dict]]
+
+
+def load_columnar(
+    source: str | Path,
+    build: ColumnarBuilder,
+    cache_dir: str | Path | None = None,
+    version: int = 1,
+) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Load the arrays derived from `source` as read-only memory maps.
+
+    On the first call (or after `source` changed) `build` turns the source file into
+    named NumPy arrays, which are written as `.npy` files to a cache directory keyed
+    by the source's mtime and size. Every process then maps the same files read-only,
+    so worker processes share the pages instead of each holding a private copy.
+    Bump `version` when the builder's output changes.
+
+    :returns: (arrays, metadata)
+    """
+    source = Path(source)
+    stat = source.stat()
+    cache_root = Path(cache_dir or environ.get("COLUMNAR_CACHE_DIR") or source.parent / ".columnar")
+    target = cache_root / f"{source.stem}-v{version}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    if not (target / MANIFEST).exists():
+        _build(source, build, cache_root, target)
+
+    manifest = json.loads((target / MANIFEST).read_text())
+    arrays = {
+        name: np.load(target / f"{name}.npy", mmap_mode="r")
+        for name in manifest["arrays"]
+    }
+    return arrays, manifest["meta"]
+
+
+def _build(source: Path, build: ColumnarBuilder, cache_root: Path, target: Path) -> None:
+    start = time.perf_counter()
+    cache_root.mkdir(parents=True, exist_ok=True)
+    arrays, meta = build(source)
+
+    # Write into a private directory and rename it into place, so concurrent
+    # workers never see a half-written cache
+    tmp = Path(tempfile.mkdtemp(prefix=".build-", dir=cache_root))
+    try:
+        for name, array in arrays.items():
+            if array.dtype == object:
+                raise TypeError(f"Column {name!r} has object dtype and cannot be memory-mapped")
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        (tmp / MANIFEST).write_text(json.dumps({
+            "source": str(source),
+            "arrays": list(arrays),
+            "meta": meta,
+        }))
+        os.rename(tmp, target)
+    except OSError:
+        # another worker has finished the same build first
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not (target / MANIFEST).exists():
+            raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    # Drop caches of older versions of the source, processes still mapping them keep their pages
+    for stale in cache_root.glob(f"{source.stem}-v*"):
+        if stale != target:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    logger.info(f"Built columnar cache for {source} in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,115 @@
+import gzip
+from hashlib import sha1
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+# brotli's best quality takes seconds on multi-megabyte JS bundles, larger bodies
+# get quality 9 (a few percent bigger, twenty times faster)
+MAX_BEST_COMPRESS_SIZE = 256 * 1024
+
+
+def compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+    """
+    :param fast: cheap levels for bodies compressed on every request,
+        rather than once and cached
+    """
+    if encoding == "br":
+        if fast:
+            quality = 4
+        else:
+            quality = 11 if len(body) <= MAX_BEST_COMPRESS_SIZE else 9
+        return brotli.compress(body, quality=quality)
+    return gzip.compress(body, compresslevel=5 if fast else 9, mtime=0)
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Content encodings we can produce, in order of preference"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(offered) -> str | None:
+    """Best encoding in `offered` that the current request accepts"""
+    for encoding in offered:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a dynamic response in place for the current request, with fast levels,
+    when it is large enough and the client accepts an encoding
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = negotiate_encoding(available_encodings())
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(compress(body, encoding, fast=True))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+class CachedPayload:
+    """
+    A response body rendered once, with a strong ETag and precompressed
+    gzip (and brotli, when installed) variants
+    """
+
+    __slots__ = ("body", "mimetype", "etag", "variants")
+
+    def __init__(self, body: str | bytes, mimetype: str = "text/html", compress_body: bool = True):
+        self.body = body.encode() if isinstance(body, str) else body
+        self.mimetype = mimetype
+        self.etag = sha1(self.body).hexdigest()
+        self.variants: dict[str, bytes] = {}
+        if compress_body and len(self.body) >= MIN_COMPRESS_SIZE:
+            for encoding in available_encodings():
+                self.variants[encoding] = compress(self.body, encoding)
+
+    def variant_etag(self, encoding: str | None) -> str:
+        # each representation needs its own strong ETag
+        return f"{self.etag}-{encoding}" if encoding else self.etag
+
+    def response(self, max_age: int | None = None, immutable: bool = False) -> Response:
+        """
+        Response for the current request: 304 if the client's copy is current,
+        otherwise the best encoding the client accepts
+
+        :param max_age: seconds the client may reuse the response without revalidating,
+            None to make it revalidate every time
+        """
+        encoding = negotiate_encoding(self.variants)
+        etag = self.variant_etag(encoding)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.variants[encoding] if encoding else self.body, mimetype=self.mimetype)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.mimetype = self.mimetype
+        response.set_etag(etag)
+        if self.variants:
+            response.vary.add("Accept-Encoding")
+        if max_age is None:
+            response.cache_control.no_cache = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            if immutable:
+                response.cache_control.immutable = True
+        return response
@@ -0,0 +1,223 @@
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+
+from .logger_script import logger
+from .metrics import metrics
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    __slots__ = (
+        "id", "fn", "args", "kwargs", "retry_on", "status", "result", "error",
+        "attempts", "enqueued_at", "started_at", "finished_at",
+    )
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, retry_on: tuple[type[BaseException], ...]):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.retry_on = retry_on
+        self.status = self.QUEUED
+        self.result = None
+        self.error: str | None = None
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+        }
+
+
+class JobQueue:
+    """
+    In-process job queue served by a thread pool.
+
+    Jobs are retried with exponential backoff when they raise one of their `retry_on`
+    exceptions. A retry is resubmitted by a timer once its backoff is over, so the
+    workers keep running other jobs in the meantime. Finished jobs are kept for
+    `result_ttl` seconds so their status can be polled, and queue depth, wait time
+    and failure counts are available from `stats()` and as `job_queue_*` metrics.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_pending: int = 1000,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        result_ttl: float = 600.0,
+    ):
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-queue")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+        self._queued = 0
+        self._running = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._retries = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn: Callable, *args, retry_on: tuple[type[BaseException], ...] = (), **kwargs) -> str:
+        """
+        Queue `fn(*args, **kwargs)` and return the job id
+
+        :raises QueueFullError: if `max_pending` jobs are already waiting
+        """
+        job = Job(fn, args, kwargs, retry_on)
+        with self._lock:
+            if self._queued >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(f"Job queue is full ({self._queued} pending)")
+            self._prune()
+            self._jobs[job.id] = job
+            self._queued += 1
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def _run(self, job: Job) -> None:
+        now = time.monotonic()
+        wait = now - job.enqueued_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        if job.started_at is None:
+            job.started_at = now
+        job.status = Job.RUNNING
+
+        job.attempts += 1
+        retry = False
+        try:
+            job.result = job.fn(*job.args, **job.kwargs)
+            job.status = Job.SUCCEEDED
+        except Exception as error:
+            retry = isinstance(error, job.retry_on) and job.attempts <= self.max_retries
+            if retry:
+                logger.warning(f"Job {job.id} attempt {job.attempts} failed, retrying: {error}")
+            else:
+                logger.error(f"Job {job.id} failed after {job.attempts} attempt(s): {error}")
+                job.status = Job.FAILED
+                job.error = str(error)
+
+        with self._lock:
+            self._running -= 1
+            if retry:
+                # waiting for its retry counts as pending, the worker is free meanwhile
+                self._retries += 1
+                self._queued += 1
+            elif job.status == Job.SUCCEEDED:
+                self._succeeded += 1
+            else:
+                self._failed += 1
+        if retry:
+            job.status = Job.QUEUED
+            timer = threading.Timer(self.retry_backoff * 2 ** (job.attempts - 1), self._requeue, (job,))
+            timer.daemon = True
+            timer.start()
+            return
+        job.finished_at = time.monotonic()
+        # Drop the arguments, they may hold credentials
+        job.args, job.kwargs = (), {}
+
+    def _requeue(self, job: Job) -> None:
+        job.enqueued_at = time.monotonic()
+        try:
+            self._executor.submit(self._run, job)
+        except RuntimeError as error:
+            # the queue was shut down during the backoff
+            logger.error(f"Job {job.id} could not be retried: {error}")
+            job.status = Job.FAILED
+            job.error = str(error)
+            job.finished_at = time.monotonic()
+            job.args, job.kwargs = (), {}
+            with self._lock:
+                self._queued -= 1
+                self._failed += 1
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than `result_ttl`, caller must hold the lock"""
+        cutoff = time.monotonic() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._succeeded + self._failed + self._running
+            return {
+                "depth": self._queued,
+                "running": self._running,
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+                "retries": self._retries,
+                "rejected": self._rejected,
+                "wait_mean": self._wait_total / started if started else 0.0,
+                "wait_max": self._wait_max,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+job_queue = JobQueue(
+    max_workers=int(environ.get("JOB_QUEUE_WORKERS", 4)),
+    max_pending=int(environ.get("JOB_QUEUE_MAX_PENDING", 1000)),
+    max_retries=int(environ.get("JOB_QUEUE_MAX_RETRIES", 2)),
+)
+
+
+def _collect_metrics() -> None:
+    stats = job_queue.stats()
+    metrics.gauge_set("job_queue_depth", stats["depth"])
+    metrics.gauge_set("job_queue_running", stats["running"])
+    metrics.gauge_set("job_queue_wait_mean_seconds", stats["wait_mean"])
+    metrics.gauge_set("job_queue_wait_max_seconds", stats["wait_max"])
+    for outcome in ("succeeded", "failed"):
+        metrics.counter_set("job_queue_jobs_total", stats[outcome], outcome=outcome)
+    metrics.counter_set("job_queue_retries_total", stats["retries"])
+    metrics.counter_set("job_queue_rejected_total", stats["rejected"])
+
+
+metrics.describe("job_queue_depth", "Jobs waiting for a worker, retries in backoff included")
+metrics.describe("job_queue_running", "Jobs being run")
+metrics.describe("job_queue_wait_mean_seconds", "Mean time jobs waited for a worker")
+metrics.describe("job_queue_wait_max_seconds", "Longest time a job waited for a worker")
+metrics.describe("job_queue_jobs_total", "Finished jobs by outcome")
+metrics.describe("job_queue_retries_total", "Job attempts that failed and were retried")
+metrics.describe("job_queue_rejected_total", "Jobs rejected because the queue was full")
+metrics.collect(_collect_metrics)
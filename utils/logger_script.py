@@ -1,5 +1,29 @@
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from os import environ
+
+from flask import g, has_request_context, request
+
+# "color" (the default, falls back to plain when not attached to a TTY), "plain" or "json"
+LOG_FORMAT = environ.get("LOG_FORMAT", "color").lower()
+# Hand records to a background thread so writing them never blocks a request
+LOG_ASYNC = environ.get("LOG_ASYNC", "true").lower() == "true"
+DEFAULT_LOG_LEVEL = "DEBUG"
+LOG_LEVEL = environ.get("LOG_LEVEL", DEFAULT_LOG_LEVEL).upper()
+# an unknown level falls back to the default, reported once the logger exists
+UNKNOWN_LOG_LEVEL = None if LOG_LEVEL in logging.getLevelNamesMapping() else LOG_LEVEL
+if UNKNOWN_LOG_LEVEL is not None:
+    LOG_LEVEL = DEFAULT_LOG_LEVEL
+# request_id is "-" outside of a request
+LOG_FORMAT_STRING = "%(asctime)s | %(levelname)s | %(request_id)s | %(filename)s: %(funcName)s | %(message)s"
 
 # code i did not write down
 class ColoredFormatter(logging.Formatter):
@@ -26,7 +50,8 @@ class ColoredFormatter(logging.Formatter):
 
     RESET = "\033[0m"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, use_color: bool = True, **kwargs):
+        self.use_color = use_color
         self._colors = {
             logging.DEBUG: self.DARK_GREY,
             logging.INFO: self.RESET,
@@ -37,31 +62,114 @@ class ColoredFormatter(logging.Formatter):
             }
         super(ColoredFormatter, self).__init__(*args, **kwargs)
 
-    # absolute junk
     def format(self, record):
-        """Applies the color formats to the log level name"""
-        # Save original levelname
-        original_levelname = record.levelname
-        original_msg = record.msg
+        """Applies the color formats to the log level name and message"""
+        color = self._colors.get(record.levelno) if self.use_color else None
+        if color is None:
+            return logging.Formatter.format(self, record)
+
+        # Colorize a copy, the record is shared with other handlers
+        record = logging.makeLogRecord(record.__dict__)
+        record.levelname = f"{color}{record.levelname}{self.RESET}"
+        # getMessage also handles non-str messages and %-style args
+        record.msg = f"{color}{record.getMessage()}{self.RESET}"
+        record.args = None
+        return logging.Formatter.format(self, record)
 
-        # Colorize the levelname
-        if record.levelno in self._colors:
-            colored_levelname = self._colors[record.levelno] + original_levelname + self.RESET
-            record.levelname = colored_levelname
-            colored_msg = self._colors[record.levelno] + original_msg + self.RESET
-            record.msg = colored_msg
+    def setLevelColor(self, logging_level, escaped_ansi_code):
+        self._colors[logging_level] = escaped_ansi_code
 
-        # Proceed with the standard formatting
-        formatted_message = logging.Formatter.format(self, record)
 
-        # Revert to avoid affecting other loggers
-        record.levelname = original_levelname
-        record.msg = original_msg
+class JsonFormatter(logging.Formatter):
+    """Compact one-line JSON records, for production log collectors"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "func": record.funcName,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "route": getattr(record, "route", None),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds the request id and route of the current Flask request to each record,
+    records logged outside of a request are left without them
+    """
 
-        return formatted_message
+    def filter(self, record):
+        if has_request_context():
+            request_id = getattr(g, "request_id", None)
+            if request_id is None:
+                request_id = g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+            record.request_id = request_id
+            record.route = request.url_rule.rule if request.url_rule is not None else request.path
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the formatting to the listener's handlers, only the
+    message and the exception text are resolved on the calling thread.
+
+    The listener thread is started by the first record of each process: prefork
+    servers (uWSGI) import the app in the master, and threads do not survive the fork
+    """
+
+    def __init__(self, *handlers: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self._handlers = handlers
+        self.listener: logging.handlers.QueueListener | None = None
+        self._pid = None
+
+    def start(self) -> None:
+        if self._pid == os.getpid():
+            return
+        # a fresh queue, records the parent had not written yet are its own to write
+        self.queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def stop(self) -> None:
+        """Write out the queued records and stop the listener of this process"""
+        if self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+
+    def enqueue(self, record):
+        # called under the handler lock, which logging resets in a forked child
+        self.start()
+        super().enqueue(record)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # tracebacks cannot be handed to another thread safely
+            record.exc_info = None
+        return record
+
+
+def create_formatter(log_format: str, stream) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    use_color = log_format == "color" and hasattr(stream, "isatty") and stream.isatty()
+    return ColoredFormatter(LOG_FORMAT_STRING, use_color=use_color, defaults={"request_id": "-"})
 
-    def setLevelColor(self, logging_level, escaped_ansi_code):
-        self._colors[logging_level] = escaped_ansi_code
 
 @staticmethod
 def instantiate_logger() -> logging.Logger:
@@ -73,17 +181,26 @@ def instantiate_logger() -> logging.Logger:
     try:
         # Create logger
         logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
+        logger.setLevel(LOG_LEVEL)
+
+        # Create a handler, with a formatter matching LOG_FORMAT
+        stream = sys.stderr
+        console_handler = logging.StreamHandler(stream)
+        console_handler.setFormatter(create_formatter(LOG_FORMAT, stream))
 
-        # Create a handler
-        console_handler = logging.StreamHandler()
+        if LOG_ASYNC:
+            # The calling thread only enqueues the record, formatting
+            # and writing happen on the listener's thread
+            handler = DeferredQueueHandler(console_handler)
+            atexit.register(handler.stop)
+        else:
+            handler = console_handler
 
-        # Set the ColoredFormatter to the handler
-        formatter = ColoredFormatter("%(asctime)s | %(levelname)s | %(filename)s: %(funcName)s | %(message)s")
-        console_handler.setFormatter(formatter)
+        # The request context has to be read on the calling thread
+        handler.addFilter(RequestContextFilter())
 
         # Add the handler to the logger
-        logger.addHandler(console_handler)
+        logger.addHandler(handler)
 
         return logger
     except Exception as error:
@@ -91,3 +208,5 @@ def instantiate_logger() -> logging.Logger:
         return None
 
 logger: logging.Logger = instantiate_logger()
+if UNKNOWN_LOG_LEVEL is not None:
+    logger.warning(f"Unknown LOG_LEVEL {UNKNOWN_LOG_LEVEL!r}, logging at {DEFAULT_LOG_LEVEL}")
@@ -0,0 +1,178 @@
+"""
+In-process metrics with a Prometheus text exposition.
+
+Counters, gauges and histograms are kept per label set in plain dicts behind one
+lock, an update is a dict lookup and a few additions. Numbers that are already
+counted elsewhere (the job queue, the backend client) are copied in by collectors
+registered with `collect`, which run before every render. Every worker process keeps
+its own numbers, so with several uWSGI workers each scrape sees one worker.
+"""
+from bisect import bisect_left
+import threading
+import time
+from collections.abc import Callable
+
+from flask import Flask, Response, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # one count per bucket plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._gauges: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._buckets: dict[str, tuple[float, ...]] = {}
+        self._help: dict[str, str] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def describe(self, name: str, help_text: str, buckets: tuple[float, ...] | None = None) -> None:
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def gauge_add(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def gauge_set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def counter_set(self, name: str, value: float, **labels) -> None:
+        """Set a counter whose running total is kept elsewhere"""
+        with self._lock:
+            self._counters.setdefault(name, {})[_label_key(labels)] = value
+
+    def collect(self, collector: Callable[[], None]) -> None:
+        """Call `collector` before every render, to set the numbers it copies in"""
+        self._collectors.append(collector)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        for collector in self._collectors:
+            collector()
+        lines = []
+        with self._lock:
+            for kind, families in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(families.items()):
+                    self._header(lines, name, kind)
+                    for key, value in series.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        labels = _format_labels(key, f'le="{bound}"')
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(key, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{labels} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: list[str], name: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+metrics = MetricsRegistry()
+metrics.describe("http_requests_total", "Flask requests by endpoint, method and status")
+metrics.describe("http_request_errors_total", "Flask requests answered with a 5xx or an exception")
+metrics.describe("http_requests_in_flight", "Flask requests currently being handled")
+metrics.describe("http_request_duration_seconds", "Flask request latency")
+metrics.describe("dash_callback_calls_total", "Dash callback invocations by output")
+metrics.describe("dash_callback_errors_total", "Dash callbacks that raised")
+metrics.describe("dash_callbacks_in_flight", "Dash callbacks currently running")
+metrics.describe("dash_callback_duration_seconds", "Dash callback latency")
+metrics.describe("backend_requests_total", "Calls to the FastAPI server by endpoint")
+metrics.describe("backend_request_errors_total", "Failed calls to the FastAPI server")
+metrics.describe("backend_request_duration_seconds", "Latency of calls to the FastAPI server")
+
+
+def _before_request() -> None:
+    g._metrics_start = time.perf_counter()
+    g._metrics_endpoint = request.endpoint or "unmatched"
+    metrics.gauge_add("http_requests_in_flight", 1, endpoint=g._metrics_endpoint)
+
+
+def _after_request(response: Response) -> Response:
+    g._metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(error: BaseException | None) -> None:
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return
+    endpoint = g.pop("_metrics_endpoint")
+    status = 500 if error is not None else g.pop("_metrics_status", 500)
+    metrics.gauge_add("http_requests_in_flight", -1, endpoint=endpoint)
+    metrics.observe("http_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+    metrics.inc("http_requests_total", endpoint=endpoint, method=request.method, status=status)
+    if status >= 500:
+        metrics.inc("http_request_errors_total", endpoint=endpoint)
+
+
+def init_metrics(app: Flask) -> None:
+    """Record latency, counts, errors and in-flight requests per endpoint of `app`"""
+    app.before_request_funcs.setdefault(None, []).insert(0, _before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def metrics_response() -> Response:
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,172 @@
+"""
+Opt-in statistical profiling of live requests.
+
+A profiled request gets a sampler thread that records the request thread's
+stack every few milliseconds. When the request ends, the stacks are written in
+collapsed format ("frame;frame;frame count"), ready for flamegraph.pl or
+speedscope. Dash callbacks are profiled as their `_dash-update-component`
+requests. Requests are picked at random (PROFILING_SAMPLE_RATE, when
+PROFILING_ENABLED), or forced with an `X-Profile` header holding a token signed
+with the app's SECRET_KEY. The number of profiles per minute is capped either way.
+"""
+from collections import Counter, deque
+import os
+from pathlib import Path
+import random
+import re
+import sys
+import threading
+import time
+
+from flask import Flask, g, request
+from itsdangerous import BadSignature, TimestampSigner
+
+from .logger_script import logger
+
+PROFILE_HEADER = "X-Profile"
+TOKEN_PAYLOAD = "profile"
+# signed header tokens are accepted for this many seconds
+TOKEN_MAX_AGE = 3600
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        directory: str | Path = "profiles",
+        enabled: bool = False,
+        sample_rate: float = 0.01,
+        interval: float = 0.005,
+        max_per_minute: int = 10,
+        secret_key: str | None = None,
+    ):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_per_minute = max_per_minute
+        self._signer = TimestampSigner(secret_key, salt="request-profiler") if secret_key else None
+        self._recent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "RequestProfiler":
+        return cls(
+            directory=config.get("PROFILING_DIR", "profiles"),
+            enabled=config.get("PROFILING_ENABLED", False),
+            sample_rate=config.get("PROFILING_SAMPLE_RATE", 0.01),
+            interval=config.get("PROFILING_INTERVAL", 0.005),
+            max_per_minute=config.get("PROFILING_MAX_PER_MINUTE", 10),
+            secret_key=config.get("SECRET_KEY"),
+        )
+
+    def make_token(self) -> str:
+        """Value for the X-Profile header that forces profiling of a request"""
+        if self._signer is None:
+            raise RuntimeError("Profiling tokens need a SECRET_KEY")
+        return self._signer.sign(TOKEN_PAYLOAD).decode()
+
+    def _forced(self) -> bool:
+        token = request.headers.get(PROFILE_HEADER)
+        if not token or self._signer is None:
+            return False
+        try:
+            return self._signer.unsign(token, max_age=TOKEN_MAX_AGE).decode() == TOKEN_PAYLOAD
+        except BadSignature:
+            logger.warning(f"Rejected invalid {PROFILE_HEADER} header")
+            return False
+
+    def _take_slot(self) -> bool:
+        """Per-minute cap on written profiles"""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_per_minute:
+                return False
+            self._recent.append(now)
+            return True
+
+    def should_profile(self) -> bool:
+        sampled = self.enabled and random.random() < self.sample_rate
+        return (sampled or self._forced()) and self._take_slot()
+
+    def _before_request(self) -> None:
+        if self.should_profile():
+            g._profiler_start = time.perf_counter()
+            g._profiler_sampler = StackSampler(threading.get_ident(), self.interval)
+            g._profiler_sampler.start()
+
+    def _teardown_request(self, error: BaseException | None) -> None:
+        sampler: StackSampler | None = g.pop("_profiler_sampler", None)
+        if sampler is None:
+            return
+        counts = sampler.stop()
+        elapsed = time.perf_counter() - g.pop("_profiler_start")
+        try:
+            self.write(counts, self._label(), elapsed)
+        except OSError as os_error:
+            logger.error(f"Could not write profile: {os_error}")
+
+    @staticmethod
+    def _label() -> str:
+        label = request.endpoint or request.path
+        if label.endswith("_dash-update-component"):
+            # name Dash callback profiles after the callback's output
+            body = request.get_json(silent=True) or {}
+            label = f"{label}-{body.get('output', '')}"
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")[:120]
+
+    def write(self, counts: Counter, label: str, elapsed: float) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{label}.collapsed"
+        with path.open("w") as fp:
+            for stack, count in counts.most_common():
+                fp.write(f"{stack} {count}\n")
+        logger.info(f"Wrote profile of {label} ({elapsed * 1000:.1f}ms, {sum(counts.values())} samples) to {path}")
+        return path
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+
+def init_profiler(app: Flask) -> RequestProfiler:
+    profiler = RequestProfiler.from_config(app.config)
+    profiler.init_app(app)
+    app.extensions["profiler"] = profiler
+    return profiler
+
+
+if __name__ == "__main__":
+    # Print a token for the X-Profile header, signed with $SECRET_KEY
+    print(RequestProfiler(secret_key=os.environ["SECRET_KEY"]).make_token())
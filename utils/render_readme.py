@@ -1,49 +1,106 @@
+from functools import lru_cache
 from pathlib import Path
 import re
+import threading
 
-from flask import render_template
+from flask import current_app, render_template, Response
 import markdown
 import markdown.extensions.fenced_code
 from markupsafe import Markup
 from pygments.formatters.html import HtmlFormatter
 
-def get_rendered_readme():
-    with Path("README.md").open() as fp:
-        formatter = HtmlFormatter(
-            style="solarized-light",
-            full=True,
-            cssclass="codehilite",
-        )
-        styles: str = f"<style>{formatter.get_style_defs()}</style>"
-        html: str = (
-            markdown.markdown(fp.read(), extensions=["codehilite", "fenced_code"]).replace(
-                # Fix relative path for image(s) when rendering README.md on index page
-                'src="static/',
-                'src="',
-                ).replace(
-                    "codehilite", "codehilite p-2 mb-3"
-                )
+from .http_cache import CachedPayload
+
+README_PATH = Path("README.md")
+
+
+class RenderedReadme:
+    """README rendered to the full index page, tagged with the file version it came from"""
+
+    __slots__ = ("version", "page", "payload")
+
+    def __init__(self, version: tuple[int, int], page: str):
+        self.version = version
+        self.page = page
+        self.payload = CachedPayload(page)
+
+
+_cached: RenderedReadme | None = None
+_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_readme_styles() -> str:
+    """Pygments CSS for the code blocks, it does not depend on the README content"""
+    formatter = HtmlFormatter(
+        style="solarized-light",
+        full=True,
+        cssclass="codehilite",
+    )
+    return f"<style>{formatter.get_style_defs()}</style>"
+
+
+def replace_heading(match) -> str:
+    level = match.group(1)
+    text = match.group(2)
+    id = text.translate(
+        str.maketrans(
+            {
+                " ": "-",
+                "'": "",
+                ":": "",
+            }
         )
+    ).lower()
+    style = "padding-top: 70px; margin-top: -70px;"
+    return f'<h{level} id="{id}" style="{style}">{text}</h{level}>'
 
-        def replace_heading(match) -> str:
-            level = match.group(1)
-            text = match.group(2)
-            id = text.translate(
-                str.maketrans(
-                    {
-                        " ": "-",
-                        "'": "",
-                        ":": "",
-                    }
-                )
-            ).lower()
-            style = "padding-top: 70px; margin-top: -70px;"
-            return f'<h{level} id="{id}" style="{style}">{text}</h{level}>'
-
-        html = re.sub(r"<h([1-3])>(.+)</h\1>", replace_heading, html)
-
-        return render_template(
+
+def render_readme_html(text: str) -> str:
+    html: str = markdown.markdown(text, extensions=["codehilite", "fenced_code"]).replace(
+        "codehilite", "codehilite p-2 mb-3"
+    )
+    # README images point into the repo's static folder, serve them under their fingerprinted URL
+    static_url = current_app.jinja_env.globals["static_url"]
+    html = re.sub(r'src="(?:app/)?static/([^"]+)"', lambda match: f'src="{static_url(match.group(1))}"', html)
+    return re.sub(r"<h([1-3])>(.+)</h\1>", replace_heading, html)
+
+
+def get_cached_readme() -> RenderedReadme:
+    """
+    Return the rendered index page, re-rendering only when README.md has changed
+    (mtime or size) since the last render
+    """
+    global _cached
+    stat = README_PATH.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _cached
+    if cached is not None and cached.version == version:
+        return cached
+
+    with _cache_lock:
+        if _cached is not None and _cached.version == version:
+            return _cached
+        with README_PATH.open() as fp:
+            html = render_readme_html(fp.read())
+        page = render_template(
             "index.html",
             content=Markup(html),
-            styles=Markup(styles),
-        )
\ No newline at end of file
+            styles=Markup(get_readme_styles()),
+        )
+        _cached = RenderedReadme(version, page)
+        return _cached
+
+
+def precompute_readme() -> None:
+    """Render the index page ahead of the first request, needs an app context"""
+    get_cached_readme()
+
+
+def get_rendered_readme() -> str:
+    return get_cached_readme().page
+
+
+def get_readme_response() -> Response:
+    """Index page response with an ETag, answers 304 when the client copy is current"""
+    return get_cached_readme().payload.response()
@@ -0,0 +1,85 @@
+"""
+Who a session belongs to, kept in the signed Flask session cookie.
+
+Sign up signs the user in once the backend has registered them: the session keeps
+its sign up job and username (the job queue drops a job's arguments once it is done),
+and the first request after the job succeeded signs that username in.
+Admins, who can look at every user's portfolio (the demo users included), sign in
+by opening `/admin/sign_in/<token>` with a token signed with the app's SECRET_KEY,
+printed by `python -m utils.sessions`.
+"""
+import os
+
+from flask import Flask, session
+from itsdangerous import BadSignature, TimestampSigner
+
+from .job_queue import Job, job_queue
+from .logger_script import logger
+
+SESSION_USER = "username"
+SESSION_ADMIN = "is_admin"
+SESSION_SIGN_UP_JOB = "sign_up_job"
+SESSION_SIGN_UP_USER = "sign_up_user"
+ADMIN_TOKEN_PAYLOAD = "admin"
+# admin sign in links are accepted for this many seconds
+ADMIN_TOKEN_MAX_AGE = 600
+
+
+def current_user() -> tuple[str | None, bool]:
+    """The signed-in user of the current request, and whether the session is an admin's"""
+    return session.get(SESSION_USER), bool(session.get(SESSION_ADMIN))
+
+
+def start_sign_up(job_id: str, username: str) -> None:
+    """Remember the sign up job of the session, see `complete_sign_up`"""
+    session[SESSION_SIGN_UP_JOB] = job_id
+    session[SESSION_SIGN_UP_USER] = username
+
+
+def complete_sign_up() -> None:
+    """Sign the session in once its sign up job has registered the user"""
+    job_id, username = session.get(SESSION_SIGN_UP_JOB), session.get(SESSION_SIGN_UP_USER)
+    if job_id is None or username is None or SESSION_USER in session:
+        return
+    job = job_queue.get(job_id)
+    if job is None or not job.done:
+        return
+    if job.status == Job.SUCCEEDED and isinstance(job.result, dict) and job.result.get("success") is True:
+        session[SESSION_USER] = username
+        logger.debug(f"User {username} is signed in")
+
+
+def _admin_signer(secret_key: str | None) -> TimestampSigner:
+    if not secret_key:
+        raise RuntimeError("Admin sign in needs a SECRET_KEY")
+    return TimestampSigner(secret_key, salt="admin-sign-in")
+
+
+def make_admin_token(secret_key: str | None) -> str:
+    return _admin_signer(secret_key).sign(ADMIN_TOKEN_PAYLOAD).decode()
+
+
+def sign_in_admin(secret_key: str | None, token: str) -> bool:
+    """Mark the session as an admin's if `token` is a valid admin token, returns whether it was"""
+    try:
+        payload = _admin_signer(secret_key).unsign(token, max_age=ADMIN_TOKEN_MAX_AGE)
+    except BadSignature:
+        return False
+    if payload.decode() != ADMIN_TOKEN_PAYLOAD:
+        return False
+    session[SESSION_ADMIN] = True
+    return True
+
+
+def sign_out() -> None:
+    for key in (SESSION_USER, SESSION_ADMIN, SESSION_SIGN_UP_JOB, SESSION_SIGN_UP_USER):
+        session.pop(key, None)
+
+
+def init_sessions(app: Flask) -> None:
+    app.before_request(complete_sign_up)
+
+
+if __name__ == "__main__":
+    # Print the path of an admin sign in link, signed with $SECRET_KEY
+    print(f"/admin/sign_in/{make_admin_token(os.environ['SECRET_KEY'])}")
@@ -0,0 +1,89 @@
+"""
+Named NumPy arrays in one block of shared memory, for handing large inputs to
+worker processes. The creating process copies the arrays in once; a task only
+carries the small `spec` (block name, dtypes, shapes and offsets), and workers map
+the block instead of unpickling a copy of the data.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# offsets are aligned so that every array starts on a cache line
+ALIGNMENT = 64
+
+# blocks a worker process keeps mapped, the least recently used one is dropped beyond that
+MAX_ATTACHED = 4
+
+# block name -> (block, arrays), kept open per worker process across tasks, least recently used first
+_attached: dict[str, tuple[shared_memory.SharedMemory, dict[str, np.ndarray]]] = {}
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SharedArrays:
+    """
+    Owner of a shared block: use as a context manager, the block is released on exit
+    (workers still mapping it keep their pages until they drop them)
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            offset = _align(offset)
+            layout[name] = (array.dtype.str, array.shape, offset)
+            offset += array.nbytes
+        self.block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.spec = {"name": self.block.name, "arrays": layout}
+        self.arrays = _views(self.block, layout)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+
+    def close(self) -> None:
+        self.arrays = {}
+        _close(self.block)
+        self.block.unlink()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _views(block: shared_memory.SharedMemory, layout: dict) -> dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+        for name, (dtype, shape, offset) in layout.items()
+    }
+
+
+def _close(block: shared_memory.SharedMemory) -> None:
+    try:
+        block.close()
+    except BufferError:
+        # views are still alive somewhere, the mapping goes away with them
+        pass
+
+
+def attach(spec: dict) -> dict[str, np.ndarray]:
+    """
+    The arrays described by `spec`, mapped from the shared block. The mapping is
+    reused by later tasks of the same process, so tasks of runs that interleave do
+    not map their blocks again; past MAX_ATTACHED blocks the least recently used is
+    dropped.
+    """
+    name = spec["name"]
+    attached = _attached.pop(name, None)
+    if attached is None:
+        block = shared_memory.SharedMemory(name=name)
+        arrays = _views(block, spec["arrays"])
+        for array in arrays.values():
+            array.flags.writeable = False
+        attached = (block, arrays)
+    _attached[name] = attached
+    while len(_attached) > MAX_ATTACHED:
+        block, _ = _attached.pop(next(iter(_attached)))
+        _close(block)
+    return attached[1]
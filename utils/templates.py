@@ -0,0 +1,47 @@
+"""
+Template compilation shared between workers.
+
+Compiled templates are kept in an on-disk Jinja bytecode cache (TEMPLATE_CACHE_DIR),
+so a new worker loads them instead of parsing the sources. `flask --app main:create_app
+precompile-templates` fills the cache as a build step, the warm-up does the same at
+startup. With TEMPLATES_AUTO_RELOAD off, templates are not re-stat'ed on every render.
+"""
+from pathlib import Path
+
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+from .logger_script import logger
+
+
+def precompile_templates(app: Flask) -> int:
+    """
+    Compile every template the app can load (its own and its blueprints') into the
+    Jinja environment's cache, and the bytecode cache when configured, instead of on
+    the first request that renders each one
+
+    :returns: the number of templates compiled
+    """
+    compiled = 0
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError as error:
+            logger.warning(f"Could not compile template {name}: {error}")
+            continue
+        compiled += 1
+    return compiled
+
+
+def configure_templates(app: Flask) -> None:
+    """Give `app` the shared bytecode cache and the `precompile-templates` command"""
+    cache_dir = app.config.get("TEMPLATE_CACHE_DIR")
+    if cache_dir:
+        directory = Path(app.root_path, cache_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(directory))
+
+    @app.cli.command("precompile-templates")
+    def precompile_templates_command():
+        """Compile all templates into the bytecode cache"""
+        print(f"Compiled {precompile_templates(app)} templates into {cache_dir or 'memory only'}")
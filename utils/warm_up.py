@@ -0,0 +1,100 @@
+"""
+Warm-up phase run when the app starts.
+
+Stages (template compilation, README rendering, Dash app imports and datasets, a
+first call of every callback) are registered by the code that owns them and run in
+order, in a background thread by default. `/readyz` answers 503 until they have all
+run, so the load balancer only sends traffic to warm instances.
+
+Background threads belong to the process that starts them, and prefork servers
+(uWSGI) create the app in their master: `start_in_workers` starts them in each
+worker instead.
+"""
+from collections.abc import Callable
+import os
+import threading
+import time
+
+from flask import Flask
+
+from .logger_script import logger
+
+
+class WarmUp:
+    def __init__(self, app: Flask):
+        self.app = app
+        self._stages: list[tuple[str, Callable[[], object]]] = []
+        self.timings: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.ready = threading.Event()
+
+    def add_stage(self, name: str, stage: Callable[[], object]) -> None:
+        """Run `stage()` during warm-up, in an app context, after the stages added before it"""
+        self._stages.append((name, stage))
+
+    def run(self) -> None:
+        """Run every stage and mark the app ready, a failed stage is logged and skipped"""
+        total = time.perf_counter()
+        with self.app.app_context():
+            for name, stage in self._stages:
+                start = time.perf_counter()
+                try:
+                    stage()
+                except Exception as error:
+                    self.errors[name] = repr(error)
+                    logger.error(f"Warm-up stage {name} failed: {error!r}")
+                self.timings[name] = time.perf_counter() - start
+                logger.info(f"Warm-up stage {name} took {self.timings[name]:.3f}s")
+        logger.info(f"Warm-up finished in {time.perf_counter() - total:.3f}s")
+        self.ready.set()
+
+    def start(self, background: bool = True) -> threading.Thread | None:
+        if not background:
+            self.run()
+            return None
+        thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready.is_set(),
+            "stages": {
+                name: {"seconds": self.timings.get(name), "error": self.errors.get(name)}
+                for name, _ in self._stages
+            },
+        }
+
+
+def start_in_workers(app: Flask, start: Callable[[], object]) -> Callable[[], None]:
+    """
+    Call `start()` once in every process that serves `app`: from uWSGI's postfork
+    hook when running under uWSGI, else (and with lazy-apps) on the first request.
+    Returns the function that does it, for warm-up stages that need what `start` sets
+    up before the first request: it calls `start()` at most once per process.
+    """
+    lock = threading.Lock()
+    started_in = [None]
+
+    def start_once() -> None:
+        if started_in[0] == os.getpid():
+            return
+        with lock:
+            if started_in[0] != os.getpid():
+                started_in[0] = os.getpid()
+                start()
+
+    try:
+        from uwsgidecorators import postfork
+    except ImportError:
+        pass
+    else:
+        postfork(start_once)
+    app.before_request(start_once)
+    return start_once
+
+
+def init_warm_up(app: Flask) -> WarmUp:
+    warm_up = WarmUp(app)
+    app.extensions["warm_up"] = warm_up
+    return warm_up